@@ -11,6 +11,10 @@ const UNIT_COST = 10;
 const UNIT_SPEED = 120;
 const UNIT_COLLISION_DISTANCE = 24;
 const FORMATION_MODES = { ATTACK: "attack", DEFENSE: "defense" };
+const RELAY_FLUSH_INTERVAL_MS = 50;
+const TELEMETRY_SAMPLE_INTERVAL_SECONDS = 1;
+const TELEMETRY_FLUSH_INTERVAL_SECONDS = 10;
+const RELAY_HISTORY_TICKS = 64;
 
 const GAMEPLAY_CONFIG = {
   maxUnitsPerPlayer: 50,
@@ -39,9 +43,13 @@ const BOT_DIFFICULTY = {
 
 let currentMode = "vsbot";
 let lanLobbies = [];
+let lanLobbiesSeq = null;
 let activeLobbyId = null;
 let lobbiesPollIntervalId = null;
 let lobbyDetailsPollIntervalId = null;
+let lobbiesEventSource = null;
+let lobbyDetailsEventSource = null;
+let lobbyStreamsSupported = typeof EventSource !== "undefined";
 
 function showScreen(screenId) {
   document.querySelectorAll(".screen").forEach((screen) => {
@@ -106,8 +114,9 @@ const GameManager = {
       return;
     }
 
+    let telemetryMatchId = null;
     if (currentMode === "vsbot") {
-      await apiPost("/create_match", {
+      const data = await apiPost("/create_match", {
         host: currentPlayer.username,
         map: this.selectedMapId,
         mode: this.selectedMode,
@@ -116,6 +125,7 @@ const GameManager = {
         team: this.selectedTeam,
         status: "pending",
       });
+      telemetryMatchId = data.match?.id;
     }
 
     units = [];
@@ -123,6 +133,7 @@ const GameManager = {
     enterGame();
     GameplayMapRenderer.init(getSelectedMap());
     MatchFlowManager.init();
+    MatchTelemetry.start(telemetryMatchId);
     UIManager.initGameplayUI();
     updateDashboard();
   },
@@ -319,6 +330,116 @@ class Unit {
   }
 }
 
+class SpatialGrid {
+  constructor(cellSize = UNIT_COLLISION_DISTANCE) {
+    this.cellSize = cellSize;
+    this.cells = new Map();
+    this.items = [];
+  }
+
+  static forSparseItems(items) {
+    // Sparse sets get coarser cells so nearest-neighbour rings stay short.
+    if (!items.length) return new SpatialGrid();
+    const xs = items.map((item) => item.x);
+    const ys = items.map((item) => item.y);
+    const area = Math.max((Math.max(...xs) - Math.min(...xs)) * (Math.max(...ys) - Math.min(...ys)), UNIT_COLLISION_DISTANCE ** 2);
+    return new SpatialGrid(Math.max(UNIT_COLLISION_DISTANCE, Math.sqrt(area / items.length)));
+  }
+
+  key(cellX, cellY) {
+    return `${cellX},${cellY}`;
+  }
+
+  rebuild(items) {
+    this.cells.clear();
+    this.items = items;
+    this.bounds = { minX: Infinity, maxX: -Infinity, minY: Infinity, maxY: -Infinity };
+    items.forEach((item, index) => {
+      const cellX = Math.floor(item.x / this.cellSize);
+      const cellY = Math.floor(item.y / this.cellSize);
+      this.bounds.minX = Math.min(this.bounds.minX, cellX);
+      this.bounds.maxX = Math.max(this.bounds.maxX, cellX);
+      this.bounds.minY = Math.min(this.bounds.minY, cellY);
+      this.bounds.maxY = Math.max(this.bounds.maxY, cellY);
+      const key = this.key(cellX, cellY);
+      const cell = this.cells.get(key);
+      if (cell) {
+        cell.push(index);
+      } else {
+        this.cells.set(key, [index]);
+      }
+    });
+    return this;
+  }
+
+  forEachInRange(x, y, radius, callback) {
+    const reach = Math.ceil(radius / this.cellSize);
+    const cellX = Math.floor(x / this.cellSize);
+    const cellY = Math.floor(y / this.cellSize);
+    for (let offsetY = -reach; offsetY <= reach; offsetY += 1) {
+      for (let offsetX = -reach; offsetX <= reach; offsetX += 1) {
+        const cell = this.cells.get(this.key(cellX + offsetX, cellY + offsetY));
+        if (!cell) continue;
+        cell.forEach((index) => {
+          const item = this.items[index];
+          if (Math.hypot(item.x - x, item.y - y) <= radius) {
+            callback(item, index);
+          }
+        });
+      }
+    }
+  }
+
+  queryRange(x, y, radius) {
+    const found = [];
+    this.forEachInRange(x, y, radius, (item) => found.push(item));
+    return found;
+  }
+
+  nearest(x, y) {
+    if (!this.items.length) return null;
+    const cellX = Math.floor(x / this.cellSize);
+    const cellY = Math.floor(y / this.cellSize);
+    const { minX, maxX, minY, maxY } = this.bounds;
+    const lastRing = Math.max(Math.abs(cellX - minX), Math.abs(cellX - maxX), Math.abs(cellY - minY), Math.abs(cellY - maxY));
+    let best = null;
+    let bestIndex = -1;
+    let bestDistance = Infinity;
+    const visit = (offsetX, offsetY) => {
+      const cell = this.cells.get(this.key(cellX + offsetX, cellY + offsetY));
+      if (!cell) return;
+      cell.forEach((index) => {
+        const item = this.items[index];
+        const distance = Math.hypot(item.x - x, item.y - y);
+        if (distance < bestDistance || (distance === bestDistance && index < bestIndex)) {
+          best = item;
+          bestIndex = index;
+          bestDistance = distance;
+        }
+      });
+    };
+    // Search outward ring by ring; anything in a later ring is at least `ring` cells away.
+    for (let ring = 0; ring <= lastRing; ring += 1) {
+      if (ring === 0) {
+        visit(0, 0);
+      } else {
+        for (let offset = -ring; offset <= ring; offset += 1) {
+          visit(offset, -ring);
+          visit(offset, ring);
+        }
+        for (let offset = -ring + 1; offset <= ring - 1; offset += 1) {
+          visit(-ring, offset);
+          visit(ring, offset);
+        }
+      }
+      if (bestDistance < ring * this.cellSize) break;
+    }
+    return best;
+  }
+}
+
+const SpatialIndex = new SpatialGrid();
+
 const SpawnManager = {
   getSpawnPoint(player) {
     return GameplayMapRenderer.map?.spawnPoints?.[player.team] || { x: 300, y: 300 };
@@ -420,14 +541,18 @@ const UnitManager = {
 const CombatManager = {
   update() {
     const toRemove = new Set();
+    SpatialIndex.rebuild(units);
     for (let i = 0; i < units.length; i += 1) {
       const unitA = units[i];
       if (toRemove.has(unitA)) continue;
-      for (let j = i + 1; j < units.length; j += 1) {
+      const contacts = [];
+      SpatialIndex.forEachInRange(unitA.x, unitA.y, UNIT_COLLISION_DISTANCE, (unitB, j) => {
+        if (j > i && unitA.team !== unitB.team) contacts.push(j);
+      });
+      contacts.sort((a, b) => a - b);
+      for (const j of contacts) {
         const unitB = units[j];
-        if (toRemove.has(unitB) || unitA.team === unitB.team) continue;
-        const distance = Math.hypot(unitA.x - unitB.x, unitA.y - unitB.y);
-        if (distance > UNIT_COLLISION_DISTANCE) continue;
+        if (toRemove.has(unitB)) continue;
         if (unitA.strength > unitB.strength) {
           unitA.strength -= unitB.strength;
           toRemove.add(unitB);
@@ -487,12 +612,13 @@ const AIManager = {
     if (!player.units.length) return;
     const center = player.units.reduce((acc, unit) => ({ x: acc.x + unit.x / player.units.length, y: acc.y + unit.y / player.units.length }), { x: 0, y: 0 });
     const enemyUnits = units.filter((u) => u.team !== player.team);
+    const enemyGrid = SpatialGrid.forSparseItems(enemyUnits).rebuild(enemyUnits);
     player.units.forEach((unit, index) => {
       if (player.formationMode === FORMATION_MODES.DEFENSE) {
         const angle = (Math.PI * 2 * index) / Math.max(1, player.units.length);
         unit.moveTo(center.x + Math.cos(angle) * 30, center.y + Math.sin(angle) * 30, "defending");
       } else if (enemyUnits.length) {
-        const target = enemyUnits.reduce((best, enemy) => (Math.hypot(enemy.x - unit.x, enemy.y - unit.y) < Math.hypot(best.x - unit.x, best.y - unit.y) ? enemy : best), enemyUnits[0]);
+        const target = enemyGrid.nearest(unit.x, unit.y);
         unit.moveTo(target.x, target.y, "attacking");
       }
     });
@@ -539,6 +665,285 @@ const MatchFlowManager = {
     isPaused = true;
     UIManager.flashMessage(`${winnerTeam.toUpperCase()} wins! ${reason}`);
     UIManager.updateSpawnButtons();
+    if (MatchRelayClient.isActive()) {
+      MatchRelayClient.close();
+      refreshAccountState();
+      return;
+    }
+    MatchTelemetry.stop().then(() => reportMatchResult(winnerTeam));
+  },
+};
+
+// Locally simulated matches sample team totals once a second and upload them in batches.
+const MatchTelemetry = {
+  matchId: null,
+  elapsedSeconds: 0,
+  sampleAccumulator: 0,
+  flushAccumulator: 0,
+  pending: {},
+  start(matchId) {
+    this.matchId = matchId || null;
+    this.elapsedSeconds = 0;
+    this.sampleAccumulator = 0;
+    this.flushAccumulator = 0;
+    this.pending = {};
+  },
+  update(deltaSeconds) {
+    if (!this.matchId || MatchFlowManager.ended) {
+      return;
+    }
+    this.elapsedSeconds += deltaSeconds;
+    this.sampleAccumulator += deltaSeconds;
+    this.flushAccumulator += deltaSeconds;
+    if (this.sampleAccumulator >= TELEMETRY_SAMPLE_INTERVAL_SECONDS) {
+      this.sampleAccumulator -= TELEMETRY_SAMPLE_INTERVAL_SECONDS;
+      this.sample();
+    }
+    if (this.flushAccumulator >= TELEMETRY_FLUSH_INTERVAL_SECONDS) {
+      this.flushAccumulator = 0;
+      this.flush();
+    }
+  },
+  sample() {
+    const time = Math.round(this.elapsedSeconds * 1000) / 1000;
+    const add = (name, value) => {
+      const series = this.pending[name] || (this.pending[name] = { t: [], v: [] });
+      series.t.push(time);
+      series.v.push(value);
+    };
+    ["blue", "red"].forEach((team) => {
+      const teamPlayers = EconomyManager.players.filter((p) => p.team === team);
+      const teamUnits = units.filter((u) => u.team === team);
+      add(`gold.${team}`, teamPlayers.reduce((sum, p) => sum + p.gold, 0));
+      add(`strength.${team}`, teamUnits.reduce((sum, u) => sum + u.strength, 0));
+      add(`units.${team}`, teamUnits.length);
+      add(`objectives.${team}`, ObjectiveManager.objectives.filter((o) => o.owner === team).length);
+      add(`deployed.${team}`, teamPlayers.reduce((sum, p) => sum + p.totalUnitsCreated, 0));
+    });
+  },
+  async flush() {
+    const samples = this.pending;
+    this.pending = {};
+    if (!this.matchId || !Object.keys(samples).length) {
+      return;
+    }
+    try {
+      await apiPost("/api/match-telemetry", { id: this.matchId, samples });
+    } catch (error) {
+      console.error("Failed to upload match telemetry", error);
+    }
+  },
+  async stop() {
+    if (!this.matchId) {
+      return;
+    }
+    this.sample();
+    await this.flush();
+    this.matchId = null;
+  },
+};
+
+const MatchRelayClient = {
+  socket: null,
+  hello: null,
+  frames: new Map(),
+  latest: null,
+  appliedTick: 0,
+  ackedTick: 0,
+  outbox: [],
+  flushIntervalId: null,
+  players: [],
+  async connect(matchId) {
+    this.close();
+    try {
+      const data = await apiPost("/api/match-relay", { id: matchId });
+      const socket = new WebSocket(data.url);
+      socket.binaryType = "arraybuffer";
+      socket.onmessage = (event) => this.onMessage(event.data);
+      socket.onclose = () => {
+        if (this.socket === socket) {
+          this.close();
+        }
+      };
+      this.socket = socket;
+      this.flushIntervalId = setInterval(() => this.flush(), RELAY_FLUSH_INTERVAL_MS);
+    } catch (error) {
+      console.error("Match relay unavailable, simulating locally", error);
+    }
+  },
+  close() {
+    clearInterval(this.flushIntervalId);
+    this.flushIntervalId = null;
+    const socket = this.socket;
+    this.socket = null;
+    this.hello = null;
+    this.frames = new Map();
+    this.latest = null;
+    this.appliedTick = 0;
+    this.ackedTick = 0;
+    this.outbox = [];
+    if (socket && socket.readyState <= WebSocket.OPEN) {
+      socket.close();
+    }
+  },
+  isActive() {
+    return Boolean(this.socket && this.hello);
+  },
+  send(action, value = null) {
+    this.outbox.push({ action, value });
+  },
+  flush() {
+    // Inputs are batched per flush interval and carry the newest decoded tick as the delta base.
+    if (!this.socket || this.socket.readyState !== WebSocket.OPEN) {
+      return;
+    }
+    const ack = this.latest?.tick || 0;
+    if (!this.outbox.length && ack === this.ackedTick) {
+      return;
+    }
+    this.socket.send(JSON.stringify({ ack, commands: this.outbox.splice(0) }));
+    this.ackedTick = ack;
+  },
+  onMessage(data) {
+    if (typeof data === "string") {
+      this.hello = JSON.parse(data);
+      this.setupPlayers();
+      return;
+    }
+    try {
+      const frame = this.decode(data);
+      this.frames.set(frame.tick, frame);
+      while (this.frames.size > RELAY_HISTORY_TICKS) {
+        this.frames.delete(this.frames.keys().next().value);
+      }
+      this.latest = frame;
+    } catch (error) {
+      console.error("Dropped match snapshot", error);
+    }
+  },
+  decode(buffer) {
+    const view = new DataView(buffer);
+    const version = view.getUint8(0);
+    const kind = view.getUint8(1);
+    if (version !== 1 || kind !== 1) {
+      throw new Error("Unsupported snapshot");
+    }
+    const frame = {
+      tick: view.getUint32(2, true),
+      baseTick: view.getUint32(6, true),
+      remainingMs: view.getUint32(10, true),
+      serverTime: view.getFloat64(14, true),
+      winner: view.getInt8(22),
+      ended: (view.getUint8(23) & 1) === 1,
+      players: [],
+      objectives: [],
+      units: new Map(),
+    };
+    const playerCount = view.getUint8(24);
+    const objectiveCount = view.getUint8(25);
+    const changedCount = view.getUint16(26, true);
+    const removedCount = view.getUint16(28, true);
+    let offset = 30;
+    for (let i = 0; i < playerCount; i += 1, offset += 11) {
+      frame.players.push({
+        gold: view.getUint16(offset, true),
+        goldCap: view.getUint16(offset + 2, true),
+        formation: view.getUint8(offset + 4),
+        units: view.getUint16(offset + 5, true),
+        created: view.getUint16(offset + 7, true),
+        lost: view.getUint16(offset + 9, true),
+      });
+    }
+    for (let i = 0; i < objectiveCount; i += 1, offset += 1) {
+      frame.objectives.push(view.getInt8(offset));
+    }
+    if (frame.baseTick) {
+      const base = this.frames.get(frame.baseTick);
+      if (!base) {
+        throw new Error(`Missing base tick ${frame.baseTick}`);
+      }
+      base.units.forEach((unit, id) => frame.units.set(id, unit));
+    }
+    const scale = this.hello.position_scale;
+    for (let i = 0; i < changedCount; i += 1, offset += 11) {
+      const id = view.getUint32(offset, true);
+      frame.units.set(id, {
+        id,
+        x: view.getInt16(offset + 4, true) / scale,
+        y: view.getInt16(offset + 6, true) / scale,
+        strength: view.getUint8(offset + 8),
+        owner: view.getUint8(offset + 9),
+        state: view.getUint8(offset + 10),
+      });
+    }
+    for (let i = 0; i < removedCount; i += 1, offset += 4) {
+      frame.units.delete(view.getUint32(offset, true));
+    }
+    return frame;
+  },
+  setupPlayers() {
+    this.players = this.hello.players.map((player, index) => ({
+      id: `relay-${index}`,
+      name: player.name,
+      team: player.team,
+      gold: GAMEPLAY_CONFIG.startingGold,
+      goldCap: GAMEPLAY_CONFIG.baseGoldCap,
+      formationMode: FORMATION_MODES.DEFENSE,
+      units: [],
+      totalUnitsCreated: 0,
+      totalUnitsLost: 0,
+      isBot: player.bot,
+    }));
+    EconomyManager.players = this.players;
+    EconomyManager.humanPlayer = this.players.find((player) => player.name === this.hello.player) || this.players[0];
+    EconomyManager.botPlayers = this.players.filter((player) => player.isBot);
+    GameManager.selectedTeam = EconomyManager.humanPlayer.team;
+  },
+  applyLatest() {
+    const frame = this.latest;
+    if (!frame || frame.tick === this.appliedTick) {
+      return;
+    }
+    this.appliedTick = frame.tick;
+
+    const existing = new Map(units.map((unit) => [unit.serverId, unit]));
+    this.players.forEach((player, index) => {
+      const state = frame.players[index];
+      player.units = [];
+      player.gold = state.gold;
+      player.goldCap = state.goldCap;
+      player.formationMode = this.hello.formations[state.formation];
+      player.totalUnitsCreated = state.created;
+      player.totalUnitsLost = state.lost;
+    });
+    units = [];
+    frame.units.forEach((record) => {
+      const owner = this.players[record.owner];
+      let unit = existing.get(record.id);
+      if (!unit) {
+        unit = new Unit(record.x, record.y, owner);
+        unit.serverId = record.id;
+      }
+      unit.x = record.x;
+      unit.y = record.y;
+      unit.targetX = record.x;
+      unit.targetY = record.y;
+      unit.strength = record.strength;
+      units.push(unit);
+      owner.units.push(unit);
+    });
+    ObjectiveManager.objectives.forEach((objective, index) => {
+      const owner = frame.objectives[index];
+      objective.owner = owner >= 0 ? this.hello.teams[owner] : null;
+    });
+
+    MatchFlowManager.remainingMs = frame.remainingMs;
+    UIManager.updateTimer(frame.remainingMs);
+    UIManager.syncGoldDisplay();
+    UIManager.updateStrengthDisplay();
+    if (frame.ended) {
+      MatchFlowManager.finish(this.hello.teams[frame.winner], "Decided by the server.");
+    }
   },
 };
 
@@ -556,8 +961,9 @@ const ObjectiveManager = {
     }));
   },
   update() {
+    SpatialIndex.rebuild(units);
     this.objectives.forEach((objective) => {
-      const inRadius = units.filter((unit) => Math.hypot(unit.x - objective.x, unit.y - objective.y) <= objective.radius);
+      const inRadius = SpatialIndex.queryRange(objective.x, objective.y, objective.radius);
       const blueCount = inRadius.filter((u) => u.team === "blue").length;
       const redCount = inRadius.filter((u) => u.team === "red").length;
       const newOwner = blueCount > redCount ? "blue" : redCount > blueCount ? "red" : objective.owner;
@@ -579,14 +985,21 @@ const UIManager = {
     const spawnButton = document.getElementById("spawnInfantryBtn");
     if (spawnButton) {
       spawnButton.textContent = `Spawn Infantry (${UNIT_COST}g)`;
-      spawnButton.onclick = () => SpawnManager.spawnUnit(EconomyManager.humanPlayer);
+      spawnButton.onclick = () => {
+        if (!MatchRelayClient.isActive()) {
+          SpawnManager.spawnUnit(EconomyManager.humanPlayer);
+        }
+        sendMatchCommand("spawn");
+      };
     }
     document.getElementById("defenseModeBtn")?.addEventListener("click", () => {
       EconomyManager.humanPlayer.formationMode = FORMATION_MODES.DEFENSE;
+      sendMatchCommand("formation", FORMATION_MODES.DEFENSE);
       UIManager.flashMessage("Formation set to DEFENSE");
     });
     document.getElementById("attackModeBtn")?.addEventListener("click", () => {
       EconomyManager.humanPlayer.formationMode = FORMATION_MODES.ATTACK;
+      sendMatchCommand("formation", FORMATION_MODES.ATTACK);
       UIManager.flashMessage("Formation set to ATTACK");
     });
     this.updateSpawnButtons();
@@ -732,12 +1145,18 @@ const GameplayMapRenderer = {
   },
   update(deltaSeconds) {
     this.updateCamera(deltaSeconds);
+    if (MatchRelayClient.isActive()) {
+      MatchRelayClient.applyLatest();
+      UIManager.updateSpawnButtons();
+      return;
+    }
     EconomyManager.update(deltaSeconds);
     AIManager.update(deltaSeconds);
     UnitManager.update(deltaSeconds);
     CombatManager.update(deltaSeconds);
     ObjectiveManager.update();
     MatchFlowManager.update(deltaSeconds);
+    MatchTelemetry.update(deltaSeconds);
     UIManager.updateSpawnButtons();
   },
   getViewportWidth() {
@@ -1214,6 +1633,18 @@ function drawMapSceneWithCamera(ctx, map, camera, withLabels) {
   });
 }
 
+async function loadMapCatalogue() {
+  try {
+    const data = await apiGet("/api/maps");
+    if (Array.isArray(data.maps) && data.maps.length > 0) {
+      window.MAPS = data.maps;
+      updateMapPreview();
+    }
+  } catch (error) {
+    console.error("Failed to load map catalogue; using bundled maps", error);
+  }
+}
+
 function renderMapPreview(map) {
   const previewContainer = getElementOrLog("mapPreview");
   if (!previewContainer) {
@@ -1222,6 +1653,17 @@ function renderMapPreview(map) {
 
   previewContainer.textContent = "";
 
+  if (map.preview) {
+    const previewImage = document.createElement("img");
+    previewImage.src = map.preview;
+    previewImage.width = MAP_PREVIEW_SIZE;
+    previewImage.height = MAP_PREVIEW_SIZE;
+    previewImage.alt = map.name;
+    previewImage.className = "map-preview-canvas";
+    previewContainer.appendChild(previewImage);
+    return;
+  }
+
   const previewCanvas = document.createElement("canvas");
   previewCanvas.width = MAP_PREVIEW_SIZE;
   previewCanvas.height = MAP_PREVIEW_SIZE;
@@ -1272,7 +1714,19 @@ function syncLobbyFromServer(lobby) {
   }
 }
 
+function closeLobbyDetailsStream() {
+  if (lobbyDetailsEventSource) {
+    lobbyDetailsEventSource.close();
+    lobbyDetailsEventSource = null;
+  }
+}
+
 function stopLobbyPolling() {
+  if (lobbiesEventSource) {
+    lobbiesEventSource.close();
+    lobbiesEventSource = null;
+  }
+  closeLobbyDetailsStream();
   if (lobbiesPollIntervalId) {
     clearInterval(lobbiesPollIntervalId);
     lobbiesPollIntervalId = null;
@@ -1283,8 +1737,62 @@ function stopLobbyPolling() {
   }
 }
 
+function fallBackToLobbyPolling(error) {
+  console.error("Lobby stream unavailable, falling back to polling", error);
+  lobbyStreamsSupported = false;
+  startLobbyPolling();
+}
+
+function openLobbyDetailsStream(lobbyId) {
+  if (lobbyDetailsEventSource && lobbyDetailsEventSource.lobbyId === lobbyId) {
+    return;
+  }
+
+  closeLobbyDetailsStream();
+  if (!lobbyId) {
+    return;
+  }
+
+  const source = new EventSource(`/api/get-lobby/${encodeURIComponent(lobbyId)}/stream`);
+  source.lobbyId = lobbyId;
+  source.addEventListener("lobby", (event) => applyLobbyDetails(JSON.parse(event.data)));
+  // Closed sources stay referenced so the same lobby id is not reopened in a loop.
+  source.addEventListener("removed", () => source.close());
+  source.onerror = (error) => {
+    // A refused stream (the server is at its stream cap) closes without a "removed" event.
+    if (source.readyState === EventSource.CLOSED && lobbyDetailsEventSource === source) {
+      fallBackToLobbyPolling(error);
+    }
+  };
+  lobbyDetailsEventSource = source;
+}
+
+function startLobbyStreams() {
+  const source = new EventSource("/api/lobbies/stream");
+  source.addEventListener("lobbies", (event) => {
+    const data = JSON.parse(event.data);
+    lanLobbiesSeq = data.seq ?? null;
+    applyLobbies(data.lobbies);
+  });
+  source.onerror = (error) => {
+    if (source.readyState === EventSource.CLOSED && lobbiesEventSource === source) {
+      fallBackToLobbyPolling(error);
+    }
+  };
+  lobbiesEventSource = source;
+
+  // Only follows activeLobbyId locally; the lobby data itself arrives over the stream.
+  lobbyDetailsPollIntervalId = setInterval(() => openLobbyDetailsStream(activeLobbyId), 500);
+  openLobbyDetailsStream(activeLobbyId);
+}
+
 function startLobbyPolling() {
   stopLobbyPolling();
+  if (lobbyStreamsSupported) {
+    startLobbyStreams();
+    return;
+  }
+
   lobbiesPollIntervalId = setInterval(() => {
     fetchLobbies().catch((error) => console.error("Failed to poll lobbies", error));
   }, 3000);
@@ -1297,8 +1805,22 @@ function startLobbyPolling() {
 }
 
 async function fetchLobbies() {
-  const data = await apiGet("/api/lobbies");
-  lanLobbies = data.lobbies || [];
+  const path = lanLobbiesSeq === null ? "/api/lobbies" : `/api/lobbies?since=${lanLobbiesSeq}`;
+  const data = await apiGet(path);
+  lanLobbiesSeq = data.seq ?? null;
+  if (data.lobbies) {
+    applyLobbies(data.lobbies);
+    return;
+  }
+
+  const lobbiesById = new Map(lanLobbies.map((lobby) => [lobby.id, lobby]));
+  (data.removed || []).forEach((lobbyId) => lobbiesById.delete(lobbyId));
+  [...(data.added || []), ...(data.changed || [])].forEach((lobby) => lobbiesById.set(lobby.id, lobby));
+  applyLobbies([...lobbiesById.values()]);
+}
+
+function applyLobbies(lobbies) {
+  lanLobbies = lobbies || [];
   renderLanServerList();
   if (activeLobbyId && !lanLobbies.some((lobby) => lobby.id === activeLobbyId)) {
     activeLobbyId = null;
@@ -1310,6 +1832,10 @@ async function fetchLobbies() {
 
 async function fetchLobbyDetails(lobbyId) {
   const data = await apiGet(`/api/get-lobby/${encodeURIComponent(lobbyId)}`);
+  applyLobbyDetails(data);
+}
+
+function applyLobbyDetails(data) {
   const lobby = data.lobby;
   if (!lobby) {
     return;
@@ -1804,8 +2330,10 @@ async function restoreActiveMatchIfNeeded() {
       enterGame();
       GameplayMapRenderer.init(getSelectedMap());
       MatchFlowManager.init();
+      MatchTelemetry.start(match.host === currentPlayer.username ? match.id : null);
       UIManager.initGameplayUI();
       updateDashboard();
+      MatchRelayClient.connect(match.id);
     }
   } catch (error) {
     console.error("Failed to restore active match", error);
@@ -1862,6 +2390,41 @@ function setupSettingsHandlers() {
   });
 }
 
+async function sendMatchCommand(action, value = null) {
+  if (currentMode !== "lan" || !activeLobbyId) {
+    return;
+  }
+
+  if (MatchRelayClient.isActive()) {
+    MatchRelayClient.send(action, value);
+    return;
+  }
+
+  try {
+    await apiPost("/api/match-command", { id: activeLobbyId, action, value });
+  } catch (error) {
+    console.error("Failed to send match command", error);
+  }
+}
+
+async function reportMatchResult(winnerTeam) {
+  if (currentMode !== "lan" || !activeLobbyId || !currentPlayer) {
+    return;
+  }
+
+  const deployedUnits = {};
+  deployedUnits[currentPlayer.username] = EconomyManager.humanPlayer?.totalUnitsCreated || 0;
+  try {
+    const data = await apiPost("/api/report-match-result", { id: activeLobbyId, winner: winnerTeam, deployed_units: deployedUnits });
+    if (data.user) {
+      currentPlayer = { ...currentPlayer, ...data.user };
+      updateDashboard();
+    }
+  } catch (error) {
+    console.error("Failed to report match result", error);
+  }
+}
+
 async function apiPost(path, body) {
   const response = await fetch(path, {
     method: "POST",
@@ -2040,15 +2603,21 @@ function openSendGoldPopup() {
   createPopup({
     title: "Send Gold",
     fields: [
-      { name: "to", placeholder: "Target username" },
+      { name: "to", placeholder: "Target username(s), comma separated" },
       { name: "amount", placeholder: "Gold amount", type: "number" },
     ],
     submitLabel: "Send",
     onSubmit: async ({ to, amount }) => {
-      await apiPost("/api/dev-send-gold", {
-        to,
-        amount: Number(amount),
-      });
+      const recipients = String(to || "")
+        .split(",")
+        .map((name) => name.trim())
+        .filter(Boolean);
+      // Several recipients go out as one bulk request so they are paid together or not at all.
+      const body =
+        recipients.length > 1
+          ? { transfers: recipients.map((name) => ({ to: name, amount: Number(amount) })) }
+          : { to, amount: Number(amount) };
+      await apiPost("/api/dev-send-gold", body);
       await refreshAccountState();
       closePopup();
       return { message: "Gold sent." };
@@ -2081,6 +2650,7 @@ document.addEventListener("DOMContentLoaded", () => {
   loadSettings();
   updateMapPreview();
   updateModeUI();
+  loadMapCatalogue();
 
   addListenerById("backBtn", "click", goBack);
   addListenerById("btn-play", "click", () => setAppState("mapSelection"));
@@ -2155,8 +2725,10 @@ document.addEventListener("DOMContentLoaded", () => {
       enterGame();
       GameplayMapRenderer.init(getSelectedMap());
       MatchFlowManager.init();
+      MatchTelemetry.start(lobby.id);
       UIManager.initGameplayUI();
       updateDashboard();
+      MatchRelayClient.connect(lobby.id);
       return;
     }
 
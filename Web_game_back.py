@@ -1,20 +1,128 @@
-from flask import Flask, request, jsonify, send_from_directory, session
+from flask import Flask, Response, g, request, jsonify, session, stream_with_context
 import os
 import json
+import math
+import random
+import time
 from datetime import datetime, timedelta, timezone
 from uuid import uuid4
-from werkzeug.security import generate_password_hash, check_password_hash
+from itsdangerous import BadSignature, URLSafeSerializer, URLSafeTimedSerializer
+from werkzeug.security import generate_password_hash
+from account_store import CachedAccountStore, create_account_store
+from admission import AdmissionController, StreamSlots
+from game_maps import MapCatalogue
+from leaderboard import Leaderboard
+from lobby_expiry import LobbyExpiryScheduler
+from ledger import TransactionLedger, convert_json_ledger, decode_cursor, encode_cursor
+from lobby_shards import (
+    BODY_ROUTES,
+    FORWARD_TIMEOUT_SECONDS,
+    FORWARDED_REQUEST_HEADERS,
+    FORWARDED_RESPONSE_HEADERS,
+    PATH_ROUTES,
+    SHARD_HEADER,
+    PlayerDirectory,
+    ShardRouter,
+    ShardUnavailableError,
+    create_coordinator,
+)
+from match_store import REMOVE, MatchStore
+from matchmaking import MATCHMAKING_MODES, SqliteMatchmakingQueue
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, REGISTRY as metrics_registry, REQUEST_LATENCY
+from password_hashing import DEFAULT_HASH_METHOD, HashingOverloadedError, PasswordHasher
+from sampling_profiler import SlowRequestProfiler
+from static_assets import IMMUTABLE_CACHE_CONTROL, AssetBundle
+from telemetry import DEFAULT_MAX_POINTS, RESOLUTIONS as TELEMETRY_RESOLUTIONS, SimulationTelemetry, TelemetryStore, parse_samples
+
+try:
+    from match_relay import MatchRelay
+    from replay import ReplayReader, ReplayRecorder
+    from simulation import MatchSimulation, SimulationHost, build_roster, parse_move_order
+except ImportError:
+    MatchRelay = ReplayReader = ReplayRecorder = MatchSimulation = SimulationHost = build_roster = parse_move_order = None
 
 app = Flask(__name__)
 app.secret_key = os.environ.get("FLASK_SECRET_KEY", "your-secret-key")
 app.config["SESSION_PERMANENT"] = True
 app.permanent_session_lifetime = timedelta(days=7)
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-DB_PATH = os.path.join(BASE_DIR, "database.json")
-TRANSACTION_PATH = os.path.join(BASE_DIR, "transaction.json")
-MATCHES_PATH = os.path.join(BASE_DIR, "matches.json")
+DATA_DIR = os.environ.get("GAME_DATA_DIR", BASE_DIR)
+DB_PATH = os.path.join(DATA_DIR, "database.json")
+ACCOUNTS_DB_PATH = os.environ.get("ACCOUNTS_DB_PATH", os.path.join(DATA_DIR, "accounts.sqlite3"))
+ACCOUNT_STORAGE_BACKEND = os.environ.get("ACCOUNT_STORAGE_BACKEND", "sqlite")
+TRANSACTION_PATH = os.path.join(DATA_DIR, "transaction.json")
+TRANSACTIONS_DIR = os.environ.get("TRANSACTIONS_DIR", os.path.join(DATA_DIR, "transactions"))
+TRANSACTIONS_PAGE_LIMIT = 500
+BATCH_OPERATIONS = ("send_gold", "set_gold")
+BATCH_MAX_OPERATIONS = 1000
+STREAM_HEARTBEAT_SECONDS = 15
+LOBBY_TTL_SECONDS = float(os.environ.get("LOBBY_TTL_MINUTES", "30")) * 60
+MATCHES_PATH = os.path.join(DATA_DIR, "matches.json")
+# Lobbies are partitioned by id across LOBBY_SHARDS nodes; each node owns one shard and its own match directory.
+LOBBY_SHARDS = int(os.environ.get("LOBBY_SHARDS", "1"))
+LOBBY_SHARD = int(os.environ.get("LOBBY_SHARD", "0"))
+LOBBY_SHARD_URL = os.environ.get("LOBBY_SHARD_URL", f"http://127.0.0.1:{os.environ.get('GAME_PORT', '5000')}")
+LOBBY_COORDINATOR = os.environ.get("LOBBY_COORDINATOR", "sqlite")
+LOBBY_COORDINATOR_PATH = os.environ.get("LOBBY_COORDINATOR_PATH", os.path.join(DATA_DIR, "coordinator.sqlite3"))
+# Shared by every worker and shard on the machine, so players are paired whichever process takes their request.
+MATCHMAKING_DB_PATH = os.environ.get("MATCHMAKING_DB_PATH", os.path.join(DATA_DIR, "matchmaking.sqlite3"))
+LOBBY_LIST_REFRESH_SECONDS = 2
+MATCHES_DIR = os.environ.get("MATCHES_DIR", os.path.join(DATA_DIR, "matches" if LOBBY_SHARDS == 1 else f"matches-shard-{LOBBY_SHARD}"))
+MATCHES_ARCHIVE_PATH = os.path.join(DATA_DIR, "matches_archive.jsonl")
+REPLAYS_DIR = os.environ.get("REPLAYS_DIR", os.path.join(DATA_DIR, "replays"))
+TELEMETRY_DIR = os.environ.get("TELEMETRY_DIR", os.path.join(DATA_DIR, "telemetry"))
+TELEMETRY_MAX_POINTS = 5000
+PROFILES_DIR = os.environ.get("PROFILES_DIR", os.path.join(DATA_DIR, "profiles"))
+SLOW_REQUEST_PROFILING = os.environ.get("SLOW_REQUEST_PROFILING", "0") == "1"
+SLOW_REQUEST_THRESHOLD_MS = float(os.environ.get("SLOW_REQUEST_THRESHOLD_MS", "500"))
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN")
 DEVELOPER_USERNAME = "NapoleonDev"
 DEVELOPER_PASSWORD = "devpassword123"
+PROFILE_CACHE_TTL_SECONDS = float(os.environ.get("PROFILE_CACHE_TTL_SECONDS", "30"))
+PROFILE_CACHE_MAX_ENTRIES = int(os.environ.get("PROFILE_CACHE_MAX_ENTRIES", "1024"))
+PASSWORD_HASH_METHOD = os.environ.get("PASSWORD_HASH_METHOD", DEFAULT_HASH_METHOD)
+PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", "2"))
+PASSWORD_HASH_MAX_QUEUE = int(os.environ.get("PASSWORD_HASH_MAX_QUEUE", "32"))
+MATCH_TEAMS = ("blue", "red")
+MATCH_WIN_XP = 100
+MATCH_LOSS_XP = 25
+# Mirrors GAMEPLAY_CONFIG in Web_game.js: gold only comes from the starting purse and passive income.
+MATCH_STARTING_GOLD = 100
+MATCH_PASSIVE_GOLD_AMOUNT = 2
+MATCH_PASSIVE_GOLD_INTERVAL_MS = 3000
+MATCH_UNIT_COST = 10
+XP_PER_LEVEL = 500
+LEADERBOARD_DEFAULT_LIMIT = 10
+LEADERBOARD_MAX_LIMIT = 100
+LEADERBOARD_REFRESH_SECONDS = float(os.environ.get("LEADERBOARD_REFRESH_SECONDS", "60"))
+LEADERBOARD_WARM_UP_TIMEOUT_SECONDS = 30
+MAPS_SCRIPT_PATH = os.path.join(BASE_DIR, "maps.js")
+SERVER_SIMULATION = os.environ.get("SERVER_SIMULATION", "1") == "1" and SimulationHost is not None
+SIMULATION_TICK_RATE = int(os.environ.get("SIMULATION_TICK_RATE", "20"))
+MATCH_COMMANDS = ("spawn", "formation", "move")
+MATCH_RELAY_PORT = int(os.environ.get("MATCH_RELAY_PORT", "5001"))
+MATCH_RELAY_TOKEN_MAX_AGE = 60
+# The production launcher runs the one-time bootstrap checks once at boot and turns them off for its workers.
+BOOT_CHECKS = os.environ.get("GAME_BOOT_CHECKS", "1") == "1"
+WARM_PROFILE_COUNT = int(os.environ.get("WARM_PROFILE_COUNT", "100"))
+ADMISSION_CONTROL = os.environ.get("ADMISSION_CONTROL", "1") == "1"
+ADMISSION_MAX_IN_FLIGHT = int(os.environ.get("ADMISSION_MAX_IN_FLIGHT", "32"))
+# Keep well below the request threads per worker (server.py defaults it to half of --threads).
+STREAM_MAX_PER_WORKER = int(os.environ.get("STREAM_MAX_PER_WORKER", "16"))
+os.makedirs(DATA_DIR, exist_ok=True)
+account_store = create_account_store(ACCOUNT_STORAGE_BACKEND, DB_PATH, ACCOUNTS_DB_PATH)
+if PROFILE_CACHE_TTL_SECONDS > 0:
+    account_store = CachedAccountStore(account_store, PROFILE_CACHE_TTL_SECONDS, PROFILE_CACHE_MAX_ENTRIES)
+
+
+def authoritative_account(username):
+    # Password and role checks read the store itself, never a worker's cached copy.
+    if isinstance(account_store, CachedAccountStore):
+        return account_store.get_account_uncached(username)
+    return account_store.get_account(username)
+
+
+password_hasher = PasswordHasher(PASSWORD_HASH_METHOD, workers=PASSWORD_HASH_WORKERS, max_queue=PASSWORD_HASH_MAX_QUEUE)
 
 
 def _safe_int(value):
@@ -30,168 +138,188 @@ def _safe_int(value):
 
 
 def ensure_database():
-    if not os.path.exists(DB_PATH):
-        with open(DB_PATH, "w", encoding="utf-8") as db_file:
-            json.dump({"accounts": {}}, db_file, indent=2)
-
-    with open(DB_PATH, "r", encoding="utf-8") as db_file:
-        data = json.load(db_file)
-
-    if "accounts" not in data or not isinstance(data["accounts"], dict):
-        data["accounts"] = {}
-
-    if DEVELOPER_USERNAME not in data["accounts"]:
-        data["accounts"][DEVELOPER_USERNAME] = {
-            "password": generate_password_hash(DEVELOPER_PASSWORD),
-            "gold": 999999,
-            "xp": 999999,
-            "level": 99,
-            "wins": 0,
-            "losses": 0,
-            "total_matches": 0,
-            "total_deployed_units": 0,
-            "role": "developer",
-        }
+    if account_store.get_account(DEVELOPER_USERNAME) is None:
+        account_store.create_account(
+            DEVELOPER_USERNAME,
+            {
+                "password": generate_password_hash(DEVELOPER_PASSWORD, method=PASSWORD_HASH_METHOD),
+                "gold": 999999,
+                "xp": 999999,
+                "level": 99,
+                "wins": 0,
+                "losses": 0,
+                "total_matches": 0,
+                "total_deployed_units": 0,
+                "role": "developer",
+            },
+        )
+
+
+if BOOT_CHECKS:
+    ensure_database()
 
-    with open(DB_PATH, "w", encoding="utf-8") as db_file:
-        json.dump(data, db_file, indent=2)
 
+def load_database():
+    return account_store.load_all()
 
-def ensure_transaction_ledger():
-    if not os.path.exists(TRANSACTION_PATH):
-        with open(TRANSACTION_PATH, "w", encoding="utf-8") as transaction_file:
-            json.dump({"transactions": []}, transaction_file, indent=2)
 
-    with open(TRANSACTION_PATH, "r", encoding="utf-8") as transaction_file:
-        data = json.load(transaction_file)
+def save_database(data):
+    account_store.save_all(data)
+
+
+transaction_ledger = TransactionLedger(TRANSACTIONS_DIR)
+if BOOT_CHECKS:
+    convert_json_ledger(TRANSACTION_PATH, transaction_ledger)
+# The legacy file has no notion of shards, so it is only imported by an unsharded deployment.
+match_store = MatchStore(MATCHES_DIR, MATCHES_ARCHIVE_PATH, legacy_path=MATCHES_PATH if BOOT_CHECKS and LOBBY_SHARDS == 1 else None)
+shard_tokens = URLSafeSerializer(app.secret_key, salt="lobby-shard")
+lobby_coordinator = shard_router = player_directory = None
+if LOBBY_SHARDS > 1:
+    lobby_coordinator = create_coordinator(LOBBY_COORDINATOR, LOBBY_COORDINATOR_PATH)
+    lobby_coordinator.register_node(LOBBY_SHARD, LOBBY_SHARD_URL)
+    shard_router = ShardRouter(LOBBY_SHARD, LOBBY_SHARDS, lobby_coordinator, shard_tokens.dumps(LOBBY_SHARDS))
+    player_directory = PlayerDirectory(lobby_coordinator, LOBBY_SHARD)
+    match_store.add_listener(player_directory)
+map_catalogue = MapCatalogue.load(MAPS_SCRIPT_PATH)
+static_assets = AssetBundle(BASE_DIR)
+telemetry_store = TelemetryStore(TELEMETRY_DIR)
 
-    if "transactions" not in data or not isinstance(data["transactions"], list):
-        data["transactions"] = []
 
-    with open(TRANSACTION_PATH, "w", encoding="utf-8") as transaction_file:
-        json.dump(data, transaction_file, indent=2)
+def utc_now_iso():
+    return datetime.now(timezone.utc).isoformat()
 
 
-def ensure_matches_file():
-    if not os.path.exists(MATCHES_PATH):
-        with open(MATCHES_PATH, "w", encoding="utf-8") as matches_file:
-            json.dump({"matches": []}, matches_file, indent=2)
+def parse_created_at(match):
+    created_at_raw = match.get("created_at")
+    if not isinstance(created_at_raw, str):
+        return None
 
-    with open(MATCHES_PATH, "r", encoding="utf-8") as matches_file:
-        data = json.load(matches_file)
+    try:
+        created_at = datetime.fromisoformat(created_at_raw)
+    except ValueError:
+        return None
+    if created_at.tzinfo is None:
+        created_at = created_at.replace(tzinfo=timezone.utc)
+    return created_at
 
-    if "matches" not in data or not isinstance(data["matches"], list):
-        data["matches"] = []
 
-    with open(MATCHES_PATH, "w", encoding="utf-8") as matches_file:
-        json.dump(data, matches_file, indent=2)
+def is_expirable_lobby(match):
+    players = match.get("players", [])
+    if not isinstance(players, list):
+        players = []
+    return match.get("status") == "waiting" and len(players) <= 1
 
 
-def load_database():
-    ensure_database()
-    with open(DB_PATH, "r", encoding="utf-8") as db_file:
-        return json.load(db_file)
+def is_expired_lobby(match, cutoff):
+    created_at = parse_created_at(match)
+    return created_at is not None and created_at <= cutoff and is_expirable_lobby(match)
 
 
-def save_database(data):
-    with open(DB_PATH, "w", encoding="utf-8") as db_file:
-        json.dump(data, db_file, indent=2)
+def expire_lobby(lobby_id):
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=LOBBY_TTL_SECONDS)
+    match_store.update(lobby_id, lambda lobby: REMOVE if lobby is not None and is_expired_lobby(lobby, cutoff) else False)
 
 
-def load_transactions():
-    ensure_transaction_ledger()
-    with open(TRANSACTION_PATH, "r", encoding="utf-8") as transaction_file:
-        return json.load(transaction_file)
+def schedule_lobby_expiry(match_id, match):
+    if match is None or not is_expirable_lobby(match):
+        return
 
+    created_at = parse_created_at(match)
+    if created_at is not None:
+        lobby_expiry.schedule(match_id, created_at.timestamp())
 
-def save_transactions(data):
-    with open(TRANSACTION_PATH, "w", encoding="utf-8") as transaction_file:
-        json.dump(data, transaction_file, indent=2)
 
+lobby_expiry = LobbyExpiryScheduler(LOBBY_TTL_SECONDS, expire_lobby)
+match_store.add_listener(schedule_lobby_expiry)
+lobby_expiry.start()
+leaderboard = Leaderboard()
+leaderboard.start(lambda: account_store.load_all()["accounts"], LEADERBOARD_REFRESH_SECONDS)
+matchmaking_queue = SqliteMatchmakingQueue(MATCHMAKING_DB_PATH)
 
-def load_matches():
-    ensure_matches_file()
-    with open(MATCHES_PATH, "r", encoding="utf-8") as matches_file:
-        return json.load(matches_file)
 
+def normalize_match_response(match):
+    return {
+        "id": match.get("id"),
+        "host": match.get("host"),
+        "map": match.get("map"),
+        "mode": match.get("mode"),
+        "max_players": match.get("max_players", 2),
+        "players": match.get("players", []),
+        "status": match.get("status"),
+        "created_at": match.get("created_at"),
+        "game_time": match.get("game_time", 15),
+        "version": match.get("version", 0),
+    }
 
-def save_matches(data):
-    with open(MATCHES_PATH, "w", encoding="utf-8") as matches_file:
-        json.dump(data, matches_file, indent=2)
 
+def cached_json_response(payload, etag):
+    response = jsonify(payload)
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
 
-def utc_now_iso():
-    return datetime.now(timezone.utc).isoformat()
 
+def not_modified_response(etag):
+    if not request.if_none_match.contains(etag):
+        return None
+    response = Response(status=304)
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
 
-def cleanup_expired_lobbies(matches_data):
-    cutoff = datetime.now(timezone.utc) - timedelta(minutes=30)
-    retained_matches = []
-    for match in matches_data["matches"]:
-        if match.get("status") != "waiting":
-            retained_matches.append(match)
-            continue
 
-        created_at_raw = match.get("created_at")
-        if not isinstance(created_at_raw, str):
-            retained_matches.append(match)
-            continue
+def sse_event(event, payload):
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
 
-        try:
-            created_at = datetime.fromisoformat(created_at_raw)
-            if created_at.tzinfo is None:
-                created_at = created_at.replace(tzinfo=timezone.utc)
-        except ValueError:
-            retained_matches.append(match)
-            continue
 
-        players = match.get("players", [])
-        if not isinstance(players, list):
-            players = []
-        if created_at < cutoff and len(players) <= 1:
-            continue
+stream_slots = StreamSlots(STREAM_MAX_PER_WORKER)
 
-        retained_matches.append(match)
 
-    matches_data["matches"] = retained_matches
-    return matches_data
+def streams_full_response():
+    response = jsonify({"success": False, "error": "Too many open streams; poll instead."})
+    response.status_code = 503
+    response.headers["Retry-After"] = str(STREAM_HEARTBEAT_SECONDS)
+    return response
 
 
-def load_matches_with_cleanup(save_if_changed=False):
-    matches_data = load_matches()
-    original_count = len(matches_data["matches"])
-    cleanup_expired_lobbies(matches_data)
-    if save_if_changed and len(matches_data["matches"]) != original_count:
-        save_matches(matches_data)
-    return matches_data
+def hold_stream_slot(response):
+    # The slot is released when the server closes the response, whether the client left or the stream ended.
+    response.call_on_close(stream_slots.release)
+    return response
 
 
-def normalize_match_response(match):
+def sse_response(generator):
+    if not stream_slots.acquire(request_route()):
+        generator.close()
+        return streams_full_response()
+    return hold_stream_slot(
+        Response(
+            stream_with_context(generator),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+    )
+
+
+def transaction_entry(entry_type, from_user, to_user, amount):
     return {
-        "id": match.get("id"),
-        "host": match.get("host"),
-        "map": match.get("map"),
-        "mode": match.get("mode"),
-        "max_players": match.get("max_players", 2),
-        "players": match.get("players", []),
-        "status": match.get("status"),
-        "created_at": match.get("created_at"),
-        "game_time": match.get("game_time", 15),
+        "type": entry_type,
+        "from": from_user,
+        "to": to_user,
+        "amount": amount,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
     }
 
 
 def append_transaction(entry_type, from_user, to_user, amount):
-    ledger = load_transactions()
-    ledger["transactions"].append(
-        {
-            "type": entry_type,
-            "from": from_user,
-            "to": to_user,
-            "amount": amount,
-            "timestamp": datetime.now(timezone.utc).isoformat(),
-        }
-    )
-    save_transactions(ledger)
+    transaction_ledger.append(transaction_entry(entry_type, from_user, to_user, amount))
+
+
+def hashing_overloaded_response():
+    response = jsonify({"success": False, "error": "Server is busy, please try again shortly."})
+    response.status_code = 503
+    response.headers["Retry-After"] = "1"
+    return response
 
 
 def sanitize_player_response(username, account):
@@ -223,14 +351,22 @@ def full_user_response(username, account):
     }
 
 
+def asset_response(path):
+    served = static_assets.respond(path, request.headers)
+    if served is None:
+        return jsonify({"success": False, "error": "Not found."}), 404
+    status, headers, body = served
+    return Response(body, status=status, headers=headers)
+
+
 @app.route("/")
 def serve_index():
-    return send_from_directory(BASE_DIR, "Web_game.html")
+    return asset_response("Web_game.html")
 
 
 @app.route("/<path:filename>")
 def serve_files(filename):
-    return send_from_directory(BASE_DIR, filename)
+    return asset_response(filename)
 
 
 @app.route("/api/login", methods=["POST"])
@@ -242,12 +378,20 @@ def login_player():
     if not username or not isinstance(password, str):
         return jsonify({"success": False, "error": "Username and password are required."}), 400
 
-    data = load_database()
-    account = data["accounts"].get(username)
+    account = authoritative_account(username)
+    verified = False
+    if account:
+        try:
+            verified, upgraded_hash = password_hasher.verify(account.get("password", ""), password)
+        except HashingOverloadedError:
+            return hashing_overloaded_response()
 
-    if not account or not check_password_hash(account.get("password", ""), password):
+    if not verified:
         return jsonify({"success": False, "error": "Invalid username or password."}), 401
 
+    if upgraded_hash:
+        account_store.update_account(username, {"password": upgraded_hash})
+
     session.permanent = True
     session["username"] = username
     return jsonify({"success": True, "player": sanitize_player_response(username, account)})
@@ -271,12 +415,16 @@ def create_account():
     if len(password) < 6:
         return jsonify({"success": False, "error": "Password must be at least 6 characters."}), 400
 
-    data = load_database()
-    if username in data["accounts"]:
+    if account_store.get_account(username) is not None:
         return jsonify({"success": False, "error": "Username already exists."}), 409
 
-    data["accounts"][username] = {
-        "password": generate_password_hash(password),
+    try:
+        password_hash = password_hasher.hash_password(password)
+    except HashingOverloadedError:
+        return hashing_overloaded_response()
+
+    account = {
+        "password": password_hash,
         "gold": 1000,
         "xp": 0,
         "level": 1,
@@ -286,11 +434,14 @@ def create_account():
         "total_deployed_units": 0,
         "role": "player",
     }
-    save_database(data)
+    if not account_store.create_account(username, account):
+        return jsonify({"success": False, "error": "Username already exists."}), 409
+    leaderboard.update(username, account)
+
     session.permanent = True
     session["username"] = username
 
-    return jsonify({"success": True, "message": "Account created.", "player": sanitize_player_response(username, data["accounts"][username])}), 201
+    return jsonify({"success": True, "message": "Account created.", "player": sanitize_player_response(username, account)}), 201
 
 
 @app.route("/get_current_user", methods=["GET"])
@@ -300,8 +451,7 @@ def get_current_user():
     if not username:
         return jsonify({"success": False})
 
-    data = load_database()
-    account = data["accounts"].get(username)
+    account = account_store.get_account(username)
     if not account:
         session.pop("username", None)
         return jsonify({"success": False})
@@ -338,8 +488,7 @@ def dev_set_gold():
     if amount < 0:
         return jsonify({"success": False, "error": "Amount cannot be negative."}), 400
 
-    data = load_database()
-    account = data["accounts"].get(session_username)
+    account = authoritative_account(session_username)
 
     if not account:
         session.pop("username", None)
@@ -348,8 +497,7 @@ def dev_set_gold():
     if account.get("role") != "developer":
         return jsonify({"success": False, "error": "Forbidden."}), 403
 
-    account["gold"] = amount
-    save_database(data)
+    account_store.update_account(session_username, {"gold": amount})
     append_transaction("dev_set", session_username, session_username, amount)
 
     return jsonify({"success": True, "updated_gold": amount})
@@ -364,6 +512,12 @@ def dev_send_gold():
     if not session_username:
         return jsonify({"success": False, "error": "You must be logged in."}), 401
 
+    if "transfers" in payload:
+        transfers = payload.get("transfers")
+        if not isinstance(transfers, list):
+            return jsonify({"success": False, "error": "transfers must be a list."}), 400
+        return run_gold_batch(session_username, [dict(transfer, op="send_gold") if isinstance(transfer, dict) else transfer for transfer in transfers])
+
     try:
         amount = _safe_int(payload.get("amount"))
     except ValueError:
@@ -372,9 +526,7 @@ def dev_send_gold():
     if amount <= 0:
         return jsonify({"success": False, "error": "Amount must be greater than zero."}), 400
 
-    data = load_database()
-    sender = data["accounts"].get(session_username)
-    target = data["accounts"].get(target_name)
+    sender = authoritative_account(session_username)
 
     if not sender:
         session.pop("username", None)
@@ -383,14 +535,198 @@ def dev_send_gold():
     if sender.get("role") != "developer":
         return jsonify({"success": False, "error": "Forbidden."}), 403
 
-    if not target:
+    target_gold = account_store.add_gold(target_name, amount)
+    if target_gold is None:
         return jsonify({"success": False, "error": "Target account not found."}), 404
 
-    target["gold"] += amount
-    save_database(data)
+    if target_name == session_username:
+        sender["gold"] = target_gold
     append_transaction("dev_send", session_username, target_name, amount)
 
-    return jsonify({"success": True, "target": target_name, "amount": amount, "target_gold": target["gold"], "updated_gold": sender["gold"]})
+    return jsonify({"success": True, "target": target_name, "amount": amount, "target_gold": target_gold, "updated_gold": sender["gold"]})
+
+
+@app.route("/api/dev-profile-cache", methods=["GET"])
+def dev_profile_cache():
+    session_username = session.get("username")
+    if not session_username:
+        return jsonify({"success": False, "error": "You must be logged in."}), 401
+
+    account = authoritative_account(session_username)
+    if not account or account.get("role") != "developer":
+        return jsonify({"success": False, "error": "Forbidden."}), 403
+
+    if not isinstance(account_store, CachedAccountStore):
+        return jsonify({"success": True, "enabled": False})
+    return jsonify({"success": True, "enabled": True, "stats": account_store.stats()})
+
+
+def parse_gold_operation(raw, actor):
+    if not isinstance(raw, dict):
+        return None, "Operation must be an object."
+
+    op = raw.get("op")
+    if op not in BATCH_OPERATIONS:
+        return None, f"op must be one of {', '.join(BATCH_OPERATIONS)}."
+
+    try:
+        amount = _safe_int(raw.get("amount"))
+    except ValueError:
+        return None, "Amount must be a valid integer."
+
+    if op == "set_gold":
+        if amount < 0:
+            return None, "Amount cannot be negative."
+        return {"op": op, "to": actor, "amount": amount}, None
+
+    target_name = raw.get("to")
+    target_name = target_name.strip() if isinstance(target_name, str) else ""
+    if not target_name:
+        return None, "Target username is required."
+    if amount <= 0:
+        return None, "Amount must be greater than zero."
+    return {"op": op, "to": target_name, "amount": amount}, None
+
+
+def run_gold_batch(session_username, raw_operations):
+    # Validate everything first, then apply all of it in one account commit and one ledger append.
+    if not raw_operations:
+        return jsonify({"success": False, "error": "At least one operation is required."}), 400
+
+    if len(raw_operations) > BATCH_MAX_OPERATIONS:
+        return jsonify({"success": False, "error": f"At most {BATCH_MAX_OPERATIONS} operations per batch."}), 400
+
+    account = authoritative_account(session_username)
+    if not account:
+        session.pop("username", None)
+        return jsonify({"success": False, "error": "Account not found."}), 404
+
+    if account.get("role") != "developer":
+        return jsonify({"success": False, "error": "Forbidden."}), 403
+
+    operations = []
+    results = []
+    for index, raw in enumerate(raw_operations):
+        operation, error = parse_gold_operation(raw, session_username)
+        operations.append(operation)
+        result = dict(operation or {}, index=index, success=error is None)
+        if error:
+            result["error"] = error
+        results.append(result)
+    if any(not result["success"] for result in results):
+        return jsonify({"success": False, "error": "Batch rejected; nothing was applied.", "results": results}), 400
+
+    with account_store.transaction() as accounts:
+        missing = sorted({operation["to"] for operation in operations if accounts.get(operation["to"]) is None})
+        if not missing:
+            for operation, result in zip(operations, results):
+                target = accounts[operation["to"]]
+                if operation["op"] == "set_gold":
+                    target["gold"] = operation["amount"]
+                else:
+                    target["gold"] = target.get("gold", 0) + operation["amount"]
+                accounts[operation["to"]] = target
+                result["gold"] = target["gold"]
+
+    if missing:
+        for result in results:
+            if result["to"] in missing:
+                result.update(success=False, error="Target account not found.")
+        return jsonify({"success": False, "error": "Batch rejected; nothing was applied.", "results": results}), 404
+
+    transaction_ledger.append_many(
+        [
+            transaction_entry("dev_set" if operation["op"] == "set_gold" else "dev_send", session_username, operation["to"], operation["amount"])
+            for operation in operations
+        ]
+    )
+    return jsonify({"success": True, "results": results})
+
+
+@app.route("/api/batch", methods=["POST"])
+def batch_operations():
+    payload = request.get_json(silent=True) or {}
+    session_username = session.get("username")
+    operations = payload.get("operations")
+
+    if not session_username:
+        return jsonify({"success": False, "error": "You must be logged in."}), 401
+
+    if not isinstance(operations, list):
+        return jsonify({"success": False, "error": "operations must be a list."}), 400
+
+    return run_gold_batch(session_username, operations)
+
+
+@app.route("/api/transactions", methods=["GET"])
+def get_transactions():
+    session_username = session.get("username")
+    if not session_username:
+        return jsonify({"success": False, "error": "You must be logged in."}), 401
+
+    account = authoritative_account(session_username)
+    if not account:
+        session.pop("username", None)
+        return jsonify({"success": False, "error": "Account not found."}), 404
+
+    user = (request.args.get("user") or "").strip() or None
+    if account.get("role") != "developer":
+        if user not in (None, session_username):
+            return jsonify({"success": False, "error": "Forbidden."}), 403
+        user = session_username
+
+    since = request.args.get("since")
+    until = request.args.get("until")
+    for value in (since, until):
+        if value is None:
+            continue
+        try:
+            datetime.fromisoformat(value)
+        except ValueError:
+            return jsonify({"success": False, "error": "since and until must be ISO 8601 timestamps."}), 400
+
+    try:
+        limit = _safe_int(request.args.get("limit", 50))
+        cursor = decode_cursor(request.args["cursor"]) if request.args.get("cursor") else None
+    except ValueError:
+        return jsonify({"success": False, "error": "Invalid limit or cursor."}), 400
+
+    if limit <= 0:
+        return jsonify({"success": False, "error": "Limit must be greater than zero."}), 400
+
+    try:
+        transactions, next_cursor = transaction_ledger.query(user=user, since=since, until=until, limit=min(limit, TRANSACTIONS_PAGE_LIMIT), cursor=cursor)
+    except ValueError:
+        return jsonify({"success": False, "error": "Invalid cursor."}), 400
+    return jsonify({"success": True, "transactions": transactions, "next_cursor": encode_cursor(next_cursor)})
+
+
+@app.route("/api/maps", methods=["GET"])
+def get_maps():
+    not_modified = not_modified_response(map_catalogue.version)
+    if not_modified is not None:
+        return not_modified
+    response = Response(map_catalogue.body, mimetype="application/json")
+    response.set_etag(map_catalogue.version)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
+@app.route("/api/maps/<map_id>/preview.svg", methods=["GET"])
+def get_map_preview(map_id):
+    compiled = map_catalogue.get(map_id)
+    if compiled is None:
+        return jsonify({"success": False, "error": "Unknown map."}), 404
+
+    # Versioned URLs never change content; bare ones revalidate against the map version.
+    immutable = request.args.get("v") == compiled.version
+    not_modified = None if immutable else not_modified_response(compiled.version)
+    if not_modified is not None:
+        return not_modified
+    response = Response(compiled.preview_svg, mimetype="image/svg+xml")
+    response.set_etag(compiled.version)
+    response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL if immutable else "no-cache"
+    return response
 
 
 @app.route("/create_match", methods=["POST"])
@@ -418,14 +754,17 @@ def create_match():
     if not match_map or not mode:
         return jsonify({"success": False, "error": "Map and mode are required."}), 400
 
+    if match_map not in map_catalogue:
+        return jsonify({"success": False, "error": "Unknown map."}), 400
+
     if players not in (2, 4):
         return jsonify({"success": False, "error": "Players must be 2 or 4."}), 400
 
     if time_value <= 0:
         return jsonify({"success": False, "error": "Time must be greater than zero."}), 400
 
-    matches_data = load_matches()
     new_match = {
+        "id": new_lobby_id(),
         "host": host,
         "map": match_map,
         "mode": mode,
@@ -433,12 +772,47 @@ def create_match():
         "time": time_value,
         "status": status,
     }
-    matches_data["matches"].append(new_match)
-    save_matches(matches_data)
+    match_store.add(new_match)
 
     return jsonify({"success": True, "match": new_match}), 201
 
 
+def new_lobby_id():
+    # A sharded node only hands out ids that hash to its own shard, so new lobbies stay where they were created.
+    lobby_id = str(uuid4())
+    while match_store.contains(lobby_id) or (shard_router is not None and shard_router.owner(lobby_id) != LOBBY_SHARD):
+        lobby_id = str(uuid4())
+    return lobby_id
+
+
+def active_match_for(username):
+    match = match_store.match_for_player(username)
+    if match is not None or shard_router is None:
+        return match
+
+    # Not on this shard: the coordinator's directory says which shard holds the player's match.
+    entry = lobby_coordinator.active_match(username)
+    if entry is None:
+        return None
+    match_id, shard = entry
+    if shard == LOBBY_SHARD:
+        return match_store.get(match_id)
+    data = shard_router.fetch_json(shard, f"/api/shard/matches/{match_id}")
+    return data["match"] if data else None
+
+
+def waiting_lobbies():
+    lobbies = [normalize_match_response(match) for match in match_store.waiting()]
+    if shard_router is None:
+        return lobbies
+    results, _ = shard_router.gather("/api/shard/lobbies")
+    for data in results.values():
+        if data:
+            lobbies.extend(data["lobbies"])
+    lobbies.sort(key=lambda lobby: lobby.get("created_at") or "")
+    return lobbies
+
+
 @app.route("/api/create-lobby", methods=["POST"])
 def create_lobby():
     payload = request.get_json(silent=True) or {}
@@ -459,20 +833,18 @@ def create_lobby():
     if not map_id:
         return jsonify({"success": False, "error": "Map is required."}), 400
 
+    if map_id not in map_catalogue:
+        return jsonify({"success": False, "error": "Unknown map."}), 400
+
     if game_time <= 0:
         return jsonify({"success": False, "error": "Game time must be greater than zero."}), 400
 
-    matches_data = load_matches_with_cleanup(save_if_changed=True)
-    if any(isinstance(match.get("players"), list) and username in match.get("players", []) and match.get("status") in ("waiting", "in_progress") for match in matches_data["matches"]):
+    active_match = active_match_for(username)
+    if active_match and active_match.get("status") in ("waiting", "in_progress"):
         return jsonify({"success": False, "error": "You are already in an active lobby or match."}), 409
 
-    lobby_id = str(uuid4())
-    existing_ids = {match.get("id") for match in matches_data["matches"]}
-    while lobby_id in existing_ids:
-        lobby_id = str(uuid4())
-
     lobby = {
-        "id": lobby_id,
+        "id": new_lobby_id(),
         "host": username,
         "map": map_id,
         "mode": mode,
@@ -483,25 +855,111 @@ def create_lobby():
         "created_at": utc_now_iso(),
         "game_time": game_time,
     }
-    matches_data["matches"].append(lobby)
-    save_matches(matches_data)
+    match_store.add(lobby)
     return jsonify({"success": True, "lobby": normalize_match_response(lobby)}), 201
 
 
 @app.route("/api/lobbies", methods=["GET"])
 def get_lobbies():
-    matches_data = load_matches_with_cleanup(save_if_changed=True)
-    waiting = [normalize_match_response(match) for match in matches_data["matches"] if match.get("status") == "waiting"]
-    return jsonify({"success": True, "lobbies": waiting})
+    since_raw = request.args.get("since")
+    try:
+        since = _safe_int(since_raw) if since_raw is not None else None
+    except ValueError:
+        return jsonify({"success": False, "error": "since must be an integer."}), 400
+
+    if shard_router is not None:
+        # Per-shard journals have no shared sequence, so sharded listings are always complete.
+        return jsonify({"success": True, "seq": None, "lobbies": waiting_lobbies()})
+
+    seq = match_store.change_seq
+    etag = f"lobbies-{seq}-{since}"
+    not_modified = not_modified_response(etag)
+    if not_modified:
+        return not_modified
+
+    changed = None
+    if since is not None:
+        changed, seq = match_store.changes_since(since)
+
+    if changed is None:
+        waiting = [normalize_match_response(match) for match in match_store.waiting()]
+        return cached_json_response({"success": True, "seq": seq, "lobbies": waiting}, f"lobbies-{seq}-{since}")
+
+    added, updated, removed = [], [], []
+    for match_id, created in changed.items():
+        match = match_store.get(match_id)
+        if not match or match.get("status") != "waiting":
+            removed.append(match_id)
+        elif created:
+            added.append(normalize_match_response(match))
+        else:
+            updated.append(normalize_match_response(match))
+    return cached_json_response({"success": True, "seq": seq, "added": added, "changed": updated, "removed": removed}, f"lobbies-{seq}-{since}")
+
+
+@app.route("/api/lobbies/stream", methods=["GET"])
+def stream_lobbies():
+    # Other shards' lobbies are not in the local journal, so a sharded stream re-reads them on a short interval.
+    refresh_seconds = STREAM_HEARTBEAT_SECONDS if shard_router is None else LOBBY_LIST_REFRESH_SECONDS
+
+    def generate():
+        sequence = match_store.sequence
+        last_payload = None
+        last_sent_at = time.monotonic()
+        while True:
+            seq = match_store.change_seq if shard_router is None else None
+            lobbies = waiting_lobbies()
+            if lobbies != last_payload:
+                last_payload = lobbies
+                last_sent_at = time.monotonic()
+                yield sse_event("lobbies", {"seq": seq, "lobbies": lobbies})
+
+            next_sequence = match_store.wait_for_change(sequence, refresh_seconds)
+            if next_sequence == sequence and time.monotonic() - last_sent_at >= STREAM_HEARTBEAT_SECONDS:
+                last_sent_at = time.monotonic()
+                yield ": keep-alive\n\n"
+            sequence = next_sequence
+
+    return sse_response(generate())
+
+
+@app.route("/api/get-lobby/<lobby_id>/stream", methods=["GET"])
+def stream_lobby(lobby_id):
+    if not match_store.get(lobby_id):
+        return jsonify({"success": False, "error": "Lobby not found."}), 404
+
+    def generate():
+        sequence = match_store.sequence
+        last_version = None
+        while True:
+            lobby = match_store.get(lobby_id)
+            if not lobby:
+                yield sse_event("removed", {"id": lobby_id})
+                return
+
+            if lobby.get("version") != last_version:
+                last_version = lobby.get("version")
+                yield sse_event("lobby", {"lobby": normalize_match_response(lobby), "teams": lobby.get("teams", {})})
+
+            next_sequence = match_store.wait_for_change(sequence, STREAM_HEARTBEAT_SECONDS)
+            if next_sequence == sequence:
+                yield ": keep-alive\n\n"
+            sequence = next_sequence
+
+    return sse_response(generate())
 
 
 @app.route("/api/get-lobby/<lobby_id>", methods=["GET"])
 def get_lobby(lobby_id):
-    matches_data = load_matches_with_cleanup(save_if_changed=True)
-    lobby = next((match for match in matches_data["matches"] if match.get("id") == lobby_id), None)
+    lobby = match_store.get(lobby_id)
     if not lobby:
         return jsonify({"success": False, "error": "Lobby not found."}), 404
-    return jsonify({"success": True, "lobby": normalize_match_response(lobby), "teams": lobby.get("teams", {})})
+
+    etag = f"lobby-{lobby_id}-{lobby.get('version', 0)}"
+    not_modified = not_modified_response(etag)
+    if not_modified:
+        return not_modified
+    return cached_json_response({"success": True, "lobby": normalize_match_response(lobby), "teams": lobby.get("teams", {})}, etag)
 
 
 @app.route("/api/join-lobby", methods=["POST"])
@@ -516,21 +974,24 @@ def join_lobby():
     if not lobby_id:
         return jsonify({"success": False, "error": "Lobby id is required."}), 400
 
-    matches_data = load_matches_with_cleanup(save_if_changed=True)
-    lobby = next((match for match in matches_data["matches"] if match.get("id") == lobby_id), None)
-    if not lobby or lobby.get("status") != "waiting":
-        return jsonify({"success": False, "error": "Lobby is unavailable."}), 404
+    def apply_join(lobby):
+        if not lobby or lobby.get("status") != "waiting":
+            return jsonify({"success": False, "error": "Lobby is unavailable."}), 404
+
+        players = lobby.setdefault("players", [])
+        if username in players:
+            return jsonify({"success": True, "lobby": normalize_match_response(lobby)})
 
-    players = lobby.setdefault("players", [])
-    if username in players:
-        return jsonify({"success": True, "lobby": normalize_match_response(lobby)})
+        if len(players) >= lobby.get("max_players", 2):
+            return jsonify({"success": False, "error": "Lobby is full."}), 409
 
-    if len(players) >= lobby.get("max_players", 2):
-        return jsonify({"success": False, "error": "Lobby is full."}), 409
+        players.append(username)
+        lobby.setdefault("teams", {})[username] = None
+        return None
 
-    players.append(username)
-    lobby.setdefault("teams", {})[username] = None
-    save_matches(matches_data)
+    outcome, lobby = match_store.update(lobby_id, apply_join)
+    if outcome is not None:
+        return outcome
     return jsonify({"success": True, "lobby": normalize_match_response(lobby)})
 
 
@@ -543,18 +1004,20 @@ def leave_lobby():
     if not username:
         return jsonify({"success": False, "error": "You must be logged in."}), 401
 
-    matches_data = load_matches_with_cleanup(save_if_changed=True)
-    lobby_index = next((idx for idx, match in enumerate(matches_data["matches"]) if match.get("id") == lobby_id), None)
-    if lobby_index is None:
-        return jsonify({"success": False, "error": "Lobby not found."}), 404
+    def apply_leave(lobby):
+        if lobby is None:
+            return jsonify({"success": False, "error": "Lobby not found."}), 404
+
+        if username == lobby.get("host"):
+            return REMOVE
 
-    lobby = matches_data["matches"][lobby_index]
-    if username == lobby.get("host"):
-        matches_data["matches"].pop(lobby_index)
-    else:
         lobby["players"] = [player for player in lobby.get("players", []) if player != username]
         lobby.setdefault("teams", {}).pop(username, None)
-    save_matches(matches_data)
+        return None
+
+    outcome, _ = match_store.update(lobby_id, apply_leave)
+    if outcome is not None and outcome is not REMOVE:
+        return outcome
     return jsonify({"success": True})
 
 
@@ -571,24 +1034,27 @@ def set_lobby_team():
     if team not in ("blue", "red"):
         return jsonify({"success": False, "error": "Invalid team."}), 400
 
-    matches_data = load_matches_with_cleanup(save_if_changed=True)
-    lobby = next((match for match in matches_data["matches"] if match.get("id") == lobby_id), None)
-    if not lobby or lobby.get("status") != "waiting":
-        return jsonify({"success": False, "error": "Lobby unavailable."}), 404
+    def apply_team(lobby):
+        if not lobby or lobby.get("status") != "waiting":
+            return jsonify({"success": False, "error": "Lobby unavailable."}), 404
+
+        players = lobby.get("players", [])
+        if username not in players:
+            return jsonify({"success": False, "error": "You are not a member of this lobby."}), 403
 
-    players = lobby.get("players", [])
-    if username not in players:
-        return jsonify({"success": False, "error": "You are not a member of this lobby."}), 403
+        slots_per_team = 2 if lobby.get("mode") == "2v2" else 1
+        teams = lobby.setdefault("teams", {})
+        existing_count = sum(1 for player, assigned in teams.items() if assigned == team and player != username)
+        if existing_count >= slots_per_team:
+            return jsonify({"success": False, "error": "Team is full."}), 409
 
-    slots_per_team = 2 if lobby.get("mode") == "2v2" else 1
-    teams = lobby.setdefault("teams", {})
-    existing_count = sum(1 for player, assigned in teams.items() if assigned == team and player != username)
-    if existing_count >= slots_per_team:
-        return jsonify({"success": False, "error": "Team is full."}), 409
+        teams[username] = team
+        return None
 
-    teams[username] = team
-    save_matches(matches_data)
-    return jsonify({"success": True, "lobby": normalize_match_response(lobby), "teams": teams})
+    outcome, lobby = match_store.update(lobby_id, apply_team)
+    if outcome is not None:
+        return outcome
+    return jsonify({"success": True, "lobby": normalize_match_response(lobby), "teams": lobby["teams"]})
 
 
 @app.route("/api/start-match", methods=["POST"])
@@ -600,42 +1066,749 @@ def start_match():
     if not username:
         return jsonify({"success": False, "error": "You must be logged in."}), 401
 
-    matches_data = load_matches_with_cleanup(save_if_changed=True)
-    lobby = next((match for match in matches_data["matches"] if match.get("id") == lobby_id), None)
-    if not lobby:
-        return jsonify({"success": False, "error": "Lobby not found."}), 404
+    def apply_start(lobby):
+        if not lobby:
+            return jsonify({"success": False, "error": "Lobby not found."}), 404
+
+        if lobby.get("host") != username:
+            return jsonify({"success": False, "error": "Only host can start the match."}), 403
 
-    if lobby.get("host") != username:
-        return jsonify({"success": False, "error": "Only host can start the match."}), 403
+        if lobby.get("status") != "waiting":
+            return jsonify({"success": False, "error": "Match already started."}), 409
 
-    if lobby.get("status") != "waiting":
-        return jsonify({"success": False, "error": "Match already started."}), 409
+        if len(lobby.get("players", [])) < lobby.get("max_players", 2):
+            return jsonify({"success": False, "error": "Not all player slots are filled."}), 409
 
-    if len(lobby.get("players", [])) < lobby.get("max_players", 2):
-        return jsonify({"success": False, "error": "Not all player slots are filled."}), 409
+        lobby["status"] = "in_progress"
+        if simulation_host is not None and lobby.get("map") in map_catalogue:
+            lobby["simulation"] = "server"
+        return None
 
-    lobby["status"] = "in_progress"
-    save_matches(matches_data)
+    outcome, lobby = match_store.update(lobby_id, apply_start)
+    if outcome is not None:
+        return outcome
+    if lobby.get("simulation") == "server":
+        start_simulation(lobby)
     return jsonify({"success": True, "lobby": normalize_match_response(lobby)})
 
 
+def create_matchmade_lobby(mode, group):
+    # Anyone who found a game on their own meanwhile is dropped; the rest go back in line with their wait time.
+    available = []
+    for entry in group:
+        active_match = active_match_for(entry[2])
+        if not active_match or active_match.get("status") not in ("waiting", "in_progress"):
+            available.append(entry)
+    if len(available) < len(group):
+        matchmaking_queue.requeue(mode, available)
+        return None
+
+    # Strongest and weakest share a team in 2v2, so both sides end up with a similar total rating.
+    ranked = sorted(group, reverse=True)
+    sides = ("blue", "red") if len(ranked) == 2 else ("blue", "red", "red", "blue")
+    players = [entry[2] for entry in sorted(group, key=lambda entry: entry[1])]
+    lobby = {
+        "id": new_lobby_id(),
+        "host": players[0],
+        "map": random.choice(map_catalogue.ids),
+        "mode": mode,
+        "max_players": MATCHMAKING_MODES[mode],
+        "players": players,
+        "teams": {entry[2]: side for entry, side in zip(ranked, sides)},
+        "status": "waiting",
+        "created_at": utc_now_iso(),
+        "game_time": 15,
+        "matchmade": True,
+    }
+    match_store.add(lobby)
+    return lobby
+
+
+def matchmaking_status_response(username):
+    for mode, group in matchmaking_queue.sweep():
+        create_matchmade_lobby(mode, group)
+
+    queued = matchmaking_queue.status(username)
+    if queued is not None:
+        return jsonify({"success": True, "state": "queued", "queue": queued})
+
+    active_match = active_match_for(username)
+    if active_match and active_match.get("status") in ("waiting", "in_progress"):
+        return jsonify({"success": True, "state": "matched", "lobby": normalize_match_response(active_match), "teams": active_match.get("teams", {})})
+    return jsonify({"success": True, "state": "idle"})
+
+
+@app.route("/api/matchmaking/enqueue", methods=["POST"])
+def matchmaking_enqueue():
+    payload = request.get_json(silent=True) or {}
+    username = session.get("username")
+    mode = (payload.get("mode") or "1v1").strip() or "1v1"
+
+    if not username:
+        return jsonify({"success": False, "error": "You must be logged in."}), 401
+
+    if mode not in MATCHMAKING_MODES:
+        return jsonify({"success": False, "error": "Mode must be 1v1 or 2v2."}), 400
+
+    if not map_catalogue:
+        return jsonify({"success": False, "error": "No maps are available."}), 503
+
+    account = account_store.get_account(username)
+    if not account:
+        session.pop("username", None)
+        return jsonify({"success": False, "error": "Account not found."}), 404
+
+    active_match = active_match_for(username)
+    if active_match and active_match.get("status") in ("waiting", "in_progress"):
+        return jsonify({"success": False, "error": "You are already in an active lobby or match."}), 409
+
+    group = matchmaking_queue.enqueue(username, mode, int(account.get("xp", 0)))
+    if group is not None:
+        create_matchmade_lobby(mode, group)
+    return matchmaking_status_response(username)
+
+
+@app.route("/api/matchmaking/status", methods=["GET"])
+def matchmaking_status():
+    username = session.get("username")
+    if not username:
+        return jsonify({"success": False, "error": "You must be logged in."}), 401
+    return matchmaking_status_response(username)
+
+
+@app.route("/api/matchmaking/leave", methods=["POST"])
+def matchmaking_leave():
+    username = session.get("username")
+    if not username:
+        return jsonify({"success": False, "error": "You must be logged in."}), 401
+    return jsonify({"success": True, "removed": matchmaking_queue.remove(username)})
+
+
+def level_for_xp(xp):
+    return 1 + xp // XP_PER_LEVEL
+
+
+def mark_match_finished(match, winner, reported_by):
+    match["status"] = "finished"
+    match["winner"] = winner
+    match["finished_at"] = utc_now_iso()
+    match["reported_by"] = reported_by
+
+
+def apply_match_stats(match, winner, deployed_units, pending_report=False):
+    # With pending_report, players missing from deployed_units add their own count when they report later.
+    teams = match.get("teams", {})
+    results = {}
+    with account_store.transaction() as accounts:
+        for player in match.get("players", []):
+            account = accounts.get(player)
+            if account is None:
+                continue
+
+            won = teams.get(player) == winner
+            account["total_matches"] = account.get("total_matches", 0) + 1
+            account["total_deployed_units"] = account.get("total_deployed_units", 0) + deployed_units.get(player, 0)
+            if pending_report and player not in deployed_units:
+                account["pending_match_report"] = {"id": match.get("id"), "winner": winner, "max_deployed": max_deployed_units(match)}
+            if won:
+                account["wins"] = account.get("wins", 0) + 1
+            else:
+                account["losses"] = account.get("losses", 0) + 1
+            account["xp"] = account.get("xp", 0) + (MATCH_WIN_XP if won else MATCH_LOSS_XP)
+            account["level"] = max(account.get("level", 1), level_for_xp(account["xp"]))
+            accounts[player] = account
+            results[player] = account
+
+    for player, account in results.items():
+        leaderboard.update(player, account)
+    return results
+
+
+def max_deployed_units(match):
+    # Nobody can buy more units than a full game's worth of gold allows.
+    income_ticks = max(_safe_int(match.get("game_time", 15)), 0) * 60000 // MATCH_PASSIVE_GOLD_INTERVAL_MS
+    return (MATCH_STARTING_GOLD + MATCH_PASSIVE_GOLD_AMOUNT * income_ticks) // MATCH_UNIT_COST
+
+
+def settle_match_reports(match):
+    # A claim only counts once someone on the losing side confirms it; any disagreement disputes the match.
+    reports = match.get("reports", {})
+    winners = {report["winner"] for report in reports.values()}
+    if len(winners) > 1:
+        return "disputed"
+    if not winners:
+        return None
+    winner = winners.pop()
+    teams = match.get("teams", {})
+    confirmed = any(teams.get(player) != winner for player in reports)
+    return winner if confirmed else None
+
+
+def apply_pending_deployed_units(username, match_id, deployed):
+    # Late reports for a match someone else already finished only carry the reporter's own count.
+    with account_store.transaction() as accounts:
+        account = accounts.get(username)
+        pending = account.get("pending_match_report") if account is not None else None
+        if not isinstance(pending, dict) or pending.get("id") != match_id:
+            return None, None
+        del account["pending_match_report"]
+        account["total_deployed_units"] = account.get("total_deployed_units", 0) + min(deployed, pending.get("max_deployed", deployed))
+        accounts[username] = account
+    return pending.get("winner"), account
+
+
+def finish_simulated_match(match_id, result):
+    def apply_result(match):
+        if not match or match.get("status") != "in_progress":
+            return False
+        mark_match_finished(match, result["winner"], "server")
+        return None
+
+    outcome, match = match_store.update(match_id, apply_result)
+    if outcome is None and match is not None:
+        apply_match_stats(match, result["winner"], result["deployed_units"])
+
+
+def abandon_simulated_match(match_id):
+    # The simulation crashed, so there is no trustworthy winner; the match ends without stats.
+    def apply_abandon(match):
+        if not match or match.get("status") != "in_progress":
+            return False
+        match["status"] = "abandoned"
+        match["finished_at"] = utc_now_iso()
+        match["reported_by"] = "server"
+        return None
+
+    match_store.update(match_id, apply_abandon)
+
+
+simulation_host = (
+    SimulationHost(SIMULATION_TICK_RATE, on_finish=finish_simulated_match, on_abandon=abandon_simulated_match) if SERVER_SIMULATION else None
+)
+relay_tokens = URLSafeTimedSerializer(app.secret_key, salt="match-relay")
+
+
+def authenticate_relay_token(token):
+    try:
+        username, match_id = relay_tokens.loads(token, max_age=MATCH_RELAY_TOKEN_MAX_AGE)
+    except (BadSignature, TypeError, ValueError):
+        return None
+    return username, match_id
+
+
+match_relay = MatchRelay(simulation_host, authenticate_relay_token, port=MATCH_RELAY_PORT) if simulation_host is not None else None
+
+
+def replay_path(match_id):
+    return os.path.join(REPLAYS_DIR, f"{match_id}.replay")
+
+
+def start_simulation(lobby):
+    simulation = MatchSimulation(
+        lobby["id"],
+        map_catalogue[lobby.get("map")],
+        build_roster(lobby.get("players", []), lobby.get("teams", {}), lobby.get("max_players", 2)),
+        lobby.get("game_time", 15),
+    )
+    recorder = ReplayRecorder(replay_path(lobby["id"]), simulation, SIMULATION_TICK_RATE)
+    simulation_host.start_match(simulation, recorder, SimulationTelemetry(telemetry_store, lobby["id"], SIMULATION_TICK_RATE))
+
+
+@app.route("/api/report-match-result", methods=["POST"])
+def report_match_result():
+    payload = request.get_json(silent=True) or {}
+    username = session.get("username")
+    match_id = (payload.get("id") or "").strip()
+    winner = (payload.get("winner") or "").strip().lower()
+    deployed_payload = payload.get("deployed_units") or {}
+
+    if not username:
+        return jsonify({"success": False, "error": "You must be logged in."}), 401
+
+    if winner not in MATCH_TEAMS:
+        return jsonify({"success": False, "error": "Winner must be blue or red."}), 400
+
+    if not isinstance(deployed_payload, dict):
+        return jsonify({"success": False, "error": "Deployed units must be an object."}), 400
+
+    # Each player only vouches for their own units; the other players report theirs themselves.
+    try:
+        deployed = max(_safe_int(deployed_payload.get(username, 0)), 0)
+    except ValueError:
+        return jsonify({"success": False, "error": "Deployed units must be integers."}), 400
+
+    def apply_result(match):
+        if not match:
+            return jsonify({"success": False, "error": "Match not found."}), 404
+
+        if username not in match.get("players", []):
+            return jsonify({"success": False, "error": "You are not in this match."}), 403
+
+        if match.get("status") != "in_progress":
+            return jsonify({"success": False, "error": "Match is not in progress."}), 409
+
+        if simulation_host is not None and match.get("id") in simulation_host:
+            return jsonify({"success": False, "error": "Match result is decided by the server."}), 409
+
+        # A player may resend their report; only the latest one counts.
+        match.setdefault("reports", {})[username] = {"winner": winner, "deployed_units": min(deployed, max_deployed_units(match))}
+        settled = settle_match_reports(match)
+        if settled == "disputed":
+            # Archived with every report for review; nobody's stats change.
+            match["status"] = "disputed"
+            match["finished_at"] = utc_now_iso()
+        elif settled is not None:
+            mark_match_finished(match, settled, username)
+        return None
+
+    # The status flips inside the compare-and-swap, so only one report can settle a match.
+    outcome, match = match_store.update(match_id, apply_result)
+    if outcome is not None:
+        reported_winner, account = apply_pending_deployed_units(username, match_id, deployed)
+        if account is None:
+            return outcome
+        return jsonify(
+            {
+                "success": True,
+                "winner": reported_winner,
+                "participants": {},
+                "user": sanitize_player_response(username, account),
+            }
+        )
+
+    if match.get("status") == "disputed":
+        return jsonify({"success": False, "error": "Players reported different winners; the result is disputed."}), 409
+
+    if match.get("status") != "finished":
+        return jsonify({"success": True, "status": "awaiting_confirmation", "winner": None, "participants": {}, "user": None})
+
+    winner = match["winner"]
+    deployed_units = {player: report["deployed_units"] for player, report in match["reports"].items()}
+    results = apply_match_stats(match, winner, deployed_units, pending_report=True)
+    account = results.get(username)
+    return jsonify(
+        {
+            "success": True,
+            "status": "finished",
+            "winner": winner,
+            "participants": {player: match.get("teams", {}).get(player) for player in results},
+            "user": sanitize_player_response(username, account) if account else None,
+        }
+    )
+
+
+@app.route("/api/leaderboard", methods=["GET"])
+def get_leaderboard():
+    try:
+        limit = _safe_int(request.args.get("limit", LEADERBOARD_DEFAULT_LIMIT))
+    except ValueError:
+        return jsonify({"success": False, "error": "Limit must be a valid integer."}), 400
+    limit = min(max(limit, 1), LEADERBOARD_MAX_LIMIT)
+
+    username = session.get("username")
+    return jsonify(
+        {
+            "success": True,
+            "total": len(leaderboard),
+            "leaders": leaderboard.top(limit),
+            "player": leaderboard.rank(username) if username else None,
+        }
+    )
+
+
+@app.route("/api/match-state/<match_id>", methods=["GET"])
+def get_match_state(match_id):
+    username = session.get("username")
+    if not username:
+        return jsonify({"success": False, "error": "You must be logged in."}), 401
+
+    match = match_store.get(match_id)
+    if not match or username not in match.get("players", []):
+        return jsonify({"success": False, "error": "Match not found."}), 404
+
+    state = simulation_host.snapshot(match_id) if simulation_host is not None else None
+    if state is None:
+        return jsonify({"success": False, "error": "Match is not simulated on this server."}), 404
+    return jsonify({"success": True, "state": state})
+
+
+@app.route("/api/match-command", methods=["POST"])
+def send_match_command():
+    payload = request.get_json(silent=True) or {}
+    username = session.get("username")
+    match_id = (payload.get("id") or "").strip()
+    action = payload.get("action")
+    value = payload.get("value")
+
+    if not username:
+        return jsonify({"success": False, "error": "You must be logged in."}), 401
+
+    if action not in MATCH_COMMANDS:
+        return jsonify({"success": False, "error": "Unknown command."}), 400
+
+    if simulation_host is not None and action == "move" and parse_move_order(value) is None:
+        return jsonify({"success": False, "error": "Move orders need a unit list and finite x and y."}), 400
+
+    if simulation_host is None or not simulation_host.command(match_id, username, action, value):
+        return jsonify({"success": False, "error": "Match is not simulated on this server."}), 404
+    return jsonify({"success": True})
+
+
+@app.route("/api/match-relay", methods=["POST"])
+def open_match_relay():
+    payload = request.get_json(silent=True) or {}
+    username = session.get("username")
+    match_id = (payload.get("id") or "").strip()
+
+    if not username:
+        return jsonify({"success": False, "error": "You must be logged in."}), 401
+
+    match = match_store.get(match_id)
+    if not match or username not in match.get("players", []):
+        return jsonify({"success": False, "error": "Match not found."}), 404
+
+    if match_relay is None or not match_relay.available or match_id not in simulation_host:
+        return jsonify({"success": False, "error": "Match is not simulated on this server."}), 404
+
+    # The relay runs in its own event loop; it is only started once a player actually asks for it.
+    try:
+        match_relay.start()
+    except OSError:
+        return jsonify({"success": False, "error": "Match relay is unavailable."}), 503
+
+    token = relay_tokens.dumps([username, match_id])
+    hostname = request.host.rpartition(":")[0] or request.host
+    return jsonify({"success": True, "url": f"ws://{hostname}:{MATCH_RELAY_PORT}/match?token={token}"})
+
+
+@app.route("/api/match-replay/<match_id>", methods=["GET"])
+def get_match_replay(match_id):
+    username = session.get("username")
+    if not username:
+        return jsonify({"success": False, "error": "You must be logged in."}), 401
+
+    tick_arg = request.args.get("tick")
+    try:
+        tick = _safe_int(tick_arg) if tick_arg is not None else None
+    except ValueError:
+        return jsonify({"success": False, "error": "tick must be an integer."}), 400
+
+    if ReplayReader is None or not os.path.exists(replay_path(match_id)):
+        return jsonify({"success": False, "error": "Replay not found."}), 404
+
+    # Finished matches are archived out of the match store, so the replay's own roster decides who may view it.
+    with ReplayReader(replay_path(match_id)) as reader:
+        if username not in [player["name"] for player in reader.settings["players"] if not player.get("bot")]:
+            return jsonify({"success": False, "error": "Replay not found."}), 404
+        if tick is None:
+            return jsonify(
+                {
+                    "success": True,
+                    "complete": reader.complete,
+                    "tick_rate": reader.tick_rate,
+                    "keyframes": reader.index["tick"].tolist(),
+                    "result": reader.result(),
+                }
+            )
+        return jsonify({"success": True, "state": reader.seek(max(tick, 0)).snapshot()})
+
+
+def is_match_participant(match, username):
+    # Single-player matches from /create_match store a player count rather than a roster.
+    players = match.get("players")
+    return username == match.get("host") or (isinstance(players, list) and username in players)
+
+
+@app.route("/api/match-telemetry", methods=["POST"])
+def ingest_match_telemetry():
+    payload = request.get_json(silent=True) or {}
+    username = session.get("username")
+    match_id = (payload.get("id") or "").strip()
+
+    if not username:
+        return jsonify({"success": False, "error": "You must be logged in."}), 401
+
+    try:
+        batches = parse_samples(payload.get("samples"))
+    except ValueError as exc:
+        return jsonify({"success": False, "error": str(exc)}), 400
+
+    match = match_store.get(match_id)
+    if not match or not is_match_participant(match, username):
+        return jsonify({"success": False, "error": "Match not found."}), 404
+
+    if match.get("status") not in ("pending", "in_progress"):
+        return jsonify({"success": False, "error": "Match is not in progress."}), 409
+
+    if simulation_host is not None and match_id in simulation_host:
+        return jsonify({"success": False, "error": "Match telemetry is recorded by the server."}), 409
+
+    telemetry_store.append(match_id, batches)
+    return jsonify({"success": True, "samples": sum(len(times) for times, _ in batches.values())})
+
+
+@app.route("/api/match-telemetry/<match_id>", methods=["GET"])
+def get_match_telemetry(match_id):
+    username = session.get("username")
+    if not username:
+        return jsonify({"success": False, "error": "You must be logged in."}), 401
+
+    # Live matches are visible to their players only; finished ones are archived and their team totals are public.
+    match = match_store.get(match_id)
+    if match and not is_match_participant(match, username):
+        return jsonify({"success": False, "error": "Match not found."}), 404
+
+    try:
+        resolution = _safe_int(request.args["resolution"]) if "resolution" in request.args else None
+        start = _safe_int(request.args["start"]) if "start" in request.args else None
+        end = _safe_int(request.args["end"]) if "end" in request.args else None
+        max_points = _safe_int(request.args.get("max_points", DEFAULT_MAX_POINTS))
+    except ValueError:
+        return jsonify({"success": False, "error": "resolution, start, end and max_points must be integers."}), 400
+
+    if resolution is not None and resolution not in TELEMETRY_RESOLUTIONS:
+        return jsonify({"success": False, "error": f"resolution must be one of {', '.join(map(str, TELEMETRY_RESOLUTIONS))}."}), 400
+
+    metrics_arg = request.args.get("metrics")
+    metric_names = [name.strip() for name in metrics_arg.split(",") if name.strip()] if metrics_arg else None
+    try:
+        series = telemetry_store.query(match_id, resolution, metric_names, start, end, min(max(max_points, 1), TELEMETRY_MAX_POINTS))
+    except ValueError:
+        return jsonify({"success": False, "error": "Match not found."}), 404
+
+    if not series["metrics"]:
+        return jsonify({"success": False, "error": "No telemetry for this match."}), 404
+    return jsonify({"success": True, **series})
+
+
 @app.route("/api/check-active-match", methods=["GET"])
 def check_active_match():
     username = session.get("username")
     if not username:
         return jsonify({"success": False, "error": "You must be logged in."}), 401
 
-    matches_data = load_matches_with_cleanup(save_if_changed=True)
-    for match in matches_data["matches"]:
-        players = match.get("players", [])
-        if isinstance(players, list) and username in players:
-            return jsonify({"success": True, "match": normalize_match_response(match), "teams": match.get("teams", {})})
+    match = active_match_for(username)
+    if match:
+        return jsonify({"success": True, "match": normalize_match_response(match), "teams": match.get("teams", {})})
 
     return jsonify({"success": True, "match": None})
 
 
+def is_shard_request():
+    if shard_router is None or SHARD_HEADER not in request.headers:
+        return False
+    try:
+        return shard_tokens.loads(request.headers[SHARD_HEADER]) == LOBBY_SHARDS
+    except BadSignature:
+        return False
+
+
+@app.route("/api/shard/lobbies", methods=["GET"])
+def shard_lobbies():
+    if not is_shard_request():
+        return jsonify({"success": False, "error": "Forbidden."}), 403
+    return jsonify({"success": True, "lobbies": [normalize_match_response(match) for match in match_store.waiting()]})
+
+
+@app.route("/api/shard/matches/<match_id>", methods=["GET"])
+def shard_match(match_id):
+    if not is_shard_request():
+        return jsonify({"success": False, "error": "Forbidden."}), 403
+    match = match_store.get(match_id)
+    if not match:
+        return jsonify({"success": False, "error": "Match not found."}), 404
+    return jsonify({"success": True, "match": match})
+
+
+@app.errorhandler(ShardUnavailableError)
+def shard_unavailable(error):
+    response = jsonify({"success": False, "error": "Lobby service is temporarily unavailable."})
+    response.status_code = 503
+    response.headers["Retry-After"] = "1"
+    return response
+
+
+slow_request_profiler = SlowRequestProfiler(PROFILES_DIR, SLOW_REQUEST_THRESHOLD_MS / 1000, enabled=SLOW_REQUEST_PROFILING)
+admission_controller = AdmissionController(max_in_flight=ADMISSION_MAX_IN_FLIGHT, enabled=ADMISSION_CONTROL)
+
+
+def request_route():
+    return request.url_rule.rule if request.url_rule is not None else "unmatched"
+
+
+@app.before_request
+def start_request_timer():
+    g.request_started_at = time.perf_counter()
+    slow_request_profiler.begin(f"{request.method} {request_route()}")
+
+
+@app.before_request
+def admit_request():
+    username = session.get("username")
+    client_key = f"user:{username}" if username else f"ip:{request.remote_addr}"
+    # A forwarded request was charged on the node the client reached, and remote_addr here is that node.
+    counted, rejection = admission_controller.admit(
+        request_route(), client_key, request.remote_addr, rate_limited=not is_shard_request(),
+    )
+    g.admission_counted = counted
+    if rejection is None:
+        return None
+    status, reason, retry_after = rejection
+    error = "Too many requests, slow down." if reason == "rate_limited" else "Server is busy, please try again shortly."
+    response = jsonify({"success": False, "error": error})
+    response.status_code = status
+    response.headers["Retry-After"] = str(max(1, math.ceil(retry_after)))
+    return response
+
+
+def lobby_owner():
+    route = request_route()
+    if route in PATH_ROUTES:
+        lobby_id = (request.view_args or {}).get(PATH_ROUTES[route])
+    elif route in BODY_ROUTES:
+        payload = request.get_json(silent=True)
+        lobby_id = payload.get("id") if isinstance(payload, dict) else None
+    else:
+        return None
+    if not isinstance(lobby_id, str) or not lobby_id.strip():
+        return None
+    return shard_router.owner(lobby_id.strip())
+
+
+@app.before_request
+def route_to_shard():
+    if shard_router is None:
+        return None
+    owner = lobby_owner()
+    if owner is None or owner == LOBBY_SHARD:
+        return None
+    if is_shard_request():
+        # The sender hashed the id to this node; a second hop would mean the nodes disagree about the layout.
+        return jsonify({"success": False, "error": "Lobby belongs to another shard."}), 421
+
+    headers = {name: request.headers[name] for name in FORWARDED_REQUEST_HEADERS if name in request.headers}
+    headers["X-Forwarded-For"] = request.remote_addr or ""
+    streaming = request_route().endswith("/stream")
+    # A relayed stream pins a thread here as well as on the owner.
+    if streaming and not stream_slots.acquire(request_route()):
+        return streams_full_response()
+    try:
+        upstream = shard_router.open(
+            owner, request.method, request.full_path if request.query_string else request.path, headers, request.get_data() or None,
+            timeout=STREAM_HEARTBEAT_SECONDS * 2 if streaming else FORWARD_TIMEOUT_SECONDS,
+        )
+    except Exception:
+        if streaming:
+            stream_slots.release()
+        raise
+    response_headers = [(name, value) for name, value in upstream.getheaders() if name.lower() in FORWARDED_RESPONSE_HEADERS]
+    if streaming:
+        return hold_stream_slot(Response(shard_router.relay(upstream), status=upstream.status, headers=response_headers))
+    try:
+        body = upstream.read()
+    finally:
+        upstream.close()
+    return Response(body, status=upstream.status, headers=response_headers)
+
+
+@app.teardown_request
+def release_admission(error=None):
+    if g.pop("admission_counted", False):
+        admission_controller.release()
+
+
+@app.teardown_request
+def release_account_connection(error=None):
+    # Request threads come and go; their SQLite connection goes back to the pool instead of staying with the thread.
+    account_store.release_connection()
+
+
+@app.after_request
+def record_request_metrics(response):
+    started_at = g.pop("request_started_at", None)
+    if started_at is not None:
+        REQUEST_LATENCY.observe(time.perf_counter() - started_at, route=request_route(), method=request.method, status=str(response.status_code))
+    slow_request_profiler.end()
+    return response
+
+
+metrics_registry.gauge("match_store_conflicts", "Optimistic match commits that had to retry.", lambda: match_store.conflicts)
+metrics_registry.gauge("matchmaking_queued_players", "Players waiting in the matchmaking queue.", lambda: len(matchmaking_queue))
+metrics_registry.gauge("lobby_streams_open", "Server-Sent Event streams currently held open by this worker.", lambda: stream_slots.open)
+metrics_registry.gauge("admission_in_flight", "Requests currently admitted and counted against the load-shedding limit.", lambda: admission_controller.in_flight)
+metrics_registry.gauge("slow_request_profiles", "Slow request profiles written since startup.", lambda: slow_request_profiler.dumped)
+if isinstance(account_store, CachedAccountStore):
+    metrics_registry.gauge(
+        "profile_cache_lookups",
+        "Profile cache lookups by outcome.",
+        lambda: {outcome: getattr(account_store, outcome) for outcome in ("hits", "misses", "expirations", "evictions", "invalidations")},
+        label_name="outcome",
+    )
+if simulation_host is not None:
+    metrics_registry.gauge("simulation_active_matches", "Matches simulated by this process.", simulation_host.active)
+    metrics_registry.gauge("simulation_tick_overruns", "Simulation ticks that missed their deadline.", lambda: simulation_host.overruns)
+
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    if METRICS_TOKEN and request.headers.get("Authorization") != f"Bearer {METRICS_TOKEN}":
+        return jsonify({"success": False, "error": "Forbidden."}), 403
+    return Response(metrics_registry.render(), mimetype=METRICS_CONTENT_TYPE)
+
+
+@app.route("/api/dev-profiler", methods=["POST"])
+def dev_profiler():
+    payload = request.get_json(silent=True) or {}
+    session_username = session.get("username")
+    if not session_username:
+        return jsonify({"success": False, "error": "You must be logged in."}), 401
+
+    account = authoritative_account(session_username)
+    if not account or account.get("role") != "developer":
+        return jsonify({"success": False, "error": "Forbidden."}), 403
+
+    enabled = payload.get("enabled")
+    if not isinstance(enabled, bool):
+        return jsonify({"success": False, "error": "enabled must be true or false."}), 400
+
+    try:
+        threshold_ms = _safe_int(payload.get("threshold_ms", int(slow_request_profiler.threshold_seconds * 1000)))
+    except ValueError:
+        return jsonify({"success": False, "error": "threshold_ms must be an integer."}), 400
+
+    if threshold_ms <= 0:
+        return jsonify({"success": False, "error": "threshold_ms must be greater than zero."}), 400
+
+    if enabled:
+        slow_request_profiler.enable(threshold_ms / 1000)
+    else:
+        slow_request_profiler.disable()
+    return jsonify({"success": True, "enabled": slow_request_profiler.enabled, "threshold_ms": threshold_ms, "profiles_dir": PROFILES_DIR})
+
+
+def warm_up():
+    # Called by the launcher in each worker before it accepts traffic, so first requests skip the cold paths.
+    leaderboard.wait_ready(LEADERBOARD_WARM_UP_TIMEOUT_SECONDS)
+    for entry in leaderboard.top(WARM_PROFILE_COUNT):
+        account_store.get_account(entry["username"])
+    password_hasher.warm_up()
+    return {"leaderboard_players": len(leaderboard), "matches": len(match_store.matches())}
+
+
+def shutdown():
+    # Stops background work and flushes what is still buffered; requests must already be drained.
+    lobby_expiry.stop()
+    leaderboard.stop()
+    if simulation_host is not None:
+        simulation_host.stop()
+    password_hasher.shutdown()
+    transaction_ledger.close()
+    account_store.close()
+    if player_directory is not None:
+        player_directory.close()
+    if shard_router is not None:
+        shard_router.close()
+
+
 if __name__ == "__main__":
-    ensure_database()
-    ensure_transaction_ledger()
-    ensure_matches_file()
     app.run(host="0.0.0.0", port=5000, debug=True)
@@ -0,0 +1,555 @@
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from metrics import observe_io, record_lock_wait, timed_lock
+
+ACCOUNT_COLUMNS = (
+    "password",
+    "gold",
+    "xp",
+    "level",
+    "wins",
+    "losses",
+    "total_matches",
+    "total_deployed_units",
+    "role",
+)
+# Idle SQLite connections kept for reuse; threads beyond this open their own and close them when done.
+CONNECTION_POOL_SIZE = 8
+# Other processes read the change log to drop their cached copies; older rows are pruned.
+CHANGE_HISTORY_LIMIT = 10000
+INTEGER_COLUMNS = ("gold", "xp", "level", "wins", "losses", "total_matches", "total_deployed_units")
+ACCOUNT_DEFAULTS = {
+    "password": "",
+    "gold": 0,
+    "xp": 0,
+    "level": 1,
+    "wins": 0,
+    "losses": 0,
+    "total_matches": 0,
+    "total_deployed_units": 0,
+    "role": "player",
+}
+
+
+class JsonAccountStore:
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.RLock()
+        self._ensured = False
+
+    def _ensure_file(self):
+        if self._ensured and os.path.exists(self.path):
+            return
+
+        if not os.path.exists(self.path):
+            with open(self.path, "w", encoding="utf-8") as db_file:
+                json.dump({"accounts": {}}, db_file, indent=2)
+        self._ensured = True
+
+    def load_all(self):
+        with timed_lock(self._lock, "accounts_json"):
+            self._ensure_file()
+            with observe_io("accounts_json", "read") as io:
+                with open(self.path, "r", encoding="utf-8") as db_file:
+                    raw = db_file.read()
+                io.bytes = len(raw)
+            data = json.loads(raw)
+            if "accounts" not in data or not isinstance(data["accounts"], dict):
+                data["accounts"] = {}
+            return data
+
+    def save_all(self, data):
+        raw = json.dumps(data, indent=2)
+        with timed_lock(self._lock, "accounts_json"):
+            with observe_io("accounts_json", "write") as io:
+                with open(self.path, "w", encoding="utf-8") as db_file:
+                    db_file.write(raw)
+                io.bytes = len(raw)
+
+    @contextmanager
+    def transaction(self):
+        with self._lock:
+            data = self.load_all()
+            yield data["accounts"]
+            self.save_all(data)
+
+    def changes_since(self, position):
+        # The file is rewritten as a whole, so any change means every cached account may be stale.
+        try:
+            latest = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            latest = 0
+        return latest, (() if latest == position else None)
+
+    def get_account(self, username):
+        return self.load_all()["accounts"].get(username)
+
+    def create_account(self, username, account):
+        with self._lock:
+            data = self.load_all()
+            if username in data["accounts"]:
+                return False
+            data["accounts"][username] = dict(account)
+            self.save_all(data)
+            return True
+
+    def update_account(self, username, changes):
+        with self._lock:
+            data = self.load_all()
+            account = data["accounts"].get(username)
+            if account is None:
+                return None
+            account.update(changes)
+            self.save_all(data)
+            return account
+
+    def add_gold(self, username, amount):
+        with self._lock:
+            data = self.load_all()
+            account = data["accounts"].get(username)
+            if account is None:
+                return None
+            account["gold"] = account.get("gold", 0) + amount
+            self.save_all(data)
+            return account["gold"]
+
+    def count(self):
+        return len(self.load_all()["accounts"])
+
+    # No connections to hand back; the file is opened per call.
+    def release_connection(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class _PooledConnection(sqlite3.Connection):
+    # PRAGMA data_version is only comparable on the connection that returned it.
+    data_version = None
+
+
+class SqliteAccountStore:
+    def __init__(self, path, pool_size=CONNECTION_POOL_SIZE):
+        self.path = path
+        self.pool_size = pool_size
+        self._local = threading.local()
+        self._idle = []
+        self._idle_lock = threading.Lock()
+        self._init_schema()
+
+    def _connection(self):
+        # A thread keeps the connection it borrowed until release_connection(), so a request sees one connection.
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            with self._idle_lock:
+                conn = self._idle.pop() if self._idle else None
+            if conn is None:
+                conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False, factory=_PooledConnection)
+                conn.row_factory = sqlite3.Row
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def release_connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            return
+        self._local.conn = None
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        with self._idle_lock:
+            if len(self._idle) < self.pool_size:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    def close(self):
+        self.release_connection()
+        with self._idle_lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+    def _init_schema(self):
+        conn = self._connection()
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS accounts (
+                username TEXT PRIMARY KEY,
+                password TEXT NOT NULL,
+                gold INTEGER NOT NULL DEFAULT 0,
+                xp INTEGER NOT NULL DEFAULT 0,
+                level INTEGER NOT NULL DEFAULT 1,
+                wins INTEGER NOT NULL DEFAULT 0,
+                losses INTEGER NOT NULL DEFAULT 0,
+                total_matches INTEGER NOT NULL DEFAULT 0,
+                total_deployed_units INTEGER NOT NULL DEFAULT 0,
+                role TEXT NOT NULL DEFAULT 'player',
+                extra TEXT
+            )
+            """
+        )
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        conn.execute("CREATE TABLE IF NOT EXISTS account_changes (seq INTEGER PRIMARY KEY AUTOINCREMENT, username TEXT NOT NULL)")
+
+    @staticmethod
+    def _record_changes(conn, usernames):
+        # An empty username stands for "every account" (save_all).
+        conn.executemany("INSERT INTO account_changes (username) VALUES (?)", [(username,) for username in usernames])
+        conn.execute("DELETE FROM account_changes WHERE seq <= last_insert_rowid() - ?", (CHANGE_HISTORY_LIMIT,))
+
+    def changes_since(self, position):
+        """Return (latest, usernames changed after position); usernames is None when everything may have changed.
+
+        PRAGMA data_version only moves when another connection commits, so the
+        common no-change case costs no table read.
+        """
+        conn = self._connection()
+        version = conn.execute("PRAGMA data_version").fetchone()[0]
+        if position is not None and version == conn.data_version:
+            return position, ()
+        conn.data_version = version
+        latest = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM account_changes").fetchone()[0]
+        if position is None:
+            return latest, None
+        oldest = conn.execute("SELECT MIN(seq) FROM account_changes").fetchone()[0]
+        if oldest is not None and oldest > position + 1:
+            return latest, None
+        usernames = {row["username"] for row in conn.execute("SELECT username FROM account_changes WHERE seq > ? AND seq <= ?", (position, latest))}
+        return latest, (None if "" in usernames else usernames)
+
+    @staticmethod
+    def _row_to_account(row):
+        account = {column: row[column] for column in ACCOUNT_COLUMNS}
+        if row["extra"]:
+            account.update(json.loads(row["extra"]))
+        return account
+
+    @staticmethod
+    def _account_to_params(username, account):
+        params = [username]
+        for column in ACCOUNT_COLUMNS:
+            params.append(account.get(column, ACCOUNT_DEFAULTS[column]))
+        extra = {key: value for key, value in account.items() if key not in ACCOUNT_COLUMNS}
+        params.append(json.dumps(extra) if extra else None)
+        return params
+
+    @contextmanager
+    def _write(self):
+        # BEGIN IMMEDIATE blocks until no other connection holds the write lock.
+        conn = self._connection()
+        started_at = time.perf_counter()
+        conn.execute("BEGIN IMMEDIATE")
+        record_lock_wait("accounts_sqlite", time.perf_counter() - started_at)
+        with observe_io("accounts_sqlite", "write"):
+            try:
+                yield conn
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    @contextmanager
+    def transaction(self):
+        # Loads only the rows the caller touches; writes them back in one commit.
+        with self._write() as conn:
+            accounts = _SqliteAccountView(self, conn)
+            yield accounts
+            accounts.flush()
+
+    def get_meta(self, key):
+        row = self._connection().execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row["value"] if row else None
+
+    def set_meta(self, key, value):
+        self._connection().execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def load_all(self):
+        rows = self._connection().execute("SELECT * FROM accounts").fetchall()
+        return {"accounts": {row["username"]: self._row_to_account(row) for row in rows}}
+
+    def save_all(self, data):
+        accounts = data.get("accounts", {})
+        with self._write() as conn:
+            conn.execute("DELETE FROM accounts")
+            conn.executemany(
+                "INSERT INTO accounts VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [self._account_to_params(username, account) for username, account in accounts.items()],
+            )
+            self._record_changes(conn, [""])
+
+    def get_account(self, username):
+        with observe_io("accounts_sqlite", "read"):
+            row = self._connection().execute("SELECT * FROM accounts WHERE username = ?", (username,)).fetchone()
+        return self._row_to_account(row) if row else None
+
+    def create_account(self, username, account):
+        with observe_io("accounts_sqlite", "write"):
+            cursor = self._connection().execute(
+                "INSERT OR IGNORE INTO accounts VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                self._account_to_params(username, account),
+            )
+        return cursor.rowcount == 1
+
+    def update_account(self, username, changes):
+        with self._write() as conn:
+            row = conn.execute("SELECT * FROM accounts WHERE username = ?", (username,)).fetchone()
+            if row is None:
+                return None
+            account = self._row_to_account(row)
+            account.update(changes)
+            conn.execute(
+                "INSERT OR REPLACE INTO accounts VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                self._account_to_params(username, account),
+            )
+            self._record_changes(conn, [username])
+        return account
+
+    def add_gold(self, username, amount):
+        with self._write() as conn:
+            cursor = conn.execute("UPDATE accounts SET gold = gold + ? WHERE username = ?", (amount, username))
+            if cursor.rowcount != 1:
+                return None
+            self._record_changes(conn, [username])
+            return conn.execute("SELECT gold FROM accounts WHERE username = ?", (username,)).fetchone()["gold"]
+
+    def count(self):
+        return self._connection().execute("SELECT COUNT(*) FROM accounts").fetchone()[0]
+
+
+class _SqliteAccountView:
+    def __init__(self, store, conn):
+        self._store = store
+        self._conn = conn
+        self._loaded = {}
+
+    def get(self, username, default=None):
+        if username not in self._loaded:
+            row = self._conn.execute("SELECT * FROM accounts WHERE username = ?", (username,)).fetchone()
+            self._loaded[username] = self._store._row_to_account(row) if row else None
+        account = self._loaded[username]
+        return account if account is not None else default
+
+    def __contains__(self, username):
+        return self.get(username) is not None
+
+    def __getitem__(self, username):
+        account = self.get(username)
+        if account is None:
+            raise KeyError(username)
+        return account
+
+    def __setitem__(self, username, account):
+        self._loaded[username] = account
+
+    def flush(self):
+        written = [username for username, account in self._loaded.items() if account is not None]
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO accounts VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [self._store._account_to_params(username, self._loaded[username]) for username in written],
+        )
+        if written:
+            self._store._record_changes(self._conn, written)
+
+
+class _TouchedAccounts:
+    # Records which accounts a transaction handed out, so only those cache entries are dropped afterwards.
+    def __init__(self, accounts):
+        self._accounts = accounts
+        self.touched = set()
+
+    def get(self, username, default=None):
+        self.touched.add(username)
+        return self._accounts.get(username, default)
+
+    def __contains__(self, username):
+        return username in self._accounts
+
+    def __getitem__(self, username):
+        self.touched.add(username)
+        return self._accounts[username]
+
+    def __setitem__(self, username, account):
+        self.touched.add(username)
+        self._accounts[username] = account
+
+
+class CachedAccountStore:
+    # Read-through profile cache in front of either backend. Writes through it drop the affected entries, and
+    # every lookup first replays the store's change log so writes from other workers drop theirs too.
+    def __init__(self, store, ttl_seconds=30, max_entries=1024):
+        self.store = store
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._change_position = store.changes_since(None)[0]
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def __getattr__(self, name):
+        return getattr(self.store, name)
+
+    def _apply_remote_changes(self):
+        with self._lock:
+            position = self._change_position
+        latest, usernames = self.store.changes_since(position)
+        if latest == position and usernames is not None and not usernames:
+            return
+        with self._lock:
+            self._generation += 1
+            if usernames is None:
+                self._entries.clear()
+            else:
+                for username in usernames:
+                    self._entries.pop(username, None)
+            self._change_position = max(self._change_position, latest)
+
+    def get_account_uncached(self, username):
+        return self.store.get_account(username)
+
+    def get_account(self, username):
+        self._apply_remote_changes()
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(username)
+                    self.hits += 1
+                    return dict(entry[1])
+                del self._entries[username]
+                self.expirations += 1
+            self.misses += 1
+            generation = self._generation
+
+        account = self.store.get_account(username)
+        if account is None:
+            return None
+        with self._lock:
+            # A write that landed while we were reading makes this copy stale; skip caching it.
+            if generation == self._generation:
+                self._entries[username] = (now + self.ttl_seconds, dict(account))
+                self._entries.move_to_end(username)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        return account
+
+    def invalidate(self, username=None):
+        with self._lock:
+            self._generation += 1
+            self.invalidations += 1
+            if username is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(username, None)
+
+    def create_account(self, username, account):
+        try:
+            return self.store.create_account(username, account)
+        finally:
+            self.invalidate(username)
+
+    def update_account(self, username, changes):
+        try:
+            return self.store.update_account(username, changes)
+        finally:
+            self.invalidate(username)
+
+    def add_gold(self, username, amount):
+        try:
+            return self.store.add_gold(username, amount)
+        finally:
+            self.invalidate(username)
+
+    def save_all(self, data):
+        try:
+            self.store.save_all(data)
+        finally:
+            self.invalidate()
+
+    @contextmanager
+    def transaction(self):
+        tracked = None
+        try:
+            with self.store.transaction() as accounts:
+                tracked = _TouchedAccounts(accounts)
+                yield tracked
+        finally:
+            if tracked is None:
+                self.invalidate()
+            else:
+                for username in tracked.touched:
+                    self.invalidate(username)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "expirations": self.expirations,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+def migrate_json_accounts(json_path, store):
+    if not os.path.exists(json_path):
+        return 0
+
+    with open(json_path, "r", encoding="utf-8") as db_file:
+        data = json.load(db_file)
+
+    accounts = data.get("accounts") if isinstance(data, dict) else None
+    if not isinstance(accounts, dict):
+        return 0
+
+    migrated = 0
+    with store.transaction() as existing:
+        for username, account in accounts.items():
+            if not isinstance(account, dict) or username in existing:
+                continue
+            existing[username] = account
+            migrated += 1
+    return migrated
+
+
+def create_account_store(backend, json_path, sqlite_path):
+    if backend == "json":
+        return JsonAccountStore(json_path)
+    if backend != "sqlite":
+        raise ValueError(f"Unknown account storage backend: {backend}")
+
+    store = SqliteAccountStore(sqlite_path)
+    if store.get_meta("json_migrated") is None:
+        migrate_json_accounts(json_path, store)
+        store.set_meta("json_migrated", "1")
+    return store
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrate database.json accounts into the SQLite account store.")
+    parser.add_argument("json_path")
+    parser.add_argument("sqlite_path")
+    args = parser.parse_args()
+    count = migrate_json_accounts(args.json_path, SqliteAccountStore(args.sqlite_path))
+    print(f"Migrated {count} accounts into {args.sqlite_path}")
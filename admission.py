@@ -0,0 +1,149 @@
+import threading
+import time
+from collections import OrderedDict
+
+from metrics import REGISTRY
+
+CRITICAL = 0
+NORMAL = 1
+POLLING = 2
+PRIORITY_NAMES = ("critical", "normal", "polling")
+# Share of max_in_flight a priority may fill before its requests are shed; critical calls are never shed.
+SHED_THRESHOLDS = (None, 0.9, 0.5)
+MAX_IN_FLIGHT = 32
+MAX_BUCKETS = 10000
+SHED_RETRY_AFTER_SECONDS = 1
+MAX_STREAMS = 16
+
+# rate is tokens per second per bucket. "client" buckets belong to the session (or the IP when logged out);
+# "ip" buckets always belong to the address, so logging in does not reset them.
+DEFAULT_BUDGET = {"priority": NORMAL, "rate": 10.0, "burst": 20, "scope": "client"}
+# The lobby screen polls about once a second in total; routes sharing a "group" draw from one bucket.
+POLLING_BUDGET = {"priority": POLLING, "rate": 3.0, "burst": 10, "scope": "client", "group": "polling"}
+ROUTE_BUDGETS = {
+    "/api/lobbies": POLLING_BUDGET,
+    "/api/get-lobby/<lobby_id>": POLLING_BUDGET,
+    "/api/check-active-match": POLLING_BUDGET,
+    "/api/matchmaking/status": POLLING_BUDGET,
+    "/api/match-state/<match_id>": {"priority": POLLING, "rate": 10.0, "burst": 20, "scope": "client"},
+    "/api/lobbies/stream": {"priority": POLLING, "rate": 0.5, "burst": 5, "scope": "client"},
+    "/api/get-lobby/<lobby_id>/stream": {"priority": POLLING, "rate": 1.0, "burst": 10, "scope": "client"},
+    "/api/login": {"priority": NORMAL, "rate": 0.5, "burst": 10, "scope": "ip"},
+    "/api/create-account": {"priority": NORMAL, "rate": 0.1, "burst": 5, "scope": "ip"},
+    "/api/join-lobby": {"priority": CRITICAL, "rate": 5.0, "burst": 20, "scope": "client"},
+    "/api/leave-lobby": {"priority": CRITICAL, "rate": 5.0, "burst": 20, "scope": "client"},
+    "/api/set-lobby-team": {"priority": CRITICAL, "rate": 5.0, "burst": 20, "scope": "client"},
+    "/api/start-match": {"priority": CRITICAL, "rate": 5.0, "burst": 20, "scope": "client"},
+    "/api/match-command": {"priority": CRITICAL, "rate": 30.0, "burst": 60, "scope": "client"},
+    "/api/match-relay": {"priority": CRITICAL, "rate": 1.0, "burst": 10, "scope": "client"},
+    "/api/report-match-result": {"priority": CRITICAL, "rate": 1.0, "burst": 10, "scope": "client"},
+}
+# Never limited: scrapers, the static bundle, and shard-to-shard calls already admitted by the node the player hit.
+EXEMPT_ROUTES = frozenset({"/metrics", "/", "/<path:filename>", "/api/shard/lobbies", "/api/shard/matches/<match_id>"})
+# Long-lived streams would pin the in-flight count, so they are rate limited on connect only.
+UNTRACKED_ROUTES = frozenset({"/api/lobbies/stream", "/api/get-lobby/<lobby_id>/stream"})
+
+REJECTIONS = REGISTRY.counter("http_requests_rejected_total", "Requests turned away by admission control.", ("route", "reason", "priority"))
+
+
+class TokenBucket:
+    __slots__ = ("rate", "burst", "tokens", "updated_at")
+
+    def __init__(self, rate, burst, now):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated_at = now
+
+    def take(self, now):
+        # Returns 0 when a token was taken, otherwise the seconds until one will be available.
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class AdmissionController:
+    def __init__(self, budgets=ROUTE_BUDGETS, default_budget=DEFAULT_BUDGET, max_in_flight=MAX_IN_FLIGHT, max_buckets=MAX_BUCKETS, enabled=True):
+        self.budgets = budgets
+        self.default_budget = default_budget
+        self.max_in_flight = max_in_flight
+        self.max_buckets = max_buckets
+        self.enabled = enabled
+        self.in_flight = 0
+        self._lock = threading.Lock()
+        self._buckets = OrderedDict()
+
+    def _bucket(self, key, budget, now):
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(budget["rate"], budget["burst"], now)
+            # Least recently used buckets go first; an evicted client just starts again with a full bucket.
+            while len(self._buckets) > self.max_buckets:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        return bucket
+
+    def admit(self, route, client_key, ip, now=None, rate_limited=True):
+        # Returns (counted, rejection); rejection is None or (status, reason, retry_after_seconds).
+        # Callers must release() every admitted request that was counted. rate_limited=False still sheds by
+        # load but skips the token buckets, for requests another node has already charged.
+        if not self.enabled or route in EXEMPT_ROUTES:
+            return False, None
+        budget = self.budgets.get(route, self.default_budget)
+        priority = budget["priority"]
+        counted = route not in UNTRACKED_ROUTES
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            threshold = SHED_THRESHOLDS[priority]
+            if counted and threshold is not None and self.in_flight >= self.max_in_flight * threshold:
+                rejection = (503, "shed", SHED_RETRY_AFTER_SECONDS)
+            elif not rate_limited:
+                rejection = None
+                if counted:
+                    self.in_flight += 1
+            else:
+                owner = ip if budget["scope"] == "ip" else client_key
+                wait = self._bucket((budget.get("group", route), owner), budget, now).take(now)
+                if wait:
+                    rejection = (429, "rate_limited", wait)
+                else:
+                    rejection = None
+                    if counted:
+                        self.in_flight += 1
+        if rejection is not None:
+            REJECTIONS.inc(route=route, reason=rejection[1], priority=PRIORITY_NAMES[priority])
+            return False, rejection
+        return counted, None
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def bucket_count(self):
+        with self._lock:
+            return len(self._buckets)
+
+
+class StreamSlots:
+    # An open stream pins a request thread until the client goes away. Keeping streams below the thread count
+    # leaves threads for everything else; a refused stream gets a 503 and the client falls back to polling.
+    def __init__(self, limit=MAX_STREAMS):
+        self.limit = limit
+        self.open = 0
+        self._lock = threading.Lock()
+
+    def acquire(self, route):
+        with self._lock:
+            if self.open < self.limit:
+                self.open += 1
+                return True
+        REJECTIONS.inc(route=route, reason="streams_full", priority=PRIORITY_NAMES[POLLING])
+        return False
+
+    def release(self):
+        with self._lock:
+            self.open -= 1
@@ -0,0 +1,157 @@
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SECRET_KEY = "admission-flood-benchmark"
+VICTIM = "steady-player"
+POLLING_PATHS = ("/api/lobbies", "/api/check-active-match", "/api/get-lobby/{lobby_id}")
+
+
+def session_cookie(username):
+    from flask import Flask
+
+    app = Flask(__name__)
+    app.secret_key = SECRET_KEY
+    return "session=" + app.session_interface.get_signing_serializer(app).dumps({"username": username})
+
+
+def _serve(port, admission, flooders, lobbies, ready):
+    os.environ["GAME_DATA_DIR"] = tempfile.mkdtemp(prefix="admission-flood-")
+    os.environ["FLASK_SECRET_KEY"] = SECRET_KEY
+    os.environ["ADMISSION_CONTROL"] = "1" if admission else "0"
+    os.environ["SERVER_SIMULATION"] = "0"
+    os.environ["PASSWORD_HASH_WORKERS"] = "0"
+    import logging
+
+    from werkzeug.serving import make_server
+
+    import Web_game_back as backend
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    for username in [VICTIM] + [f"flooder{index}" for index in range(flooders)]:
+        backend.account_store.create_account(username, {"password": "", "gold": 0, "role": "player"})
+    # Background lobbies give the polling endpoints something to read.
+    for index in range(lobbies):
+        backend.match_store.add(
+            {"id": f"lobby-{index}", "host": f"host{index}", "map": "waterloo", "mode": "1v1", "max_players": 2,
+             "players": [f"host{index}"], "teams": {f"host{index}": None}, "status": "waiting",
+             "created_at": backend.utc_now_iso(), "game_time": 15}
+        )
+    server = make_server("127.0.0.1", port, backend.app, threaded=True)
+    ready.set()
+    server.serve_forever()
+
+
+def request(port, method, path, cookie, body=None):
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    headers = {"Cookie": cookie}
+    if body is not None:
+        headers["Content-Type"] = "application/json"
+        body = json.dumps(body)
+    started_at = time.perf_counter()
+    connection.request(method, path, body=body, headers=headers)
+    response = connection.getresponse()
+    data = response.read()
+    connection.close()
+    return response.status, data, time.perf_counter() - started_at
+
+
+def _flood_client(port, flooder, deadline, statuses):
+    cookie = session_cookie(f"flooder{flooder}")
+    count = 0
+    while time.monotonic() < deadline:
+        path = POLLING_PATHS[count % len(POLLING_PATHS)].format(lobby_id=f"lobby-{count % 10}")
+        try:
+            status, _, _ = request(port, "GET", path, cookie)
+        except OSError:
+            status = "error"
+        statuses[status] += 1
+        count += 1
+
+
+def _flood(port, flooders, duration, results):
+    # Real flooders run on other machines; one niced process keeps them from simply outbidding the server for CPU here.
+    os.nice(10)
+    deadline = time.monotonic() + duration
+    counters = [Counter() for _ in range(flooders)]
+    threads = [threading.Thread(target=_flood_client, args=(port, index, deadline, counters[index])) for index in range(flooders)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    results.put(dict(sum(counters, Counter())))
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def run(admission, flooders, duration, interval, lobbies):
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    ready = multiprocessing.Event()
+    server = multiprocessing.Process(target=_serve, args=(port, admission, flooders, lobbies, ready), daemon=True)
+    server.start()
+    ready.wait(30)
+
+    cookie = session_cookie(VICTIM)
+    status, data, _ = request(port, "POST", "/api/create-lobby", cookie, {"map": "waterloo", "mode": "1v1"})
+    lobby_id = json.loads(data)["lobby"]["id"]
+
+    results = multiprocessing.Queue()
+    flood = multiprocessing.Process(target=_flood, args=(port, flooders, duration, results))
+    flood.start()
+
+    # The steady player keeps making gameplay-critical calls at a human pace while the flood runs.
+    latencies = []
+    failures = Counter()
+    deadline = time.monotonic() + duration
+    turn = 0
+    while time.monotonic() < deadline:
+        status, _, seconds = request(port, "POST", "/api/set-lobby-team", cookie, {"id": lobby_id, "team": ("blue", "red")[turn % 2]})
+        latencies.append(seconds)
+        if status != 200:
+            failures[status] += 1
+        turn += 1
+        time.sleep(interval)
+
+    flood_statuses = Counter(results.get())
+    flood.join()
+    server.terminate()
+    server.join()
+
+    p50 = percentile(latencies, 0.50) * 1000
+    p99 = percentile(latencies, 0.99) * 1000
+    worst = max(latencies) * 1000
+    label = "on " if admission else "off"
+    print(
+        f"admission={label} critical_calls={len(latencies)} failed={dict(failures)} p50={p50:7.1f} ms p99={p99:7.1f} ms max={worst:7.1f} ms"
+        f"  flood_requests={sum(flood_statuses.values())} flood_statuses={dict(sorted(flood_statuses.items(), key=str))}"
+    )
+    return p99, failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Flood the polling endpoints and measure latency of gameplay-critical calls with and without admission control.")
+    parser.add_argument("--flooders", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--interval", type=float, default=0.25, help="pause between the steady player's calls, in seconds")
+    parser.add_argument("--lobbies", type=int, default=200)
+    parser.add_argument("--max-p99-ms", type=float, default=250.0, help="fail when the p99 with admission control exceeds this")
+    args = parser.parse_args()
+
+    run(False, args.flooders, args.duration, args.interval, args.lobbies)
+    p99, failures = run(True, args.flooders, args.duration, args.interval, args.lobbies)
+    sys.exit(0 if p99 <= args.max_p99_ms and not failures else 1)
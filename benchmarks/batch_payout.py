@@ -0,0 +1,62 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def io_counts(histogram):
+    return {f"{store}/{operation}": series[2] for (store, operation), series in histogram._values.items()}
+
+
+def io_delta(before, after):
+    return ", ".join(f"{name}={after[name] - before.get(name, 0)}" for name in sorted(after) if after[name] != before.get(name, 0))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare paying many players one dev-send-gold call at a time with one bulk request.")
+    parser.add_argument("--players", type=int, default=500)
+    parser.add_argument("--amount", type=int, default=25)
+    parser.add_argument("--backend", choices=("sqlite", "json"), default="sqlite")
+    args = parser.parse_args()
+
+    # The app reads its configuration at import time.
+    os.environ["GAME_DATA_DIR"] = tempfile.mkdtemp(prefix="batch-payout-")
+    os.environ["ACCOUNT_STORAGE_BACKEND"] = args.backend
+    os.environ["SERVER_SIMULATION"] = "0"
+    os.environ["ADMISSION_CONTROL"] = "0"
+    os.environ["PASSWORD_HASH_WORKERS"] = "0"
+    os.environ.setdefault("PASSWORD_HASH_METHOD", "pbkdf2:sha256:1000")
+
+    import Web_game_back as backend  # noqa: E402
+    from metrics import STORAGE_IO_SECONDS  # noqa: E402
+
+    players = [f"payee{index:05d}" for index in range(args.players)]
+    for player in players:
+        backend.account_store.create_account(player, {"password": "", "gold": 0, "role": "player"})
+
+    client = backend.app.test_client()
+    response = client.post("/api/login", json={"username": backend.DEVELOPER_USERNAME, "password": backend.DEVELOPER_PASSWORD})
+    assert response.get_json()["success"], response.get_json()
+
+    before = io_counts(STORAGE_IO_SECONDS)
+    started_at = time.perf_counter()
+    for player in players:
+        assert client.post("/api/dev-send-gold", json={"to": player, "amount": args.amount}).status_code == 200
+    per_call_seconds = time.perf_counter() - started_at
+    per_call_io = io_delta(before, io_counts(STORAGE_IO_SECONDS))
+
+    before = io_counts(STORAGE_IO_SECONDS)
+    started_at = time.perf_counter()
+    response = client.post("/api/dev-send-gold", json={"transfers": [{"to": player, "amount": args.amount} for player in players]})
+    bulk_seconds = time.perf_counter() - started_at
+    bulk_io = io_delta(before, io_counts(STORAGE_IO_SECONDS))
+    assert response.status_code == 200 and all(result["success"] for result in response.get_json()["results"])
+
+    balances = {backend.account_store.get_account(player)["gold"] for player in players}
+    print(f"backend={args.backend} players={args.players} final_balances={sorted(balances)}")
+    print(f"per-call: {per_call_seconds * 1000:9.1f} ms  {per_call_seconds * 1e6 / args.players:8.1f} us/player  io: {per_call_io}")
+    print(f"bulk:     {bulk_seconds * 1000:9.1f} ms  {bulk_seconds * 1e6 / args.players:8.1f} us/player  io: {bulk_io}")
+    print(f"speedup:  {per_call_seconds / bulk_seconds:.1f}x")
@@ -0,0 +1,190 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+
+def read_process_io():
+    try:
+        with open("/proc/self/io", "r", encoding="utf-8") as io_file:
+            counters = dict(line.split(": ") for line in io_file.read().splitlines())
+    except OSError:
+        return None
+    return {"read": int(counters["rchar"]), "written": int(counters["wchar"])}
+
+
+def directory_size(path):
+    total = 0
+    for directory, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(directory, name))
+            except OSError:
+                pass
+    return total
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+
+    def call(self, client, method, route, path, **kwargs):
+        started_at = time.perf_counter()
+        response = getattr(client, method)(path, **kwargs)
+        elapsed = time.perf_counter() - started_at
+        with self._lock:
+            self.latencies[route].append(elapsed)
+            self.statuses[route][response.status_code] += 1
+        return response
+
+    def summary(self, elapsed):
+        routes = {}
+        for route, values in sorted(self.latencies.items()):
+            values = sorted(values)
+            routes[route] = {
+                "count": len(values),
+                "p50_ms": percentile(values, 0.50) * 1000,
+                "p95_ms": percentile(values, 0.95) * 1000,
+                "p99_ms": percentile(values, 0.99) * 1000,
+                "max_ms": values[-1] * 1000,
+                "statuses": {str(status): count for status, count in sorted(self.statuses[route].items())},
+            }
+        total = sum(route["count"] for route in routes.values())
+        errors = sum(count for statuses in self.statuses.values() for status, count in statuses.items() if status >= 500)
+        return {"requests": total, "server_errors": errors, "throughput_rps": total / elapsed if elapsed else 0.0, "routes": routes}
+
+
+def player_pair(app, recorder, pair_id, mode, poll_seconds, poll_interval, barrier):
+    password = "load-test-password"
+    host_name = f"lt{pair_id}h"
+    guest_name = f"lt{pair_id}g"
+    host = app.test_client()
+    guest = app.test_client()
+
+    for client, username in ((host, host_name), (guest, guest_name)):
+        recorder.call(client, "post", "POST /api/create-account", "/api/create-account", json={"username": username, "password": password})
+        recorder.call(client, "post", "POST /logout", "/logout")
+        recorder.call(client, "post", "POST /api/login", "/api/login", json={"username": username, "password": password})
+
+    barrier.wait()
+    response = recorder.call(host, "post", "POST /api/create-lobby", "/api/create-lobby", json={"map": "waterloo", "mode": mode})
+    lobby_id = (response.get_json() or {}).get("lobby", {}).get("id")
+    if lobby_id:
+        recorder.call(guest, "post", "POST /api/join-lobby", "/api/join-lobby", json={"id": lobby_id})
+        recorder.call(host, "post", "POST /api/set-lobby-team", "/api/set-lobby-team", json={"id": lobby_id, "team": "blue"})
+        recorder.call(guest, "post", "POST /api/set-lobby-team", "/api/set-lobby-team", json={"id": lobby_id, "team": "red"})
+
+    deadline = time.perf_counter() + poll_seconds
+    while time.perf_counter() < deadline:
+        recorder.call(guest, "get", "GET /api/lobbies", "/api/lobbies")
+        if lobby_id:
+            recorder.call(guest, "get", "GET /api/get-lobby/<id>", f"/api/get-lobby/{lobby_id}")
+        recorder.call(host, "get", "GET /api/get_current_user", "/api/get_current_user")
+        time.sleep(poll_interval)
+
+    if lobby_id:
+        recorder.call(host, "post", "POST /api/start-match", "/api/start-match", json={"id": lobby_id})
+        recorder.call(guest, "get", "GET /api/check-active-match", "/api/check-active-match")
+
+
+def run(args):
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix="load-test-")
+    os.environ["GAME_DATA_DIR"] = data_dir
+    if args.hash_method:
+        os.environ["PASSWORD_HASH_METHOD"] = args.hash_method
+    # Measures handler latency; the simulated players poll far faster than the rate limits allow.
+    os.environ.setdefault("ADMISSION_CONTROL", "0")
+
+    import Web_game_back  # noqa: E402
+
+    app = Web_game_back.app
+    recorder = Recorder()
+    barrier = threading.Barrier(args.pairs)
+    threads = [
+        threading.Thread(target=player_pair, args=(app, recorder, pair_id, args.mode, args.poll_seconds, args.poll_interval, barrier))
+        for pair_id in range(args.pairs)
+    ]
+
+    io_before = read_process_io()
+    started_at = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started_at
+    io_after = read_process_io()
+
+    result = {
+        "config": {
+            "players": args.pairs * 2,
+            "mode": args.mode,
+            "poll_seconds": args.poll_seconds,
+            "poll_interval": args.poll_interval,
+            "hash_method": os.environ.get("PASSWORD_HASH_METHOD", "default"),
+        },
+        "environment": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "elapsed_s": elapsed,
+        "storage": {
+            "bytes_read": io_after["read"] - io_before["read"] if io_before and io_after else None,
+            "bytes_written": io_after["written"] - io_before["written"] if io_before and io_after else None,
+            "data_dir_bytes": directory_size(data_dir),
+        },
+    }
+    result.update(recorder.summary(elapsed))
+    Web_game_back.password_hasher.shutdown()
+    return result
+
+
+def print_report(result, baseline=None):
+    print(f"players={result['config']['players']} elapsed={result['elapsed_s']:.2f}s requests={result['requests']} server_errors={result['server_errors']} throughput={result['throughput_rps']:.1f} req/s")
+    storage = result["storage"]
+    print(f"bytes_read={storage['bytes_read']} bytes_written={storage['bytes_written']} data_dir_bytes={storage['data_dir_bytes']}")
+    print(f"{'route':32} {'count':>7} {'p50_ms':>9} {'p95_ms':>9} {'p99_ms':>9}  vs baseline p95")
+    for route, stats in result["routes"].items():
+        comparison = ""
+        previous = (baseline or {}).get("routes", {}).get(route)
+        if previous and previous["p95_ms"]:
+            comparison = f"{(stats['p95_ms'] / previous['p95_ms'] - 1) * 100:+.1f}%"
+        print(f"{route:32} {stats['count']:7d} {stats['p50_ms']:9.2f} {stats['p95_ms']:9.2f} {stats['p99_ms']:9.2f}  {comparison}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulate concurrent players against the Flask app and record per-route latency.")
+    parser.add_argument("--players", type=int, default=20, help="number of players (rounded up to pairs)")
+    parser.add_argument("--mode", default="1v1")
+    parser.add_argument("--poll-seconds", type=float, default=5.0)
+    parser.add_argument("--poll-interval", type=float, default=0.05)
+    parser.add_argument("--hash-method", default=None, help="override PASSWORD_HASH_METHOD for the run")
+    parser.add_argument("--data-dir", default=None, help="data directory (defaults to a fresh temp dir)")
+    parser.add_argument("--output", default="load_test_results.json")
+    parser.add_argument("--baseline", default=None, help="previous results file to compare against")
+    args = parser.parse_args()
+    args.pairs = max(1, (args.players + 1) // 2)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as baseline_file:
+            baseline = json.load(baseline_file)
+
+    result = run(args)
+    with open(args.output, "w", encoding="utf-8") as output_file:
+        json.dump(result, output_file, indent=2)
+    print_report(result, baseline)
+    print(f"results written to {args.output}")
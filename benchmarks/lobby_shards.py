@@ -0,0 +1,165 @@
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import random
+import socket
+import sys
+import tempfile
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SECRET_KEY = "lobby-shards-benchmark"
+
+
+def session_cookie(username):
+    from flask import Flask
+
+    app = Flask(__name__)
+    app.secret_key = SECRET_KEY
+    return "session=" + app.session_interface.get_signing_serializer(app).dumps({"username": username})
+
+
+def _serve(data_dir, shard, shards, port, usernames, ready):
+    # Every node shares the account database and the coordinator file, and owns one matches-shard-<n> directory.
+    os.environ["GAME_DATA_DIR"] = data_dir
+    os.environ["FLASK_SECRET_KEY"] = SECRET_KEY
+    os.environ["LOBBY_SHARDS"] = str(shards)
+    os.environ["LOBBY_SHARD"] = str(shard)
+    os.environ["LOBBY_SHARD_URL"] = f"http://127.0.0.1:{port}"
+    os.environ["ADMISSION_CONTROL"] = "0"
+    os.environ["SERVER_SIMULATION"] = "0"
+    os.environ["PASSWORD_HASH_WORKERS"] = "0"
+    import logging
+
+    from werkzeug.serving import make_server
+
+    import Web_game_back as backend
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    for username in usernames:
+        if backend.account_store.get_account(username) is None:
+            backend.account_store.create_account(username, {"password": "", "gold": 0, "role": "player"})
+    server = make_server("127.0.0.1", port, backend.app, threaded=True)
+    ready.set()
+    server.serve_forever()
+
+
+def free_port():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+def request(port, method, path, cookie, body=None):
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    headers = {"Cookie": cookie}
+    if body is not None:
+        headers["Content-Type"] = "application/json"
+        body = json.dumps(body)
+    started_at = time.perf_counter()
+    connection.request(method, path, body=body, headers=headers)
+    response = connection.getresponse()
+    data = response.read()
+    connection.close()
+    return response.status, json.loads(data) if data else None, time.perf_counter() - started_at
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else 0.0
+
+
+def run(shards, lobbies, seed):
+    rng = random.Random(seed)
+    data_dir = tempfile.mkdtemp(prefix="lobby-shards-")
+    hosts = [f"host{index}" for index in range(lobbies)]
+    guests = [f"guest{index}" for index in range(lobbies)]
+    ports = [free_port() for _ in range(shards)]
+    nodes = []
+    # Nodes start one at a time so only the first one creates the shared schema and accounts.
+    for shard, port in enumerate(ports):
+        ready = multiprocessing.Event()
+        node = multiprocessing.Process(target=_serve, args=(data_dir, shard, shards, port, hosts + guests if shard == 0 else [], ready), daemon=True)
+        node.start()
+        ready.wait(60)
+        nodes.append(node)
+
+    from lobby_shards import shard_for
+
+    failures = Counter()
+    latencies = {"local": [], "forwarded": []}
+
+    def call(username, method, path, body=None, lobby_id=None):
+        port_index = rng.randrange(shards)
+        status, data, seconds = request(ports[port_index], method, path, session_cookie(username), body)
+        if lobby_id is not None:
+            latencies["local" if shard_for(lobby_id, shards) == port_index else "forwarded"].append(seconds)
+        return status, data
+
+    started_at = time.perf_counter()
+    lobby_ids = []
+    for host in hosts:
+        status, data = call(host, "POST", "/api/create-lobby", {"map": "waterloo", "mode": "1v1"})
+        if status != 201:
+            failures["create"] += 1
+            continue
+        lobby_ids.append(data["lobby"]["id"])
+
+    for lobby_id, host, guest in zip(lobby_ids, hosts, guests):
+        steps = [
+            (guest, "POST", "/api/join-lobby", {"id": lobby_id}),
+            (host, "POST", "/api/set-lobby-team", {"id": lobby_id, "team": "blue"}),
+            (guest, "POST", "/api/set-lobby-team", {"id": lobby_id, "team": "red"}),
+            (guest, "GET", f"/api/get-lobby/{lobby_id}", None),
+        ]
+        for username, method, path, body in steps:
+            status, _ = call(username, method, path, body, lobby_id)
+            if status != 200:
+                failures[path.split("/")[2]] += 1
+
+    # The directory has to find every guest's lobby from any node, whichever shard owns it.
+    for lobby_id, guest in zip(lobby_ids, guests):
+        status, data = call(guest, "GET", "/api/check-active-match")
+        if status != 200 or (data.get("match") or {}).get("id") != lobby_id or data["teams"].get(guest) != "red":
+            failures["check-active-match"] += 1
+
+    status, data = call(hosts[0], "GET", "/api/lobbies")
+    listed = {lobby["id"] for lobby in data.get("lobbies", [])} if status == 200 else set()
+    if listed != set(lobby_ids):
+        failures["lobbies"] += 1
+
+    for lobby_id, host in zip(lobby_ids, hosts):
+        status, _ = call(host, "POST", "/api/start-match", {"id": lobby_id}, lobby_id)
+        if status != 200:
+            failures["start-match"] += 1
+    elapsed = time.perf_counter() - started_at
+
+    per_shard = [len([name for name in os.listdir(os.path.join(data_dir, f"matches-shard-{shard}")) if name.endswith(".json")]) for shard in range(shards)]
+    for node in nodes:
+        node.terminate()
+        node.join()
+
+    local_ms = [seconds * 1000 for seconds in latencies["local"]]
+    forwarded_ms = [seconds * 1000 for seconds in latencies["forwarded"]]
+    print(f"shards={shards} lobbies={len(lobby_ids)} elapsed={elapsed:.2f}s lobbies_per_shard={per_shard}")
+    print(
+        f"local calls={len(local_ms)} p50={percentile(local_ms, 0.5):.1f} ms p99={percentile(local_ms, 0.99):.1f} ms  "
+        f"forwarded calls={len(forwarded_ms)} p50={percentile(forwarded_ms, 0.5):.1f} ms p99={percentile(forwarded_ms, 0.99):.1f} ms"
+    )
+    print(f"failures={dict(failures)}")
+    return not failures and sum(per_shard) == len(lobby_ids) == lobbies
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run several lobby shards on one machine and drive lobbies through random nodes.")
+    parser.add_argument("--shards", type=int, default=3)
+    parser.add_argument("--lobbies", type=int, default=60)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    if args.shards < 2:
+        parser.error("--shards must be at least 2")
+    sys.exit(0 if run(args.shards, args.lobbies, args.seed) else 1)
@@ -0,0 +1,60 @@
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from match_store import MatchStore  # noqa: E402
+
+LOBBY_ID = "stress-lobby"
+
+
+def _join_worker(directory, archive_path, worker_id, joins, start_event):
+    store = MatchStore(directory, archive_path)
+    start_event.wait()
+    for join_number in range(joins):
+        username = f"worker{worker_id}-player{join_number}"
+
+        def apply_join(lobby):
+            lobby["players"].append(username)
+            lobby["teams"][username] = "blue" if join_number % 2 else "red"
+            return None
+
+        store.update(LOBBY_ID, apply_join)
+    return store.conflicts
+
+
+def run(workers, joins):
+    directory = tempfile.mkdtemp(prefix="lobby-stress-")
+    archive_path = os.path.join(directory, "archive.jsonl")
+    store = MatchStore(directory, archive_path)
+    store.add({"id": LOBBY_ID, "host": "host", "status": "waiting", "players": [], "teams": {}})
+
+    manager = multiprocessing.Manager()
+    start_event = manager.Event()
+    with multiprocessing.Pool(workers) as pool:
+        pending = [pool.apply_async(_join_worker, (directory, archive_path, worker_id, joins, start_event)) for worker_id in range(workers)]
+        started_at = time.perf_counter()
+        start_event.set()
+        conflicts = sum(result.get() for result in pending)
+        elapsed = time.perf_counter() - started_at
+
+    final = MatchStore(directory, archive_path).get(LOBBY_ID)
+    expected = workers * joins
+    players = final["players"]
+    lost = expected - len(set(players))
+    print(f"workers={workers} joins_per_worker={joins} elapsed={elapsed:.2f}s")
+    print(f"expected_players={expected} stored_players={len(players)} unique={len(set(players))} teams={len(final['teams'])}")
+    print(f"version={final['version']} cas_conflicts_retried={conflicts} lost_updates={lost}")
+    return lost == 0 and len(players) == expected and len(final["teams"]) == expected and final["version"] == expected + 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Concurrent lobby join stress test for MatchStore across processes.")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--joins", type=int, default=200)
+    args = parser.parse_args()
+    sys.exit(0 if run(args.workers, args.joins) else 1)
@@ -0,0 +1,120 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from websockets.asyncio.client import connect  # noqa: E402
+
+from game_maps import load_maps  # noqa: E402
+from match_relay import MatchRelay  # noqa: E402
+from simulation import MatchSimulation, SimulationHost, build_roster  # noqa: E402
+from snapshot_codec import decode_frame, encode_frame  # noqa: E402
+
+MAPS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "maps.js")
+FLUSH_INTERVAL_SECONDS = 0.05
+
+
+def authenticate(token):
+    username, _, match_id = token.partition("@")
+    return (username, match_id) if username and match_id else None
+
+
+async def play(url, duration, seed, stats):
+    rng = random.Random(seed)
+    frames = {}
+    latest = 0
+    received_bytes = 0
+    latencies = []
+    full_sizes = []
+    outbox = []
+
+    async with connect(url) as websocket:
+        await websocket.recv()
+
+        async def send_inputs():
+            while True:
+                await asyncio.sleep(FLUSH_INTERVAL_SECONDS)
+                if rng.random() < 0.5:
+                    outbox.append({"action": "spawn"})
+                if rng.random() < 0.05:
+                    outbox.append({"action": "formation", "value": rng.choice(["attack", "defense"])})
+                await websocket.send(json.dumps({"ack": latest, "commands": outbox[:]}))
+                outbox.clear()
+
+        sender = asyncio.create_task(send_inputs())
+        started_at = time.monotonic()
+        try:
+            while time.monotonic() - started_at < duration:
+                try:
+                    payload = await asyncio.wait_for(websocket.recv(), timeout=1)
+                except asyncio.TimeoutError:
+                    continue
+                frame = decode_frame(payload, frames)
+                latencies.append(time.time() - frame.server_time)
+                frames[frame.tick] = frame
+                latest = frame.tick
+                received_bytes += len(payload)
+                full_sizes.append(len(encode_frame(frame)))
+                if frame.ended:
+                    break
+        finally:
+            sender.cancel()
+        elapsed = time.monotonic() - started_at
+
+    stats.append(
+        {
+            "bytes_per_second": received_bytes / elapsed,
+            "frames": len(latencies),
+            "latencies": latencies,
+            "delta_bytes": received_bytes / max(len(latencies), 1),
+            "full_bytes": statistics.mean(full_sizes) if full_sizes else 0,
+        }
+    )
+
+
+async def run(matches, duration):
+    game_maps = load_maps(MAPS_PATH)
+    map_ids = sorted(game_maps)
+    host = SimulationHost()
+    relay = MatchRelay(host, authenticate, host="127.0.0.1", port=0)
+    for index in range(matches):
+        players = [f"alice{index}", f"bob{index}"]
+        teams = {players[0]: "blue", players[1]: "red"}
+        host.start_match(MatchSimulation(f"relay-{index}", game_maps[map_ids[index % len(map_ids)]], build_roster(players, teams, 4), 15))
+    await asyncio.to_thread(relay.start)
+
+    stats = []
+    clients = [
+        play(f"ws://127.0.0.1:{relay.port}/match?token={player}{index}@relay-{index}", duration, index * 2 + offset, stats)
+        for index in range(matches)
+        for offset, player in enumerate(("alice", "bob"))
+    ]
+    await asyncio.gather(*clients)
+    host.stop()
+    return stats, host
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure relay bandwidth per player and tick latency with local clients.")
+    parser.add_argument("--matches", type=int, default=10)
+    parser.add_argument("--duration", type=float, default=10.0)
+    args = parser.parse_args()
+
+    stats, host = asyncio.run(run(args.matches, args.duration))
+    latencies = sorted(latency for client in stats for latency in client["latencies"])
+    print(f"clients={len(stats)} matches={args.matches} duration={args.duration}s ticks={host.ticks} overruns={host.overruns}")
+    print(f"bandwidth per player: {statistics.mean(client['bytes_per_second'] for client in stats) / 1024:.2f} KiB/s")
+    print(f"frames per player:    {statistics.mean(client['frames'] for client in stats):.0f}")
+    print(f"snapshot bytes:       delta {statistics.mean(client['delta_bytes'] for client in stats):.0f}, full {statistics.mean(client['full_bytes'] for client in stats):.0f}")
+    print(
+        "tick latency ms:      "
+        f"p50 {latencies[len(latencies) // 2] * 1000:.2f}  "
+        f"p95 {latencies[int(len(latencies) * 0.95)] * 1000:.2f}  "
+        f"max {latencies[-1] * 1000:.2f}"
+    )
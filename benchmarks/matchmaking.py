@@ -0,0 +1,59 @@
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from matchmaking import MatchmakingQueue, SqliteMatchmakingQueue  # noqa: E402
+
+
+def fill(queue, mode, count, rng, now):
+    # Ratings are spaced wider than the base tolerance so the whole crowd stays queued.
+    spacing = queue.base_tolerance + 1
+    ratings = rng.sample(range(count * 4), count)
+    for index, slot in enumerate(ratings):
+        queue.enqueue(f"{mode}-{index}", mode, slot * spacing, now=now)
+
+
+def measure_enqueue(queue, mode, count, rng, now):
+    started_at = time.perf_counter()
+    matched = 0
+    for index in range(count):
+        group = queue.enqueue(f"new-{mode}-{index}", mode, rng.randrange(0, len(queue) * 1000 + 1), now=now)
+        matched += group is not None
+    return (time.perf_counter() - started_at) / count, matched
+
+
+def measure_sweep(queue, now):
+    started_at = time.perf_counter()
+    groups = queue.sweep(now=now, force=True)
+    return time.perf_counter() - started_at, groups
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure matchmaking enqueue and sweep cost with a large waiting crowd.")
+    parser.add_argument("--queued", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--enqueues", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--backend", choices=("memory", "sqlite"), default="memory")
+    args = parser.parse_args()
+
+    print("mode  queued  enqueue_us  matched_on_enqueue  sweep_now_ms  sweep_after_60s_ms  groups_after_60s")
+    for mode in ("1v1", "2v2"):
+        for count in args.queued:
+            rng = random.Random(args.seed)
+            if args.backend == "sqlite":
+                queue = SqliteMatchmakingQueue(os.path.join(tempfile.mkdtemp(prefix="matchmaking-"), "queue.sqlite3"))
+            else:
+                queue = MatchmakingQueue()
+            fill(queue, mode, count, rng, now=0.0)
+            enqueue_seconds, matched = measure_enqueue(queue, mode, args.enqueues, rng, now=0.0)
+            sweep_now, _ = measure_sweep(queue, now=0.0)
+            sweep_later, groups = measure_sweep(queue, now=60.0)
+            print(
+                f"{mode:<4}  {count:6d}  {enqueue_seconds * 1e6:10.1f}  {matched:18d}  "
+                f"{sweep_now * 1000:12.2f}  {sweep_later * 1000:18.2f}  {len(groups):16d}"
+            )
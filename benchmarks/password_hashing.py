@@ -0,0 +1,76 @@
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from password_hashing import HashingOverloadedError, PasswordHasher  # noqa: E402
+
+
+def measure_cost(iterations, samples):
+    hasher = PasswordHasher(f"pbkdf2:sha256:{iterations}", workers=0, max_queue=1)
+    stored_hash = hasher.hash_password("benchmark-password")
+    durations = []
+    for _ in range(samples):
+        started_at = time.perf_counter()
+        hasher.verify(stored_hash, "benchmark-password")
+        durations.append(time.perf_counter() - started_at)
+    return statistics.median(durations)
+
+
+def measure_burst(iterations, workers, max_queue, clients, logins_per_client):
+    hasher = PasswordHasher(f"pbkdf2:sha256:{iterations}", workers=workers, max_queue=max_queue)
+    stored_hash = hasher.hash_password("benchmark-password")
+    accepted = []
+    rejected = []
+    lock = threading.Lock()
+
+    def client():
+        for _ in range(logins_per_client):
+            started_at = time.perf_counter()
+            try:
+                hasher.verify(stored_hash, "benchmark-password")
+                bucket = accepted
+            except HashingOverloadedError:
+                bucket = rejected
+            with lock:
+                bucket.append(time.perf_counter() - started_at)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    started_at = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started_at
+    hasher.shutdown()
+
+    accepted.sort()
+    p99 = accepted[int(len(accepted) * 0.99) - 1] if accepted else 0.0
+    worst_rejection = max(rejected) if rejected else 0.0
+    return len(accepted) / elapsed, p99, len(rejected), worst_rejection
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark password hashing cost and login burst admission control.")
+    parser.add_argument("--iterations", type=int, nargs="+", default=[100000, 300000, 600000, 1000000])
+    parser.add_argument("--samples", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--max-queue", type=int, default=8)
+    parser.add_argument("--clients", type=int, default=64)
+    parser.add_argument("--logins", type=int, default=4)
+    args = parser.parse_args()
+
+    print("iterations  verify_ms")
+    for iterations in args.iterations:
+        print(f"{iterations:>10}  {measure_cost(iterations, args.samples) * 1000:9.1f}")
+
+    print()
+    print(f"burst: clients={args.clients} logins_each={args.logins} workers={args.workers} max_queue={args.max_queue}")
+    print("iterations  accepted_per_s  accepted_p99_ms  rejected  slowest_rejection_ms")
+    for iterations in args.iterations:
+        throughput, p99, rejected, worst_rejection = measure_burst(iterations, args.workers, args.max_queue, args.clients, args.logins)
+        print(f"{iterations:>10}  {throughput:14.1f}  {p99 * 1000:15.1f}  {rejected:8d}  {worst_rejection * 1000:20.2f}")
@@ -0,0 +1,47 @@
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from game_maps import load_maps  # noqa: E402
+from simulation import TICK_RATE, MatchSimulation, build_roster  # noqa: E402
+
+MAPS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "maps.js")
+
+
+def build_matches(count, game_maps, difficulty):
+    map_ids = sorted(game_maps)
+    return [
+        MatchSimulation(f"bench-{index}", game_maps[map_ids[index % len(map_ids)]], build_roster([], {}, 4), 15, difficulty=difficulty)
+        for index in range(count)
+    ]
+
+
+def measure(count, ticks, game_maps, difficulty):
+    matches = build_matches(count, game_maps, difficulty)
+    delta = 1.0 / TICK_RATE
+    started_at = time.perf_counter()
+    for _ in range(ticks):
+        for match in matches:
+            match.tick(delta)
+    elapsed = time.perf_counter() - started_at
+    units = sum(match.count for match in matches)
+    return elapsed / ticks, units
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure how many concurrent bot matches one process can tick at the server rate.")
+    parser.add_argument("--matches", type=int, nargs="+", default=[1, 10, 50, 100, 200])
+    parser.add_argument("--ticks", type=int, default=600)
+    parser.add_argument("--difficulty", default="hard")
+    args = parser.parse_args()
+
+    game_maps = load_maps(MAPS_PATH)
+    budget_ms = 1000.0 / TICK_RATE
+    print(f"tick budget at {TICK_RATE} Hz: {budget_ms:.1f} ms")
+    print("matches  tick_ms  budget_used  units_alive")
+    for count in args.matches:
+        tick_seconds, units = measure(count, args.ticks, game_maps, args.difficulty)
+        print(f"{count:>7}  {tick_seconds * 1000:7.2f}  {tick_seconds * 1000 / budget_ms:10.0%}  {units:11d}")
@@ -0,0 +1,83 @@
+import argparse
+import copy
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from game_maps import load_maps  # noqa: E402
+from simulation import FORMATION_ATTACK, TICK_RATE, UNIT_COLLISION_DISTANCE, MatchSimulation, build_roster  # noqa: E402
+
+MAPS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "maps.js")
+
+
+def populate(game_map, count, seed):
+    simulation = MatchSimulation(
+        "grid-bench",
+        game_map,
+        build_roster([], {}, 4),
+        15,
+        seed=seed,
+        config={"maxTotalUnits": count, "maxUnitsPerPlayer": count},
+    )
+    rng = np.random.default_rng(seed)
+    simulation.count = count
+    simulation.unit_id[:count] = np.arange(1, count + 1)
+    simulation.x[:count] = simulation.target_x[:count] = rng.uniform(0, simulation.width, count)
+    simulation.y[:count] = simulation.target_y[:count] = rng.uniform(0, simulation.height, count)
+    simulation.strength[:count] = rng.integers(1, 100, count)
+    simulation.owner[:count] = rng.integers(0, len(simulation.player_names), count)
+    simulation.team[:count] = simulation.player_team[simulation.owner[:count]]
+    simulation.player_formation[::2] = FORMATION_ATTACK
+    return simulation
+
+
+def frame(simulation):
+    simulation._apply_formations()
+    simulation._move(1.0 / TICK_RATE)
+    simulation._resolve_combat()
+    simulation._update_objectives()
+
+
+def brute_force_contacts(simulation):
+    n = simulation.count
+    x = simulation.x[:n]
+    y = simulation.y[:n]
+    team = simulation.team[:n]
+    dx = x[:, None] - x[None, :]
+    dy = y[:, None] - y[None, :]
+    contact = np.triu((dx * dx + dy * dy <= UNIT_COLLISION_DISTANCE**2) & (team[:, None] != team[None, :]), k=1)
+    return np.nonzero(contact)
+
+
+def best_of(function, prototype, repeats):
+    timings = []
+    for _ in range(repeats):
+        simulation = copy.deepcopy(prototype)
+        started_at = time.perf_counter()
+        function(simulation)
+        timings.append(time.perf_counter() - started_at)
+    return min(timings)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure frame cost of the grid-backed rules as unit counts grow.")
+    parser.add_argument("--units", type=int, nargs="+", default=[500, 1000, 2500, 5000, 10000])
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--brute-force-limit", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    game_maps = load_maps(MAPS_PATH)
+    print("map           units  frame_ms  us_per_unit  all_pairs_contacts_ms")
+    for map_id, game_map in game_maps.items():
+        for count in args.units:
+            prototype = populate(game_map, count, args.seed)
+            frame_seconds = best_of(frame, prototype, args.repeats)
+            brute = "-"
+            if count <= args.brute_force_limit:
+                brute = f"{best_of(brute_force_contacts, prototype, args.repeats) * 1000:.2f}"
+            print(f"{map_id:<12}  {count:5d}  {frame_seconds * 1000:8.2f}  {frame_seconds * 1e6 / count:11.2f}  {brute:>21}")
@@ -0,0 +1,55 @@
+import argparse
+import math
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from telemetry import FLUSH_INTERVAL_SECONDS, RESOLUTIONS, TelemetryStore  # noqa: E402
+
+METRICS = [f"{name}.{team}" for name in ("gold", "strength", "units", "objectives", "deployed") for team in ("blue", "red")]
+
+
+def ingest(store, match_id, hours):
+    # One upload per flush interval, each carrying a 1 s sample of every metric, as a client would send them.
+    seconds = int(hours * 3600)
+    started_at = time.perf_counter()
+    for batch_start in range(0, seconds, FLUSH_INTERVAL_SECONDS):
+        times = list(range(batch_start, min(batch_start + FLUSH_INTERVAL_SECONDS, seconds)))
+        store.append(match_id, {name: (times, [math.sin(moment / 60 + index) * 100 for moment in times]) for index, name in enumerate(METRICS)})
+    return time.perf_counter() - started_at, seconds // FLUSH_INTERVAL_SECONDS
+
+
+def timed_query(store, match_id, **options):
+    started_at = time.perf_counter()
+    series = store.query(match_id, **options)
+    points = sum(len(columns["avg"]) for columns in series["metrics"].values())
+    return (time.perf_counter() - started_at) * 1000, series["resolution"], points
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure telemetry ingestion and query latency for long matches.")
+    parser.add_argument("--hours", type=float, nargs="+", default=[0.5, 2, 6])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    print("hours  uploads  ingest_ms  cold_query_ms  overview_res  overview_ms  last_5min_ms  full_60s_ms  points")
+    for hours in args.hours:
+        # The second store stands in for a worker that has never seen the match, so its first query rebuilds the rollups.
+        directory = tempfile.mkdtemp(prefix="telemetry-bench-")
+        match_id = f"bench-{hours:g}h".replace(".", "_")
+        ingest_seconds, uploads = ingest(TelemetryStore(directory), match_id, hours)
+        store = TelemetryStore(directory)
+        cold_ms, _, _ = timed_query(store, match_id)
+        end = int(hours * 3600)
+        overview = [timed_query(store, match_id) for _ in range(args.repeat)]
+        recent = [timed_query(store, match_id, resolution=RESOLUTIONS[0], start=end - 300, end=end) for _ in range(args.repeat)]
+        coarse = [timed_query(store, match_id, resolution=RESOLUTIONS[-1]) for _ in range(args.repeat)]
+        print(
+            f"{hours:5g}  {uploads:7d}  {ingest_seconds * 1000:9.1f}  {cold_ms:13.1f}  {overview[0][1]:12d}  "
+            f"{sorted(ms for ms, _, _ in overview)[len(overview) // 2]:11.2f}  "
+            f"{sorted(ms for ms, _, _ in recent)[len(recent) // 2]:12.2f}  "
+            f"{sorted(ms for ms, _, _ in coarse)[len(coarse) // 2]:11.2f}  {overview[0][2]:6d}"
+        )
@@ -0,0 +1,208 @@
+import argparse
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from game_maps import load_maps
+from simulation import BOT_DIFFICULTY, TEAMS, TICK_RATE, UNIT_COST, MatchSimulation
+
+MAPS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "maps.js")
+ARENA_BEHAVIORS = ("passive", "adaptive", "strategic")
+ARENA_GAME_MINUTES = 15
+GOLD_SAMPLE_SECONDS = 10
+ARENA_CHUNK_SIZE = 8
+
+_arena = {}
+
+
+def build_profiles(names, overrides=None):
+    overrides = overrides or {}
+    profiles = {}
+    for name in names:
+        profile = dict(BOT_DIFFICULTY.get(name, {}), **overrides.get(name, {}))
+        if profile.get("behavior") not in ARENA_BEHAVIORS or not isinstance(profile.get("spawnIntervalMs"), (int, float)):
+            raise ValueError(f"Difficulty {name!r} needs a spawnIntervalMs and one of {', '.join(ARENA_BEHAVIORS)}")
+        profiles[name] = profile
+    return profiles
+
+
+def schedule(map_ids, names, rounds, seed):
+    # Every ordered pairing plays on every map, so each side of each map is covered for both profiles.
+    jobs = []
+    for map_id, (blue, red) in itertools.product(map_ids, itertools.product(names, repeat=2)):
+        for _ in range(rounds):
+            jobs.append((map_id, blue, red, seed + len(jobs)))
+    return jobs
+
+
+def _init_worker(settings):
+    _arena.clear()
+    _arena.update(settings)
+
+
+def play_match(job):
+    map_id, blue, red, seed = job
+    profiles = _arena["profiles"]
+    roster = []
+    for team, name in zip(TEAMS, (blue, red)):
+        roster.extend(
+            {"name": f"{name} {team} {slot + 1}", "team": team, "bot": True, "difficulty": profiles[name]}
+            for slot in range(_arena["players_per_team"])
+        )
+
+    simulation = MatchSimulation(
+        f"arena-{seed}",
+        _arena["maps"][map_id],
+        roster,
+        _arena["game_time"],
+        seed=seed,
+        config=_arena["config"],
+        unit_cost=_arena["unit_cost"],
+    )
+    team_sizes = np.bincount(simulation.player_team, minlength=len(TEAMS))
+    sample_every = max(1, int(round(_arena["sample_seconds"] * TICK_RATE)))
+    delta = 1.0 / TICK_RATE
+    gold = []
+    while not simulation.ended:
+        if simulation.tick_count % sample_every == 0:
+            gold.append(np.bincount(simulation.player_team, weights=simulation.player_gold, minlength=len(TEAMS)) / team_sizes)
+        simulation.tick(delta)
+
+    gold = np.array(gold)
+    return {
+        "map": map_id,
+        "blue": blue,
+        "red": red,
+        "seed": seed,
+        "winner": simulation.winner,
+        "timed_out": simulation.remaining_ms == 0,
+        "seconds": simulation.tick_count / TICK_RATE,
+        "gold": {"blue": gold[:, 0].round(1).tolist(), "red": gold[:, 1].round(1).tolist()},
+    }
+
+
+def run_arena(jobs, settings, workers=None):
+    if workers == 0:
+        _init_worker(settings)
+        return [play_match(job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(settings,)) as pool:
+        return list(pool.map(play_match, jobs, chunksize=ARENA_CHUNK_SIZE))
+
+
+def _mean_curve(curves):
+    # Matches end at different times, so each sample is averaged over the matches still running then.
+    if not curves:
+        return []
+    length = max(len(curve) for curve in curves)
+    padded = np.full((len(curves), length), np.nan)
+    for row, curve in enumerate(curves):
+        padded[row, : len(curve)] = curve
+    return np.round(np.nanmean(padded, axis=0), 1).tolist()
+
+
+def summarize(results, names):
+    pairings = {}
+    for result in results:
+        key = (result["map"], result["blue"], result["red"])
+        pairings.setdefault(key, []).append(result)
+
+    matchups = []
+    for (map_id, blue, red), played in sorted(pairings.items()):
+        matchups.append(
+            {
+                "map": map_id,
+                "blue": blue,
+                "red": red,
+                "matches": len(played),
+                "blue_win_rate": sum(result["winner"] == "blue" for result in played) / len(played),
+                "timeout_rate": sum(result["timed_out"] for result in played) / len(played),
+                "average_seconds": sum(result["seconds"] for result in played) / len(played),
+            }
+        )
+
+    difficulties = {}
+    for name in names:
+        # Mirror matches say nothing about the profile itself, only about map sides.
+        played = [(team, result) for result in results for team in TEAMS if result[team] == name and result["blue"] != result["red"]]
+        wins = sum(result["winner"] == team for team, result in played)
+        difficulties[name] = {
+            "matches": len(played),
+            "win_rate": wins / len(played) if played else None,
+            "average_seconds": sum(result["seconds"] for _, result in played) / len(played) if played else None,
+            "gold_curve": _mean_curve([result["gold"][team] for result in results for team in TEAMS if result[team] == name]),
+        }
+    return {"matchups": matchups, "difficulties": difficulties}
+
+
+def print_report(summary, sample_seconds, elapsed, match_count):
+    print("map           blue      red       matches  blue_win  timeouts  avg_s")
+    for row in summary["matchups"]:
+        print(
+            f"{row['map']:<12}  {row['blue']:<8}  {row['red']:<8}  {row['matches']:7d}  "
+            f"{row['blue_win_rate']:8.0%}  {row['timeout_rate']:8.0%}  {row['average_seconds']:5.0f}"
+        )
+    print()
+    print("difficulty  matches  win_rate  avg_s  gold every %ss" % sample_seconds)
+    for name, row in summary["difficulties"].items():
+        win_rate = f"{row['win_rate']:8.0%}" if row["win_rate"] is not None else "       -"
+        average = f"{row['average_seconds']:5.0f}" if row["average_seconds"] is not None else "    -"
+        curve = " ".join(f"{value:.0f}" for value in row["gold_curve"][:12])
+        print(f"{name:<10}  {row['matches']:7d}  {win_rate}  {average}  {curve}")
+    print()
+    print(f"{match_count} matches in {elapsed:.1f}s ({match_count / elapsed * 60:.0f} matches/minute)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Play bot difficulties against each other headlessly to balance gameplay settings.")
+    parser.add_argument("--difficulties", nargs="+", default=list(BOT_DIFFICULTY))
+    parser.add_argument("--maps", nargs="+", help="Map ids from maps.js (default: all).")
+    parser.add_argument("--rounds", type=int, default=10, help="Matches per map and ordered pairing.")
+    parser.add_argument("--players-per-team", type=int, choices=(1, 2), default=1)
+    parser.add_argument("--game-time", type=float, default=ARENA_GAME_MINUTES, help="Match length in minutes.")
+    parser.add_argument("--unit-cost", type=int, default=UNIT_COST)
+    parser.add_argument("--config", type=json.loads, default={}, help='GAMEPLAY_CONFIG overrides, e.g. \'{"startingGold": 150}\'.')
+    parser.add_argument(
+        "--difficulty-overrides",
+        type=json.loads,
+        default={},
+        help='Per-difficulty overrides or new profiles, e.g. \'{"hard": {"spawnIntervalMs": 400}}\'.',
+    )
+    parser.add_argument("--sample-seconds", type=float, default=GOLD_SAMPLE_SECONDS)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--workers", type=int, help="Worker processes (default: CPU count, 0 runs in-process).")
+    parser.add_argument("--output", help="Write the summary and every match result as JSON.")
+    args = parser.parse_args()
+
+    game_maps = load_maps(MAPS_PATH)
+    map_ids = args.maps or sorted(game_maps)
+    unknown = sorted(set(map_ids) - set(game_maps))
+    if unknown:
+        parser.error(f"Unknown maps: {', '.join(unknown)}")
+    try:
+        profiles = build_profiles(args.difficulties, args.difficulty_overrides)
+    except ValueError as error:
+        parser.error(str(error))
+
+    settings = {
+        "maps": {map_id: game_maps[map_id] for map_id in map_ids},
+        "profiles": profiles,
+        "players_per_team": args.players_per_team,
+        "game_time": args.game_time,
+        "unit_cost": args.unit_cost,
+        "config": args.config,
+        "sample_seconds": args.sample_seconds,
+    }
+    jobs = schedule(map_ids, args.difficulties, args.rounds, args.seed)
+    started_at = time.perf_counter()
+    results = run_arena(jobs, settings, args.workers)
+    elapsed = time.perf_counter() - started_at
+
+    summary = summarize(results, args.difficulties)
+    print_report(summary, args.sample_seconds, elapsed, len(results))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output_file:
+            json.dump({"settings": dict(settings, maps=map_ids), "summary": summary, "results": results}, output_file)
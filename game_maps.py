@@ -0,0 +1,146 @@
+import hashlib
+import json
+import math
+import re
+
+MAPS_SCRIPT_PATTERN = re.compile(r"const\s+MAPS\s*=\s*(\[.*?\]);", re.DOTALL)
+UNQUOTED_KEY_PATTERN = re.compile(r"([{,]\s*)([A-Za-z_][A-Za-z0-9_]*)\s*:")
+TRAILING_COMMA_PATTERN = re.compile(r",(\s*[}\]])")
+WORLD_WIDTH = 3000
+WORLD_HEIGHT = 2000
+TOWN_RADIUS = 80
+TOWN_CELL_SIZE = TOWN_RADIUS
+MAP_VERSION_LENGTH = 12
+PREVIEW_SIZE = 300
+PREVIEW_STAR_SPIKES = 5
+PREVIEW_BACKGROUNDS = {"grass": "#a4cd8a", "desert": "#d8bf7b", "default": "#a4cd8a"}
+PREVIEW_BLUE = "#1f57d6"
+PREVIEW_RED = "#d83131"
+
+
+def parse_maps_script(source):
+    # maps.js is the client's source of truth; its object literals are close enough to JSON to convert.
+    found = MAPS_SCRIPT_PATTERN.search(source)
+    if not found:
+        raise ValueError("maps.js does not define a MAPS array")
+    literal = UNQUOTED_KEY_PATTERN.sub(r'\1"\2":', found.group(1))
+    literal = TRAILING_COMMA_PATTERN.sub(r"\1", literal)
+    return json.loads(literal)
+
+
+def load_maps(path):
+    with open(path, "r", encoding="utf-8") as maps_file:
+        maps = parse_maps_script(maps_file.read())
+    return {game_map["id"]: game_map for game_map in maps}
+
+
+def to_world_map(game_map):
+    # Same scaling as toWorldMap() in Web_game.js: every map is played on a WORLD_WIDTH x WORLD_HEIGHT field.
+    scale_x = WORLD_WIDTH / game_map["width"]
+    scale_y = WORLD_HEIGHT / game_map["height"]
+
+    def to_world_point(point):
+        return {"x": point["x"] * scale_x, "y": point["y"] * scale_y}
+
+    return dict(
+        game_map,
+        width=WORLD_WIDTH,
+        height=WORLD_HEIGHT,
+        spawnPoints={team: to_world_point(point) for team, point in game_map.get("spawnPoints", {}).items()},
+        towns=[dict(town, **to_world_point(town)) for town in game_map.get("towns", [])],
+    )
+
+
+def town_cells(game_map, radius, cell_size):
+    # Cells of a cell_size grid over the map that some town's capture circle reaches, mapped to those towns.
+    cells = {}
+    cols = int(math.ceil(game_map["width"] / cell_size))
+    rows = int(math.ceil(game_map["height"] / cell_size))
+    for index, town in enumerate(game_map.get("towns", [])):
+        first_col = max(0, int((town["x"] - radius) // cell_size))
+        last_col = min(cols - 1, int((town["x"] + radius) // cell_size))
+        first_row = max(0, int((town["y"] - radius) // cell_size))
+        last_row = min(rows - 1, int((town["y"] + radius) // cell_size))
+        for row in range(first_row, last_row + 1):
+            for col in range(first_col, last_col + 1):
+                # Distance from the town to the closest point of the cell.
+                dx = max(col * cell_size - town["x"], 0, town["x"] - (col + 1) * cell_size)
+                dy = max(row * cell_size - town["y"], 0, town["y"] - (row + 1) * cell_size)
+                if dx * dx + dy * dy <= radius * radius:
+                    cells.setdefault((col, row), []).append(index)
+    return {cell: tuple(towns) for cell, towns in cells.items()}
+
+
+def _star_points(x, y, radius):
+    # Same outline as drawStar() in Web_game.js.
+    points = []
+    rotation = math.pi / 2 * 3
+    for step in range(PREVIEW_STAR_SPIKES * 2):
+        distance = radius if step % 2 == 0 else radius * 0.45
+        points.append(f"{x + math.cos(rotation) * distance:.1f},{y + math.sin(rotation) * distance:.1f}")
+        rotation += math.pi / PREVIEW_STAR_SPIKES
+    return " ".join(points)
+
+
+def render_preview_svg(game_map, size=PREVIEW_SIZE):
+    # Mirrors renderMapPreview(): the whole map squeezed into a size x size square, spawns and towns as stars.
+    scale_x = size / game_map["width"]
+    scale_y = size / game_map["height"]
+    background = PREVIEW_BACKGROUNDS.get(game_map.get("background"), PREVIEW_BACKGROUNDS["default"])
+    shapes = [f'<rect width="{size}" height="{size}" fill="{background}"/>']
+    for team, color in (("blue", PREVIEW_BLUE), ("red", PREVIEW_RED)):
+        point = game_map.get("spawnPoints", {}).get(team)
+        if point is not None:
+            shapes.append(f'<polygon points="{_star_points(point["x"] * scale_x, point["y"] * scale_y, 10)}" fill="{color}"/>')
+    for town in game_map.get("towns", []):
+        shapes.append(f'<polygon points="{_star_points(town["x"] * scale_x, town["y"] * scale_y, 9)}" fill="{PREVIEW_RED}"/>')
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{size}" height="{size}" viewBox="0 0 {size} {size}">' + "".join(shapes) + "</svg>"
+    ).encode("utf-8")
+
+
+class CompiledMap:
+    def __init__(self, game_map):
+        self.id = game_map["id"]
+        self.source = game_map
+        self.version = hashlib.sha256(json.dumps(game_map, sort_keys=True).encode("utf-8")).hexdigest()[:MAP_VERSION_LENGTH]
+        self.world = to_world_map(game_map)
+        self.bounds = (0, 0, self.world["width"], self.world["height"])
+        self.spawn_points = {team: (point["x"], point["y"]) for team, point in self.world["spawnPoints"].items()}
+        self.towns = tuple((town.get("name"), town["x"], town["y"]) for town in self.world["towns"])
+        self.town_cells = town_cells(self.world, TOWN_RADIUS, TOWN_CELL_SIZE)
+        self.preview_svg = render_preview_svg(game_map)
+
+    def towns_near(self, x, y):
+        # Candidate towns for a world position; callers still check the exact radius.
+        return self.town_cells.get((int(x // TOWN_CELL_SIZE), int(y // TOWN_CELL_SIZE)), ())
+
+    def describe(self):
+        return dict(self.source, version=self.version, preview=f"/api/maps/{self.id}/preview.svg?v={self.version}")
+
+
+class MapCatalogue:
+    # Built once at startup; lookups by map id are plain dict hits.
+    def __init__(self, maps):
+        self.compiled = {map_id: CompiledMap(game_map) for map_id, game_map in maps.items()}
+        self.ids = list(self.compiled)
+        self.version = hashlib.sha256("".join(self.compiled[map_id].version for map_id in self.ids).encode("utf-8")).hexdigest()[:MAP_VERSION_LENGTH]
+        self.body = json.dumps(
+            {"success": True, "version": self.version, "maps": [self.compiled[map_id].describe() for map_id in self.ids]}, separators=(",", ":")
+        ).encode("utf-8")
+
+    @classmethod
+    def load(cls, path):
+        return cls(load_maps(path))
+
+    def get(self, map_id):
+        return self.compiled.get(map_id)
+
+    def __contains__(self, map_id):
+        return map_id in self.compiled
+
+    def __getitem__(self, map_id):
+        return self.compiled[map_id].source
+
+    def __len__(self):
+        return len(self.compiled)
@@ -0,0 +1,155 @@
+import bisect
+import logging
+import threading
+
+try:
+    from sortedcontainers import SortedList
+except ImportError:
+    SortedList = None
+
+logger = logging.getLogger(__name__)
+
+
+class _BisectList:
+    # Fallback when sortedcontainers is not installed: O(log n) lookups, but each
+    # add/remove shifts the list, so single updates cost O(n).
+    def __init__(self, items=()):
+        self._items = sorted(items)
+
+    def add(self, item):
+        bisect.insort(self._items, item)
+
+    def remove(self, item):
+        position = bisect.bisect_left(self._items, item)
+        if position < len(self._items) and self._items[position] == item:
+            del self._items[position]
+
+    def bisect_left(self, item):
+        return bisect.bisect_left(self._items, item)
+
+    def clear(self):
+        self._items = []
+
+    def __getitem__(self, position):
+        return self._items[position]
+
+    def __len__(self):
+        return len(self._items)
+
+
+def new_sorted_index(items=()):
+    return SortedList(items) if SortedList is not None else _BisectList(items)
+
+
+class Leaderboard:
+    # Reads are O(log n) either way. Single updates are O(log n) with sortedcontainers
+    # and O(n) with the list fallback; full rebuilds are one sort, built off-lock and swapped in.
+    def __init__(self, excluded_roles=("developer",)):
+        self.excluded_roles = excluded_roles
+        self._lock = threading.Lock()
+        self._index = new_sorted_index()
+        self._keys = {}
+        self._stats = {}
+        self._updated_during_rebuild = None
+        self._ready = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def _key(username, account):
+        return (-int(account.get("wins", 0)), -int(account.get("xp", 0)), username)
+
+    @staticmethod
+    def _entry(username, account):
+        return {
+            "username": username,
+            "wins": account.get("wins", 0),
+            "losses": account.get("losses", 0),
+            "xp": account.get("xp", 0),
+            "level": account.get("level", 1),
+        }
+
+    def _discard(self, username):
+        key = self._keys.pop(username, None)
+        if key is not None:
+            self._index.remove(key)
+        self._stats.pop(username, None)
+
+    def _insert(self, username, account):
+        if account.get("role", "player") in self.excluded_roles:
+            return
+        key = self._key(username, account)
+        self._keys[username] = key
+        self._stats[username] = self._entry(username, account)
+        self._index.add(key)
+
+    def rebuild(self, accounts):
+        with self._lock:
+            self._updated_during_rebuild = {}
+
+        keys = {}
+        stats = {}
+        for username, account in accounts.items():
+            if account.get("role", "player") in self.excluded_roles:
+                continue
+            keys[username] = self._key(username, account)
+            stats[username] = self._entry(username, account)
+        index = new_sorted_index(keys.values())
+
+        with self._lock:
+            self._index, self._keys, self._stats = index, keys, stats
+            # The snapshot may predate results reported while it was being sorted.
+            updated, self._updated_during_rebuild = self._updated_during_rebuild, None
+            for username, account in updated.items():
+                self._discard(username)
+                if account is not None:
+                    self._insert(username, account)
+        self._ready.set()
+
+    def start(self, load_accounts, interval):
+        # Other workers report results too; a periodic background rebuild keeps this
+        # worker's index from drifting without putting the reload on a request.
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(load_accounts, interval), name="leaderboard-refresh", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            thread.join()
+
+    def wait_ready(self, timeout=None):
+        return self._ready.wait(timeout)
+
+    def _run(self, load_accounts, interval):
+        while not self._stop.is_set():
+            try:
+                self.rebuild(load_accounts())
+            except Exception:
+                logger.exception("Failed to rebuild leaderboard")
+            self._stop.wait(interval)
+
+    def update(self, username, account):
+        with self._lock:
+            if self._updated_during_rebuild is not None:
+                self._updated_during_rebuild[username] = account
+            self._discard(username)
+            if account is not None:
+                self._insert(username, account)
+
+    def top(self, limit):
+        with self._lock:
+            return [dict(self._stats[key[2]], rank=rank) for rank, key in enumerate(self._index[:limit], start=1)]
+
+    def rank(self, username):
+        with self._lock:
+            key = self._keys.get(username)
+            if key is None:
+                return None
+            return dict(self._stats[username], rank=self._index.bisect_left(key) + 1)
+
+    def __len__(self):
+        return len(self._index)
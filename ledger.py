@@ -0,0 +1,413 @@
+import argparse
+import bisect
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from metrics import observe_io, record_lock_wait, timed_lock
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+SEGMENT_PATTERN = re.compile(r"^transactions-(\d{6})\.jsonl$")
+
+
+def _timestamp_value(raw):
+    try:
+        parsed = datetime.fromisoformat(raw)
+    except (TypeError, ValueError):
+        return 0.0
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def _involves(entry, user):
+    return entry.get("from") == user or entry.get("to") == user
+
+
+class _Segment:
+    def __init__(self, number, path):
+        self.number = number
+        self.path = path
+        self.index_path = path[: -len(".jsonl")] + ".idx.json"
+        self.count = 0
+        self.size = 0
+        self.min_ts = None
+        self.max_ts = None
+        self.users = set()
+        self.offsets = []
+        self.offset_times = []
+
+    def record(self, entry, offset, length, index_interval):
+        ts = _timestamp_value(entry.get("timestamp"))
+        if self.count % index_interval == 0:
+            # Index points carry the newest timestamp seen before them, so seeking
+            # stays correct even when concurrent writers land slightly out of order.
+            self.offset_times.append(self.max_ts if self.max_ts is not None else 0.0)
+            self.offsets.append(offset)
+        self.min_ts = ts if self.min_ts is None else min(self.min_ts, ts)
+        self.max_ts = ts if self.max_ts is None else max(self.max_ts, ts)
+        for user in (entry.get("from"), entry.get("to")):
+            if user:
+                self.users.add(user)
+        self.count += 1
+        self.size = offset + length
+
+    def rebuild(self, index_interval):
+        # Picks up from the last known size, so it also absorbs lines other
+        # processes appended since this segment was last read.
+        with open(self.path, "rb") as segment_file:
+            segment_file.seek(self.size)
+            offset = self.size
+            for line in segment_file:
+                if not line.endswith(b"\n"):
+                    break
+                if line.strip():
+                    self.record(json.loads(line), offset, len(line), index_interval)
+                offset += len(line)
+        self.size = offset
+
+    def is_line_start(self, offset):
+        if offset == 0:
+            return True
+        if offset > self.size:
+            return False
+        with open(self.path, "rb") as segment_file:
+            segment_file.seek(offset - 1)
+            return segment_file.read(1) == b"\n"
+
+    def save_index(self):
+        with open(self.index_path, "w", encoding="utf-8") as index_file:
+            json.dump(
+                {
+                    "count": self.count,
+                    "size": self.size,
+                    "min_ts": self.min_ts,
+                    "max_ts": self.max_ts,
+                    "users": sorted(self.users),
+                    "offsets": self.offsets,
+                    "offset_times": self.offset_times,
+                },
+                index_file,
+            )
+
+    def load_index(self):
+        with open(self.index_path, "r", encoding="utf-8") as index_file:
+            data = json.load(index_file)
+        self.count = data["count"]
+        self.size = data["size"]
+        self.min_ts = data["min_ts"]
+        self.max_ts = data["max_ts"]
+        self.users = set(data["users"])
+        self.offsets = data["offsets"]
+        self.offset_times = data["offset_times"]
+
+    def overlaps(self, user, since, until):
+        if self.count == 0:
+            return False
+        if user is not None and user not in self.users:
+            return False
+        if since is not None and self.max_ts < since:
+            return False
+        if until is not None and self.min_ts > until:
+            return False
+        return True
+
+    def seek_offset(self, since):
+        if since is None or not self.offsets:
+            return 0
+        position = bisect.bisect_left(self.offset_times, since) - 1
+        return self.offsets[max(position, 0)]
+
+
+class TransactionLedger:
+    def __init__(self, directory, segment_max_bytes=4 * 1024 * 1024, index_interval=64, sync=True):
+        self.directory = directory
+        self.segment_max_bytes = segment_max_bytes
+        self.index_interval = index_interval
+        self.sync = sync
+        self._cond = threading.Condition()
+        self._segments = []
+        self._handle = None
+        self._retired = []
+        self._written = 0
+        self._synced = 0
+        self._syncing = False
+        os.makedirs(directory, exist_ok=True)
+        self._lock_file = open(os.path.join(directory, "ledger.lock"), "a+b")
+        with self._cond, self._file_lock():
+            self._open()
+
+    def _segment_path(self, number):
+        return os.path.join(self.directory, f"transactions-{number:06d}.jsonl")
+
+    @contextmanager
+    def _file_lock(self):
+        # Every worker process appends to the same active segment, so writes,
+        # rotation and index sealing are serialised with an flock on top of the
+        # in-process condition (which callers must already hold).
+        if fcntl is None:
+            yield
+            return
+        started_at = time.perf_counter()
+        fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX)
+        record_lock_wait("ledger_file", time.perf_counter() - started_at)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _segment_numbers(self):
+        return sorted(
+            int(match.group(1)) for match in (SEGMENT_PATTERN.match(name) for name in os.listdir(self.directory)) if match
+        )
+
+    def _load_segments(self, numbers):
+        segments = []
+        for position, number in enumerate(numbers):
+            segment = _Segment(number, self._segment_path(number))
+            is_active = position == len(numbers) - 1
+            if not is_active and os.path.exists(segment.index_path):
+                segment.load_index()
+            else:
+                segment.rebuild(self.index_interval)
+                if not is_active:
+                    segment.save_index()
+            segments.append(segment)
+        return segments
+
+    def _open(self):
+        self._segments = self._load_segments(self._segment_numbers())
+        if not self._segments:
+            self._segments.append(_Segment(1, self._segment_path(1)))
+        self._handle = open(self._segments[-1].path, "ab")
+
+    def _replace_handle(self, path):
+        handle = self._handle
+        handle.flush()
+        os.fsync(handle.fileno())
+        self._synced = self._written
+        # A group-commit fsync may still be running on the old handle outside
+        # the lock; it closes retired handles once it finishes.
+        if self._syncing:
+            self._retired.append(handle)
+        else:
+            handle.close()
+        self._handle = open(path, "ab")
+
+    def _catch_up(self):
+        """Bring the in-memory segment view up to date with the files on disk.
+
+        Must run under the file lock; other processes may have appended to the
+        active segment or rotated past it since this process last wrote.
+        """
+        active = self._segments[-1]
+        newer = [number for number in self._segment_numbers() if number > active.number]
+        if not newer:
+            active.rebuild(self.index_interval)
+            return
+
+        # The process that rotated caught up first, so its sealed index is complete.
+        loaded = self._load_segments([active.number] + newer)
+        self._segments[-1:] = loaded
+        self._replace_handle(loaded[-1].path)
+
+    def _rotate(self):
+        sealed = self._segments[-1]
+        sealed.save_index()
+        segment = _Segment(sealed.number + 1, self._segment_path(sealed.number + 1))
+        self._segments.append(segment)
+        self._replace_handle(segment.path)
+
+    def _write_entry(self, entry):
+        line = (json.dumps(entry, separators=(",", ":")) + "\n").encode("utf-8")
+        while True:
+            segment = self._segments[-1]
+            if not segment.count or segment.size + len(line) <= self.segment_max_bytes:
+                break
+            self._rotate()
+        offset = segment.size
+        self._handle.write(line)
+        segment.record(entry, offset, len(line), self.index_interval)
+        self._written += 1
+        return len(line)
+
+    def append(self, entry):
+        self.append_many([entry])
+
+    def _append_locked(self, entries):
+        self._catch_up()
+        with observe_io("ledger", "append") as io:
+            for entry in entries:
+                io.bytes += self._write_entry(entry)
+        # Lines must reach the file before another process re-reads its size.
+        self._handle.flush()
+
+    def append_once(self, entries, marker_path, marker_text=""):
+        """Append entries unless marker_path exists, then create it; False if it already did.
+
+        Every worker may run a one-off import at boot. The marker is checked and
+        written under the file lock, and replaced atomically, so exactly one of
+        them appends and a crash never leaves a marker without its entries.
+        """
+        with timed_lock(self._cond, "ledger"):
+            with self._file_lock():
+                if os.path.exists(marker_path):
+                    return False
+                if entries:
+                    self._append_locked(entries)
+                    os.fsync(self._handle.fileno())
+                    self._synced = self._written
+                temp_path = f"{marker_path}.{os.getpid()}.tmp"
+                with open(temp_path, "w", encoding="utf-8") as marker_file:
+                    marker_file.write(marker_text)
+                    marker_file.flush()
+                    os.fsync(marker_file.fileno())
+                os.replace(temp_path, marker_path)
+        return True
+
+    def append_many(self, entries):
+        with timed_lock(self._cond, "ledger"):
+            with self._file_lock():
+                self._append_locked(entries)
+            ticket = self._written
+            if not self.sync:
+                return
+
+            # Group commit: one writer fsyncs on behalf of everything written so far.
+            while self._synced < ticket:
+                if self._syncing:
+                    self._cond.wait()
+                    continue
+                self._syncing = True
+                target = self._written
+                handle = self._handle
+                handle.flush()
+                synced = False
+                self._cond.release()
+                try:
+                    with observe_io("ledger", "fsync"):
+                        os.fsync(handle.fileno())
+                    synced = True
+                finally:
+                    self._cond.acquire()
+                    self._syncing = False
+                    if synced:
+                        self._synced = max(self._synced, target)
+                    self._close_retired()
+                    self._cond.notify_all()
+
+    def _close_retired(self):
+        for handle in self._retired:
+            handle.close()
+        self._retired = []
+
+    def query(self, user=None, since=None, until=None, limit=50, cursor=None):
+        since_ts = _timestamp_value(since) if since else None
+        until_ts = _timestamp_value(until) if until else None
+        start_segment, start_offset = cursor if cursor else (None, None)
+
+        with self._cond, self._file_lock():
+            self._handle.flush()
+            self._catch_up()
+            if cursor:
+                start = next((segment for segment in self._segments if segment.number == start_segment), None)
+                if start is None or not start.is_line_start(start_offset):
+                    raise ValueError("Invalid cursor")
+            segments = [
+                (segment.number, segment.path, segment.size, segment.seek_offset(since_ts))
+                for segment in self._segments
+                if segment.overlaps(user, since_ts, until_ts)
+                and (start_segment is None or segment.number >= start_segment)
+            ]
+
+        results = []
+        for number, path, size, seek_offset in segments:
+            offset = seek_offset
+            if number == start_segment:
+                offset = max(offset, start_offset)
+            with open(path, "rb") as segment_file, observe_io("ledger", "query") as io:
+                segment_file.seek(offset)
+                while offset < size:
+                    line = segment_file.readline()
+                    if not line:
+                        break
+                    io.bytes += len(line)
+                    entry_offset = offset
+                    offset += len(line)
+                    if not line.strip():
+                        continue
+                    entry = json.loads(line)
+                    ts = _timestamp_value(entry.get("timestamp"))
+                    if since_ts is not None and ts < since_ts:
+                        continue
+                    if until_ts is not None and ts > until_ts:
+                        continue
+                    if user is not None and not _involves(entry, user):
+                        continue
+                    if len(results) >= limit:
+                        return results, (number, entry_offset)
+                    results.append(entry)
+        return results, None
+
+    def close(self):
+        with self._cond:
+            while self._syncing:
+                self._cond.wait()
+            self._close_retired()
+            if self._lock_file:
+                self._lock_file.close()
+                self._lock_file = None
+            if self._handle:
+                self._handle.flush()
+                os.fsync(self._handle.fileno())
+                self._handle.close()
+                self._handle = None
+
+
+def convert_json_ledger(json_path, ledger):
+    marker_path = os.path.join(ledger.directory, ".converted")
+    if os.path.exists(marker_path) or not os.path.exists(json_path):
+        return 0
+
+    with open(json_path, "r", encoding="utf-8") as transaction_file:
+        data = json.load(transaction_file)
+
+    transactions = data.get("transactions") if isinstance(data, dict) else None
+    if not isinstance(transactions, list):
+        transactions = []
+
+    entries = [entry for entry in transactions if isinstance(entry, dict)]
+    entries.sort(key=lambda entry: _timestamp_value(entry.get("timestamp")))
+    return len(entries) if ledger.append_once(entries, marker_path, json_path) else 0
+
+
+def encode_cursor(cursor):
+    if cursor is None:
+        return None
+    return f"{cursor[0]}:{cursor[1]}"
+
+
+def decode_cursor(raw):
+    segment, _, offset = (raw or "").partition(":")
+    if not segment.isdigit() or not offset.isdigit():
+        raise ValueError("Invalid cursor")
+    return int(segment), int(offset)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert transaction.json into the append-only transaction ledger.")
+    parser.add_argument("json_path")
+    parser.add_argument("ledger_dir")
+    args = parser.parse_args()
+    target = TransactionLedger(args.ledger_dir)
+    count = convert_json_ledger(args.json_path, target)
+    target.close()
+    print(f"Converted {count} transactions into {args.ledger_dir}")
@@ -0,0 +1,67 @@
+import heapq
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class LobbyExpiryScheduler:
+    def __init__(self, ttl_seconds, expire):
+        self.ttl_seconds = ttl_seconds
+        self._expire = expire
+        self._heap = []
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stopped = False
+
+    def schedule(self, lobby_id, created_at):
+        # Entries are never cancelled; the expire callback re-checks the lobby when a deadline fires.
+        deadline = created_at + self.ttl_seconds
+        with self._cond:
+            heapq.heappush(self._heap, (deadline, lobby_id))
+            if self._heap[0][1] == lobby_id:
+                self._cond.notify()
+
+    def pending(self):
+        with self._cond:
+            return len(self._heap)
+
+    def start(self):
+        with self._cond:
+            if self._thread is not None:
+                return
+            self._stopped = False
+            self._thread = threading.Thread(target=self._run, name="lobby-expiry", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+            thread = self._thread
+            self._thread = None
+        if thread is not None:
+            thread.join()
+
+    def _run(self):
+        with self._cond:
+            while not self._stopped:
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+
+                deadline, lobby_id = self._heap[0]
+                delay = deadline - time.time()
+                if delay > 0:
+                    self._cond.wait(delay)
+                    continue
+
+                heapq.heappop(self._heap)
+                self._cond.release()
+                try:
+                    self._expire(lobby_id)
+                except Exception:
+                    logger.exception("Failed to expire lobby %s", lobby_id)
+                finally:
+                    self._cond.acquire()
@@ -0,0 +1,262 @@
+import http.client
+import importlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from metrics import REGISTRY, observe_io, record_lock_wait
+
+logger = logging.getLogger(__name__)
+
+SHARD_HEADER = "X-Lobby-Shard"
+FORWARD_TIMEOUT_SECONDS = 10
+NODE_CACHE_SECONDS = 5
+GATHER_WORKERS = 8
+STREAM_CHUNK_BYTES = 65536
+# Routes owned by the shard of the lobby they name: a URL argument, or "id" in the JSON body.
+PATH_ROUTES = {
+    "/api/get-lobby/<lobby_id>": "lobby_id",
+    "/api/get-lobby/<lobby_id>/stream": "lobby_id",
+    "/api/match-state/<match_id>": "match_id",
+    "/api/match-telemetry/<match_id>": "match_id",
+}
+BODY_ROUTES = frozenset(
+    {
+        "/api/join-lobby",
+        "/api/leave-lobby",
+        "/api/set-lobby-team",
+        "/api/start-match",
+        "/api/report-match-result",
+        "/api/match-command",
+        "/api/match-relay",
+        "/api/match-telemetry",
+    }
+)
+FORWARDED_REQUEST_HEADERS = ("Content-Type", "Cookie", "If-None-Match", "Accept", "User-Agent")
+# Lower-cased, since upstream header names are compared case-insensitively.
+FORWARDED_RESPONSE_HEADERS = frozenset({"content-type", "cache-control", "etag", "set-cookie", "retry-after", "x-accel-buffering"})
+
+FORWARDS = REGISTRY.counter("lobby_shard_forwards_total", "Requests handed to the shard that owns their lobby.", ("shard", "outcome"))
+
+
+def shard_for(lobby_id, shard_count):
+    return zlib.crc32(lobby_id.encode("utf-8")) % shard_count
+
+
+class ShardUnavailableError(Exception):
+    pass
+
+
+class SqliteCoordinator:
+    # Local stand-in for a shared coordination service: every node on the machine opens the same file.
+    # Another backend only has to provide the same methods; see create_coordinator().
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        conn = self._connection()
+        conn.execute("CREATE TABLE IF NOT EXISTS nodes (shard INTEGER PRIMARY KEY, url TEXT NOT NULL, registered_at REAL NOT NULL)")
+        conn.execute("CREATE TABLE IF NOT EXISTS players (username TEXT PRIMARY KEY, match_id TEXT NOT NULL, shard INTEGER NOT NULL)")
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _write(self, statements):
+        conn = self._connection()
+        started_at = time.perf_counter()
+        conn.execute("BEGIN IMMEDIATE")
+        record_lock_wait("coordinator_sqlite", time.perf_counter() - started_at)
+        with observe_io("coordinator_sqlite", "write"):
+            try:
+                for sql, params in statements:
+                    conn.execute(sql, params)
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    def register_node(self, shard, url):
+        self._write([("INSERT OR REPLACE INTO nodes (shard, url, registered_at) VALUES (?, ?, ?)", (shard, url, time.time()))])
+
+    def nodes(self):
+        with observe_io("coordinator_sqlite", "read"):
+            return {shard: url for shard, url in self._connection().execute("SELECT shard, url FROM nodes")}
+
+    def update_players(self, match_id, shard, joined, left):
+        # A player leaving only clears the entry if it still points at this match, so a late update never
+        # erases the player's newer match on another shard.
+        statements = [("DELETE FROM players WHERE username = ? AND match_id = ?", (username, match_id)) for username in left]
+        statements += [("INSERT OR REPLACE INTO players (username, match_id, shard) VALUES (?, ?, ?)", (username, match_id, shard)) for username in joined]
+        if statements:
+            self._write(statements)
+
+    def active_match(self, username):
+        with observe_io("coordinator_sqlite", "read"):
+            row = self._connection().execute("SELECT match_id, shard FROM players WHERE username = ?", (username,)).fetchone()
+        return tuple(row) if row else None
+
+
+def create_coordinator(backend, path):
+    # "sqlite" is the single-machine stand-in; "package.module:Factory" plugs in any other implementation.
+    if backend == "sqlite":
+        return SqliteCoordinator(path)
+    module_name, _, attribute = backend.partition(":")
+    if not attribute:
+        raise ValueError(f"Unknown lobby coordinator backend: {backend}")
+    return getattr(importlib.import_module(module_name), attribute)(path)
+
+
+class PlayerDirectory:
+    # Match store listener that keeps the coordinator's player -> active match map in step with this shard.
+    # Listeners run under the store lock, so the coordinator writes are queued and applied, in order, by a
+    # background thread; lobby reads never wait on coordinator I/O.
+    def __init__(self, coordinator, shard):
+        self.coordinator = coordinator
+        self.shard = shard
+        self._players = {}
+        self._pending = deque()
+        self._cond = threading.Condition()
+        self._writing = False
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name="player-directory", daemon=True)
+        self._thread.start()
+
+    def __call__(self, match_id, match):
+        players = match.get("players", []) if match is not None and match.get("status") in ("waiting", "in_progress") else []
+        current = frozenset(players if isinstance(players, list) else [])
+        previous = self._players.pop(match_id, frozenset())
+        if current:
+            self._players[match_id] = current
+        if current != previous:
+            with self._cond:
+                self._pending.append((match_id, current - previous, previous - current))
+                self._cond.notify_all()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._stopped:
+                    self._cond.wait()
+                if not self._pending:
+                    return
+                batch = list(self._pending)
+                self._pending.clear()
+                self._writing = True
+            try:
+                for match_id, joined, left in batch:
+                    try:
+                        self.coordinator.update_players(match_id, self.shard, joined, left)
+                    except Exception:
+                        logger.exception("Failed to update the player directory for match %s", match_id)
+            finally:
+                with self._cond:
+                    self._writing = False
+                    self._cond.notify_all()
+
+    def flush(self, timeout=None):
+        # Waits until every queued update has reached the coordinator.
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._pending and not self._writing, timeout)
+
+    def close(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        self._thread.join()
+
+
+class ShardRouter:
+    def __init__(self, shard, shard_count, coordinator, token):
+        self.shard = shard
+        self.shard_count = shard_count
+        self.coordinator = coordinator
+        self.token = token
+        self._nodes = {}
+        self._nodes_loaded_at = None
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=GATHER_WORKERS, thread_name_prefix="shard-gather")
+
+    def owner(self, lobby_id):
+        return shard_for(lobby_id, self.shard_count)
+
+    def peers(self):
+        return [shard for shard in range(self.shard_count) if shard != self.shard]
+
+    def _address(self, shard):
+        with self._lock:
+            now = time.monotonic()
+            if self._nodes_loaded_at is None or now - self._nodes_loaded_at >= NODE_CACHE_SECONDS or shard not in self._nodes:
+                self._nodes = self.coordinator.nodes()
+                self._nodes_loaded_at = now
+            url = self._nodes.get(shard)
+        if url is None:
+            raise ShardUnavailableError(f"Lobby shard {shard} has not registered.")
+        parts = urlsplit(url)
+        return parts.hostname, parts.port or 80
+
+    def open(self, shard, method, path, headers=None, body=None, timeout=FORWARD_TIMEOUT_SECONDS):
+        # Returns the live upstream response; the caller reads it and closes it.
+        host, port = self._address(shard)
+        headers = dict(headers or {})
+        headers[SHARD_HEADER] = self.token
+        connection = http.client.HTTPConnection(host, port, timeout=timeout)
+        try:
+            connection.request(method, path, body=body, headers=headers)
+            response = connection.getresponse()
+        except (OSError, http.client.HTTPException) as exc:
+            connection.close()
+            FORWARDS.inc(shard=str(shard), outcome="error")
+            raise ShardUnavailableError(f"Lobby shard {shard} is unavailable: {exc}") from exc
+        FORWARDS.inc(shard=str(shard), outcome="ok")
+        return response
+
+    def relay(self, response):
+        # Passes a streamed upstream body through; the stream just ends if the owning shard goes away.
+        try:
+            while True:
+                try:
+                    chunk = response.read1(STREAM_CHUNK_BYTES)
+                except (OSError, http.client.HTTPException):
+                    return
+                if not chunk:
+                    return
+                yield chunk
+        finally:
+            response.close()
+
+    def fetch_json(self, shard, path):
+        response = self.open(shard, "GET", path)
+        try:
+            body = response.read()
+        finally:
+            response.close()
+        if response.status == 404:
+            return None
+        if response.status != 200:
+            raise ShardUnavailableError(f"Lobby shard {shard} answered {response.status}.")
+        return json.loads(body)
+
+    def gather(self, path):
+        # Asks every other shard in parallel; shards that cannot answer are left out of the result.
+        futures = {shard: self._pool.submit(self.fetch_json, shard, path) for shard in self.peers()}
+        results, missing = {}, []
+        for shard, future in futures.items():
+            try:
+                results[shard] = future.result()
+            except ShardUnavailableError:
+                missing.append(shard)
+        return results, missing
+
+    def close(self):
+        self._pool.shutdown(wait=False)
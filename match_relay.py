@@ -0,0 +1,183 @@
+import asyncio
+import json
+import logging
+import threading
+from collections import OrderedDict
+from urllib.parse import parse_qs, urlsplit
+
+from simulation import FORMATION_MODES, TEAMS, TICK_RATE
+from snapshot_codec import POSITION_SCALE, build_frame, encode_frame
+
+try:
+    from websockets.asyncio.server import serve
+    from websockets.exceptions import ConnectionClosed
+except ImportError:
+    serve = None
+    ConnectionClosed = Exception
+
+logger = logging.getLogger(__name__)
+
+RELAY_HISTORY_TICKS = 64
+MAX_COMMANDS_PER_BATCH = 32
+CLOSE_INVALID_TOKEN = 4401
+CLOSE_UNKNOWN_MATCH = 4404
+
+
+def describe_match(simulation):
+    return {
+        "type": "hello",
+        "match_id": simulation.match_id,
+        "tick_rate": TICK_RATE,
+        "position_scale": POSITION_SCALE,
+        "teams": list(TEAMS),
+        "formations": list(FORMATION_MODES),
+        "players": [
+            {"name": name, "team": TEAMS[simulation.player_team[index]], "bot": bool(simulation.player_is_bot[index])}
+            for index, name in enumerate(simulation.player_names)
+        ],
+        "objectives": simulation.objective_names,
+    }
+
+
+class _RelayClient:
+    def __init__(self, websocket, username, match_id):
+        self.websocket = websocket
+        self.username = username
+        self.match_id = match_id
+        self.acked_tick = 0
+        self.sent_tick = 0
+        self.bytes_sent = 0
+
+
+class MatchRelay:
+    def __init__(self, simulation_host, authenticate, host="0.0.0.0", port=5001):
+        self.simulation_host = simulation_host
+        self.authenticate = authenticate
+        self.host = host
+        self.port = port
+        self._clients = {}
+        self._history = {}
+        self._loop = None
+        self._tick_event = None
+        self._thread = None
+        self._ready = threading.Event()
+        self._start_lock = threading.Lock()
+        self._error = None
+
+    @property
+    def available(self):
+        return serve is not None
+
+    def start(self):
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="match-relay", daemon=True)
+                self._thread.start()
+                self.simulation_host.add_tick_listener(self._on_tick)
+        self._ready.wait()
+        if self._error is not None:
+            raise self._error
+
+    def _run(self):
+        try:
+            asyncio.run(self._serve())
+        except Exception as error:
+            logger.exception("Match relay stopped")
+            self._error = error
+        finally:
+            self._ready.set()
+
+    def _on_tick(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._tick_event.set)
+
+    async def _serve(self):
+        self._loop = asyncio.get_running_loop()
+        self._tick_event = asyncio.Event()
+        async with serve(self._handle, self.host, self.port) as server:
+            self.port = server.sockets[0].getsockname()[1]
+            self._ready.set()
+            while True:
+                await self._tick_event.wait()
+                self._tick_event.clear()
+                await self._broadcast()
+
+    async def _handle(self, websocket):
+        query = parse_qs(urlsplit(websocket.request.path).query)
+        identity = self.authenticate(query.get("token", [""])[0])
+        if identity is None:
+            await websocket.close(CLOSE_INVALID_TOKEN, "Invalid relay token.")
+            return
+
+        username, match_id = identity
+        hello = self.simulation_host.inspect(match_id, describe_match)
+        if hello is None:
+            await websocket.close(CLOSE_UNKNOWN_MATCH, "Match is not simulated on this server.")
+            return
+
+        client = _RelayClient(websocket, username, match_id)
+        try:
+            await websocket.send(json.dumps(dict(hello, player=username)))
+            self._clients.setdefault(match_id, set()).add(client)
+            async for message in websocket:
+                self._receive(client, message)
+        except ConnectionClosed:
+            pass
+        finally:
+            clients = self._clients.get(match_id)
+            if clients is not None:
+                clients.discard(client)
+                if not clients:
+                    self._clients.pop(match_id, None)
+                    self._history.pop(match_id, None)
+
+    def _receive(self, client, message):
+        # Clients batch their inputs and piggyback the newest tick they decoded as the delta base.
+        if not isinstance(message, str):
+            return
+        try:
+            batch = json.loads(message)
+        except ValueError:
+            return
+        if not isinstance(batch, dict):
+            return
+
+        ack = batch.get("ack")
+        if isinstance(ack, int) and client.acked_tick < ack <= client.sent_tick:
+            client.acked_tick = ack
+
+        commands = batch.get("commands")
+        for command in commands[:MAX_COMMANDS_PER_BATCH] if isinstance(commands, list) else []:
+            if isinstance(command, dict):
+                self.simulation_host.command(client.match_id, client.username, command.get("action"), command.get("value"))
+
+    async def _broadcast(self):
+        sends = []
+        for match_id, clients in list(self._clients.items()):
+            frame = self.simulation_host.inspect(match_id, build_frame)
+            if frame is None:
+                continue
+            history = self._history.setdefault(match_id, OrderedDict())
+            if frame.tick in history:
+                continue
+            history[frame.tick] = frame
+            while len(history) > RELAY_HISTORY_TICKS:
+                history.popitem(last=False)
+
+            payloads = {}
+            for client in list(clients):
+                base = history.get(client.acked_tick)
+                base_tick = base.tick if base is not None else 0
+                if base_tick not in payloads:
+                    payloads[base_tick] = encode_frame(frame, base)
+                sends.append(self._send(client, payloads[base_tick], frame.tick))
+        if sends:
+            await asyncio.gather(*sends)
+
+    async def _send(self, client, payload, tick):
+        client.sent_tick = tick
+        client.bytes_sent += len(payload)
+        try:
+            await client.websocket.send(payload)
+        except ConnectionClosed:
+            pass
@@ -0,0 +1,381 @@
+import copy
+import json
+import os
+import random
+import re
+import threading
+import time
+import zlib
+from collections import deque
+from contextlib import contextmanager
+from uuid import uuid4
+
+from metrics import observe_io, record_lock_wait
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+ARCHIVED_STATUSES = ("finished", "abandoned", "disputed")
+LOCK_STRIPES = 64
+OPTIMISTIC_ATTEMPTS = 4
+JOURNAL_WATCH_INTERVAL_SECONDS = 0.5
+CHANGE_HISTORY_LIMIT = 10000
+REMOVE = object()
+MATCH_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+class MatchConflictError(Exception):
+    pass
+
+
+class MatchStore:
+    def __init__(self, directory, archive_path, legacy_path=None):
+        self.directory = directory
+        self.archive_path = archive_path
+        self.journal_path = os.path.join(directory, "changes.log")
+        self.lock_dir = os.path.join(directory, "locks")
+        self._lock = threading.RLock()
+        self._changed = threading.Condition(self._lock)
+        self._watcher = None
+        self._listeners = []
+        self.sequence = 0
+        self._stripe_locks = [threading.Lock() for _ in range(LOCK_STRIPES)]
+        self._stripe_files = [None] * LOCK_STRIPES
+        self._matches = {}
+        self._by_player = {}
+        self._indexed_players = {}
+        self._journal_offset = 0
+        self._recent_changes = deque()
+        self._history_start = 0
+        self.conflicts = 0
+        os.makedirs(self.lock_dir, exist_ok=True)
+        if legacy_path:
+            self._migrate_legacy(legacy_path)
+        self.load()
+
+    @property
+    def lock(self):
+        return self._lock
+
+    def _match_path(self, match_id):
+        return os.path.join(self.directory, f"{match_id}.json")
+
+    def _migrate_legacy(self, legacy_path):
+        marker_path = os.path.join(self.directory, ".migrated")
+        with self._match_lock(marker_path):
+            if os.path.exists(marker_path) or not os.path.exists(legacy_path):
+                return
+
+            with open(legacy_path, "r", encoding="utf-8") as matches_file:
+                data = json.load(matches_file)
+
+            matches = data.get("matches") if isinstance(data, dict) else None
+            for match in matches if isinstance(matches, list) else []:
+                if not isinstance(match, dict):
+                    continue
+                if match.get("status") in ARCHIVED_STATUSES:
+                    self._archive(match)
+                    continue
+                match.setdefault("id", str(uuid4()))
+                match["version"] = 1
+                self._write_file(match)
+                self._journal(match["id"], 1)
+
+            with open(marker_path, "w", encoding="utf-8") as marker_file:
+                marker_file.write(legacy_path)
+
+    def load(self):
+        with self._lock:
+            self._matches = {}
+            self._by_player = {}
+            self._indexed_players = {}
+            self._journal_offset = os.path.getsize(self.journal_path) if os.path.exists(self.journal_path) else 0
+            self._recent_changes.clear()
+            self._history_start = self._journal_offset
+            for name in os.listdir(self.directory):
+                if name.endswith(".json"):
+                    self._refresh(name[: -len(".json")])
+
+    @contextmanager
+    def _match_lock(self, match_id):
+        stripe = zlib.crc32(match_id.encode("utf-8")) % LOCK_STRIPES
+        started_at = time.perf_counter()
+        with self._stripe_locks[stripe]:
+            if fcntl is None:
+                record_lock_wait("match_stripe", time.perf_counter() - started_at)
+                yield
+                return
+
+            lock_file = self._stripe_files[stripe]
+            if lock_file is None:
+                lock_file = open(os.path.join(self.lock_dir, f"{stripe:02d}.lock"), "a+b")
+                self._stripe_files[stripe] = lock_file
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            record_lock_wait("match_stripe", time.perf_counter() - started_at)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _read_file(self, match_id):
+        with observe_io("match_store", "read") as io:
+            try:
+                with open(self._match_path(match_id), "r", encoding="utf-8") as match_file:
+                    raw = match_file.read()
+            except FileNotFoundError:
+                return None
+            io.bytes = len(raw)
+            return json.loads(raw)
+
+    def _write_file(self, match):
+        path = self._match_path(match["id"])
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        raw = json.dumps(match, indent=2)
+        with observe_io("match_store", "write") as io:
+            with open(temp_path, "w", encoding="utf-8") as match_file:
+                match_file.write(raw)
+            os.replace(temp_path, path)
+            io.bytes = len(raw)
+
+    def _journal(self, match_id, version):
+        line = f"{match_id}\t{version}\n"
+        with observe_io("match_store", "journal_append") as io:
+            with open(self.journal_path, "a", encoding="utf-8") as journal_file:
+                journal_file.write(line)
+            io.bytes = len(line)
+
+    def _archive(self, match):
+        line = json.dumps(match) + "\n"
+        with observe_io("match_store", "archive_append") as io:
+            with open(self.archive_path, "a", encoding="utf-8") as archive_file:
+                archive_file.write(line)
+            io.bytes = len(line)
+
+    def _refresh(self, match_id):
+        match = self._read_file(match_id)
+        if match is None:
+            if self._matches.pop(match_id, None) is not None:
+                self._notify(match_id, None)
+            self._unindex(match_id)
+        else:
+            self._matches[match_id] = match
+            self._reindex(match)
+            self._notify(match_id, match)
+
+    def _notify(self, match_id, match):
+        self.sequence += 1
+        self._changed.notify_all()
+        for listener in self._listeners:
+            listener(match_id, match)
+
+    def add_listener(self, listener):
+        with self._lock:
+            self._listeners.append(listener)
+            for match_id, match in self._matches.items():
+                listener(match_id, match)
+
+    def _watch(self):
+        while True:
+            time.sleep(JOURNAL_WATCH_INTERVAL_SECONDS)
+            self.sync()
+
+    def wait_for_change(self, sequence, timeout):
+        # A single watcher thread per process picks up other workers' commits for all waiters.
+        if self._watcher is None:
+            with self._lock:
+                if self._watcher is None:
+                    self._watcher = threading.Thread(target=self._watch, name="match-journal-watcher", daemon=True)
+                    self._watcher.start()
+
+        with self._changed:
+            self._changed.wait_for(lambda: self.sequence != sequence, timeout)
+            return self.sequence
+
+    def _reindex(self, match):
+        match_id = match.get("id")
+        self._unindex(match_id)
+
+        players = match.get("players", [])
+        if not isinstance(players, list):
+            return
+
+        current = tuple(players)
+        self._indexed_players[match_id] = current
+        for player in current:
+            self._by_player.setdefault(player, {})[match_id] = None
+
+    def _unindex(self, match_id):
+        for player in self._indexed_players.pop(match_id, ()):
+            player_matches = self._by_player.get(player)
+            if player_matches is None:
+                continue
+            player_matches.pop(match_id, None)
+            if not player_matches:
+                del self._by_player[player]
+
+    def sync(self):
+        # Other workers append "<id>\t<version>" to the journal; replay only the new tail.
+        try:
+            size = os.path.getsize(self.journal_path)
+        except FileNotFoundError:
+            return
+        if size == self._journal_offset:
+            return
+
+        with self._lock:
+            if size <= self._journal_offset:
+                return
+            with observe_io("match_store", "journal_read") as io:
+                with open(self.journal_path, "rb") as journal_file:
+                    journal_file.seek(self._journal_offset)
+                    chunk = journal_file.read(size - self._journal_offset)
+                io.bytes = len(chunk)
+            complete = chunk.rfind(b"\n") + 1
+            offset = self._journal_offset
+            self._journal_offset += complete
+            for raw_line in chunk[:complete].splitlines(keepends=True):
+                offset += len(raw_line)
+                match_id, _, version = raw_line.decode("utf-8").rstrip("\n").partition("\t")
+                self._record_change(offset, match_id, version)
+                cached = self._matches.get(match_id)
+                if cached is not None and version.isdigit() and cached.get("version", 0) >= int(version):
+                    continue
+                self._refresh(match_id)
+
+    def _record_change(self, offset, match_id, version):
+        self._recent_changes.append((offset, match_id, version))
+        if len(self._recent_changes) > CHANGE_HISTORY_LIMIT:
+            self._history_start = self._recent_changes.popleft()[0]
+
+    @property
+    def change_seq(self):
+        # Byte position in the shared journal, so every worker agrees on the same sequence.
+        self.sync()
+        return self._journal_offset
+
+    def changes_since(self, seq):
+        self.sync()
+        with self._lock:
+            if seq < self._history_start or seq > self._journal_offset:
+                return None, self._journal_offset
+
+            changed = {}
+            for offset, match_id, version in reversed(self._recent_changes):
+                if offset <= seq:
+                    break
+                changed[match_id] = changed.get(match_id, False) or version == "1"
+            return dict(reversed(list(changed.items()))), self._journal_offset
+
+    def get(self, match_id):
+        if not isinstance(match_id, str) or not MATCH_ID_PATTERN.match(match_id):
+            return None
+        self.sync()
+        return self._matches.get(match_id)
+
+    def contains(self, match_id):
+        if not isinstance(match_id, str) or not MATCH_ID_PATTERN.match(match_id):
+            return False
+        self.sync()
+        return match_id in self._matches or os.path.exists(self._match_path(match_id))
+
+    def match_for_player(self, username):
+        self.sync()
+        for match_id in self._by_player.get(username, ()):
+            return self._matches.get(match_id)
+        return None
+
+    def matches(self):
+        self.sync()
+        return list(self._matches.values())
+
+    def waiting(self):
+        self.sync()
+        return [match for match in self._matches.values() if match.get("status") == "waiting"]
+
+    def add(self, match):
+        match_id = match["id"]
+        with self._match_lock(match_id):
+            if self._read_file(match_id) is not None:
+                raise MatchConflictError(f"Match {match_id} already exists.")
+            match["version"] = 1
+            self._write_file(match)
+            self._journal(match_id, 1)
+        with self._lock:
+            self._matches[match_id] = match
+            self._reindex(match)
+            self._notify(match_id, match)
+
+    def update(self, match_id, mutate):
+        # Optimistic commit: mutate a private copy, then compare-and-swap on version.
+        # Hot lobbies fall back to mutating under the lock so every caller makes progress.
+        if not isinstance(match_id, str) or not MATCH_ID_PATTERN.match(match_id):
+            outcome = mutate(None)
+            return (None if outcome is REMOVE else outcome), None
+
+        for attempt in range(OPTIMISTIC_ATTEMPTS):
+            current = self.get(match_id)
+            expected_version = current.get("version", 0) if current is not None else None
+            draft = copy.deepcopy(current)
+            outcome = mutate(draft)
+            if outcome is not None and outcome is not REMOVE:
+                return outcome, current
+
+            with self._match_lock(match_id):
+                on_disk = self._read_file(match_id)
+                disk_version = on_disk.get("version", 0) if on_disk is not None else None
+                if disk_version == expected_version:
+                    return self._commit(match_id, on_disk, draft, outcome)
+
+            self.conflicts += 1
+            with self._lock:
+                self._refresh(match_id)
+            time.sleep(random.uniform(0, 0.001 * (attempt + 1)))
+
+        with self._match_lock(match_id):
+            on_disk = self._read_file(match_id)
+            draft = copy.deepcopy(on_disk)
+            outcome = mutate(draft)
+            if outcome is not None and outcome is not REMOVE:
+                return outcome, on_disk
+            return self._commit(match_id, on_disk, draft, outcome)
+
+    def _commit(self, match_id, on_disk, draft, outcome):
+        if on_disk is None:
+            return None, None
+
+        removed = outcome is REMOVE or draft.get("status") in ARCHIVED_STATUSES
+        committed = None if outcome is REMOVE else draft
+        if committed is not None:
+            committed["version"] = on_disk.get("version", 0) + 1
+        if removed:
+            if committed is not None:
+                self._archive(committed)
+            os.remove(self._match_path(match_id))
+            self._journal(match_id, "-")
+        else:
+            self._write_file(committed)
+            self._journal(match_id, committed["version"])
+
+        with self._lock:
+            if removed:
+                self._matches.pop(match_id, None)
+                self._unindex(match_id)
+            else:
+                self._matches[match_id] = committed
+                self._reindex(committed)
+            self._notify(match_id, committed if not removed else None)
+        return outcome, committed
+
+    def remove(self, match_id):
+        outcome, _ = self.update(match_id, lambda match: REMOVE)
+        return outcome is REMOVE
+
+    def remove_where(self, predicate):
+        removed = 0
+        for match in [match for match in self.matches() if predicate(match)]:
+            outcome, _ = self.update(match["id"], lambda draft: REMOVE if draft is not None and predicate(draft) else False)
+            if outcome is REMOVE:
+                removed += 1
+        return removed
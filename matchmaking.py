@@ -0,0 +1,263 @@
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from leaderboard import new_sorted_index
+from metrics import observe_io, record_lock_wait
+
+MATCHMAKING_MODES = {"1v1": 2, "2v2": 4}
+BASE_TOLERANCE = 250
+TOLERANCE_GROWTH_PER_SECOND = 25
+SWEEP_INTERVAL_SECONDS = 1.0
+
+
+def _sweep_groups(entries, size, accepts):
+    # entries are rating-sorted; greedily take each acceptable run of `size` neighbours.
+    groups = []
+    start = 0
+    while start + size <= len(entries):
+        window = entries[start : start + size]
+        if accepts(window):
+            groups.append(window)
+            start += size
+        else:
+            start += 1
+    return groups
+
+
+class MatchmakingQueue:
+    # One rating-sorted index per mode; entries are (rating, enqueued_at, username) so neighbours are the closest ratings.
+    # Lives in process memory, so it only pairs players whose requests reach the same worker; the backend uses
+    # SqliteMatchmakingQueue. Enqueue is O(log n) with sortedcontainers and O(n) with the list fallback.
+    def __init__(self, modes=MATCHMAKING_MODES, base_tolerance=BASE_TOLERANCE, growth=TOLERANCE_GROWTH_PER_SECOND, sweep_interval=SWEEP_INTERVAL_SECONDS):
+        self.group_sizes = dict(modes)
+        self.base_tolerance = base_tolerance
+        self.growth = growth
+        self.sweep_interval = sweep_interval
+        self._lock = threading.Lock()
+        self._queues = {mode: new_sorted_index() for mode in self.group_sizes}
+        self._entries = {}
+        self._next_sweep = 0.0
+
+    def tolerance(self, enqueued_at, now):
+        return self.base_tolerance + self.growth * max(0.0, now - enqueued_at)
+
+    def _accepts(self, window, now):
+        # Everyone in the group has to be willing: the spread must fit the tightest tolerance among them.
+        spread = window[-1][0] - window[0][0]
+        return spread <= min(self.tolerance(entry[1], now) for entry in window), spread
+
+    def _match_around(self, mode, entry, now):
+        queue = self._queues[mode]
+        size = self.group_sizes[mode]
+        position = queue.bisect_left(entry)
+        best = None
+        # Only the windows of `size` consecutive ratings that contain the new entry can be new matches.
+        for start in range(max(0, position - size + 1), min(position, len(queue) - size) + 1):
+            window = [queue[index] for index in range(start, start + size)]
+            accepted, spread = self._accepts(window, now)
+            if accepted and (best is None or spread < best[0]):
+                best = (spread, window)
+        return best[1] if best is not None else None
+
+    def _take(self, mode, group):
+        for entry in group:
+            self._queues[mode].remove(entry)
+            self._entries.pop(entry[2], None)
+
+    def enqueue(self, username, mode, rating, now=None, enqueued_at=None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._discard(username)
+            entry = (rating, now if enqueued_at is None else enqueued_at, username)
+            self._queues[mode].add(entry)
+            self._entries[username] = (mode, entry)
+            group = self._match_around(mode, entry, now)
+            if group is not None:
+                self._take(mode, group)
+            return group
+
+    def requeue(self, mode, entries):
+        # Puts back players whose group fell through, keeping their original wait time.
+        with self._lock:
+            for entry in entries:
+                self._discard(entry[2])
+                self._queues[mode].add(entry)
+                self._entries[entry[2]] = (mode, entry)
+
+    def _discard(self, username):
+        queued = self._entries.pop(username, None)
+        if queued is not None:
+            mode, entry = queued
+            self._queues[mode].remove(entry)
+        return queued
+
+    def remove(self, username):
+        with self._lock:
+            return self._discard(username) is not None
+
+    def sweep(self, now=None, force=False):
+        # Tolerances widen while players wait, so groups that were too spread out earlier may fit now.
+        now = time.monotonic() if now is None else now
+        groups = []
+        with self._lock:
+            if not force and now < self._next_sweep:
+                return groups
+            self._next_sweep = now + self.sweep_interval
+            for mode, size in self.group_sizes.items():
+                for window in _sweep_groups(list(self._queues[mode]), size, lambda window: self._accepts(window, now)[0]):
+                    groups.append((mode, window))
+            for mode, group in groups:
+                self._take(mode, group)
+        return groups
+
+    def status(self, username, now=None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            queued = self._entries.get(username)
+            if queued is None:
+                return None
+            mode, (rating, enqueued_at, _) = queued
+            return {
+                "mode": mode,
+                "rating": rating,
+                "waited_seconds": round(now - enqueued_at, 1),
+                "tolerance": round(self.tolerance(enqueued_at, now)),
+                "queued_players": len(self._queues[mode]),
+            }
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+
+class SqliteMatchmakingQueue(MatchmakingQueue):
+    # Same matching rules, but the queue is a table every worker and node on the machine opens, so players are
+    # paired no matter which process took their request. The (mode, rating, ...) index keeps enqueue at O(log n).
+    # Times are wall-clock seconds because waits are compared across processes.
+    def __init__(self, path, modes=MATCHMAKING_MODES, base_tolerance=BASE_TOLERANCE, growth=TOLERANCE_GROWTH_PER_SECOND, sweep_interval=SWEEP_INTERVAL_SECONDS):
+        super().__init__(modes, base_tolerance, growth, sweep_interval)
+        self.path = path
+        self._local = threading.local()
+        conn = self._connection()
+        conn.execute("CREATE TABLE IF NOT EXISTS queue (username TEXT PRIMARY KEY, mode TEXT NOT NULL, rating INTEGER NOT NULL, enqueued_at REAL NOT NULL)")
+        conn.execute("CREATE INDEX IF NOT EXISTS queue_by_rating ON queue (mode, rating, enqueued_at, username)")
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value REAL NOT NULL)")
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _write(self):
+        conn = self._connection()
+        started_at = time.perf_counter()
+        conn.execute("BEGIN IMMEDIATE")
+        record_lock_wait("matchmaking_sqlite", time.perf_counter() - started_at)
+        with observe_io("matchmaking_sqlite", "write"):
+            try:
+                yield conn
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    @staticmethod
+    def _take_rows(conn, group):
+        conn.executemany("DELETE FROM queue WHERE username = ?", [(entry[2],) for entry in group])
+
+    def enqueue(self, username, mode, rating, now=None, enqueued_at=None):
+        now = time.time() if now is None else now
+        entry = (rating, now if enqueued_at is None else enqueued_at, username)
+        size = self.group_sizes[mode]
+        with self._write() as conn:
+            conn.execute("DELETE FROM queue WHERE username = ?", (username,))
+            conn.execute("INSERT INTO queue (username, mode, rating, enqueued_at) VALUES (?, ?, ?, ?)", (username, mode, entry[0], entry[1]))
+            # Up to size - 1 neighbours on each side: every window of `size` around the new entry.
+            below = conn.execute(
+                "SELECT rating, enqueued_at, username FROM queue WHERE mode = ? AND (rating, enqueued_at, username) < (?, ?, ?) "
+                "ORDER BY rating DESC, enqueued_at DESC, username DESC LIMIT ?",
+                (mode, *entry, size - 1),
+            ).fetchall()
+            above = conn.execute(
+                "SELECT rating, enqueued_at, username FROM queue WHERE mode = ? AND (rating, enqueued_at, username) > (?, ?, ?) "
+                "ORDER BY rating, enqueued_at, username LIMIT ?",
+                (mode, *entry, size - 1),
+            ).fetchall()
+            neighbourhood = [tuple(row) for row in reversed(below)] + [entry] + [tuple(row) for row in above]
+            best = None
+            for start in range(len(neighbourhood) - size + 1):
+                window = neighbourhood[start : start + size]
+                accepted, spread = self._accepts(window, now)
+                if accepted and (best is None or spread < best[0]):
+                    best = (spread, window)
+            if best is None:
+                return None
+            self._take_rows(conn, best[1])
+            return best[1]
+
+    @staticmethod
+    def _next_sweep_at(conn):
+        row = conn.execute("SELECT value FROM meta WHERE key = 'next_sweep'").fetchone()
+        return row[0] if row is not None else 0.0
+
+    def requeue(self, mode, entries):
+        with self._write() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO queue (username, mode, rating, enqueued_at) VALUES (?, ?, ?, ?)",
+                [(username, mode, rating, enqueued_at) for rating, enqueued_at, username in entries],
+            )
+
+    def remove(self, username):
+        with self._write() as conn:
+            return conn.execute("DELETE FROM queue WHERE username = ?", (username,)).rowcount == 1
+
+    def sweep(self, now=None, force=False):
+        now = time.time() if now is None else now
+        groups = []
+        # The next sweep time is shared, so N workers polling status still sweep once per interval. A plain read
+        # settles the common "not due yet" case without taking the write lock.
+        if not force and now < self._next_sweep_at(self._connection()):
+            return groups
+        with self._write() as conn:
+            if not force and now < self._next_sweep_at(conn):
+                return groups
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('next_sweep', ?)", (now + self.sweep_interval,))
+            for mode, size in self.group_sizes.items():
+                entries = [
+                    tuple(row)
+                    for row in conn.execute(
+                        "SELECT rating, enqueued_at, username FROM queue WHERE mode = ? ORDER BY rating, enqueued_at, username", (mode,)
+                    )
+                ]
+                for window in _sweep_groups(entries, size, lambda window: self._accepts(window, now)[0]):
+                    groups.append((mode, window))
+            for _, group in groups:
+                self._take_rows(conn, group)
+        return groups
+
+    def status(self, username, now=None):
+        now = time.time() if now is None else now
+        conn = self._connection()
+        with observe_io("matchmaking_sqlite", "read"):
+            row = conn.execute("SELECT mode, rating, enqueued_at FROM queue WHERE username = ?", (username,)).fetchone()
+            if row is None:
+                return None
+            mode, rating, enqueued_at = row
+            queued_players = conn.execute("SELECT COUNT(*) FROM queue WHERE mode = ?", (mode,)).fetchone()[0]
+        return {
+            "mode": mode,
+            "rating": rating,
+            "waited_seconds": round(now - enqueued_at, 1),
+            "tolerance": round(self.tolerance(enqueued_at, now)),
+            "queued_players": queued_players,
+        }
+
+    def __len__(self):
+        return self._connection().execute("SELECT COUNT(*) FROM queue").fetchone()[0]
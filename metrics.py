@@ -0,0 +1,171 @@
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, documentation, label_names=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, "") for name in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = list(self._values.items())
+        return [(self.name, _format_labels(self.label_names, key), value) for key, value in sorted(values)]
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, documentation, label_names=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets) + (math.inf,)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, "") for name in self.label_names)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for position, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][position] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def samples(self):
+        with self._lock:
+            values = [(key, list(counts), total, count) for key, (counts, total, count) in self._values.items()]
+        samples = []
+        for key, counts, total, count in sorted(values):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                samples.append((f"{self.name}_bucket", _format_labels(self.label_names, key, ("le", _format_value(bound))), cumulative))
+            samples.append((f"{self.name}_sum", _format_labels(self.label_names, key), total))
+            samples.append((f"{self.name}_count", _format_labels(self.label_names, key), count))
+        return samples
+
+
+class Gauge:
+    # Read at scrape time from a callback returning a number or a {label_value: number} dict.
+    kind = "gauge"
+
+    def __init__(self, name, documentation, callback, label_name=None):
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+        self.label_name = label_name
+
+    def samples(self):
+        value = self.callback()
+        if self.label_name is None:
+            return [(self.name, "", value)]
+        return [(self.name, _format_labels((self.label_name,), (key,)), item) for key, item in sorted(value.items())]
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def _register(self, metric):
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, documentation, label_names=()):
+        return self._register(Counter(name, documentation, label_names))
+
+    def histogram(self, name, documentation, label_names=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(name, documentation, label_names, buckets))
+
+    def gauge(self, name, documentation, callback, label_name=None):
+        return self._register(Gauge(name, documentation, callback, label_name))
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+REQUEST_LATENCY = REGISTRY.histogram(
+    "http_request_duration_seconds", "Time spent handling a request, by route.", ("route", "method", "status")
+)
+STORAGE_IO_SECONDS = REGISTRY.histogram(
+    "storage_io_duration_seconds", "Duration of storage reads and writes, by store and operation.", ("store", "operation")
+)
+STORAGE_IO_BYTES = REGISTRY.counter("storage_io_bytes_total", "Bytes read or written by storage operations.", ("store", "operation"))
+LOCK_WAIT_SECONDS = REGISTRY.histogram("lock_wait_seconds", "Time spent waiting to acquire a lock.", ("lock",))
+
+
+class _IoRecord:
+    def __init__(self):
+        self.bytes = 0
+
+
+@contextmanager
+def observe_io(store, operation):
+    # Callers fill in `record.bytes` when they know how much they moved.
+    record = _IoRecord()
+    started_at = time.perf_counter()
+    try:
+        yield record
+    finally:
+        STORAGE_IO_SECONDS.observe(time.perf_counter() - started_at, store=store, operation=operation)
+        if record.bytes:
+            STORAGE_IO_BYTES.inc(record.bytes, store=store, operation=operation)
+
+
+def record_lock_wait(lock_name, seconds):
+    LOCK_WAIT_SECONDS.observe(seconds, lock=lock_name)
+
+
+@contextmanager
+def timed_lock(lock, lock_name):
+    started_at = time.perf_counter()
+    with lock:
+        record_lock_wait(lock_name, time.perf_counter() - started_at)
+        yield
@@ -0,0 +1,105 @@
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+DEFAULT_HASH_METHOD = "pbkdf2:sha256:600000"
+
+
+class HashingOverloadedError(Exception):
+    pass
+
+
+def hash_method_of(stored_hash):
+    method, separator, _ = (stored_hash or "").partition("$")
+    return method if separator else None
+
+
+def _hash_password(password, method):
+    return generate_password_hash(password, method=method)
+
+
+def _verify_password(stored_hash, password, method):
+    if not check_password_hash(stored_hash, password):
+        return False, None
+    if hash_method_of(stored_hash) == method:
+        return True, None
+    return True, generate_password_hash(password, method=method)
+
+
+class PasswordHasher:
+    def __init__(self, method=DEFAULT_HASH_METHOD, workers=2, max_queue=32, timeout=10):
+        self.method = method
+        self.workers = workers
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max(workers, 1) + max_queue)
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self.rejected = 0
+        self.upgraded = 0
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    def _reset_executor(self, broken):
+        # A worker died (e.g. OOM-killed); the pool is unusable, so the next job starts a fresh one.
+        with self._executor_lock:
+            if self._executor is broken:
+                self._executor = None
+        broken.shutdown(wait=False)
+
+    def _run(self, function, *args):
+        # Admission control: fail fast instead of queueing behind a burst of logins.
+        if not self._slots.acquire(blocking=False):
+            self.rejected += 1
+            raise HashingOverloadedError("Password hashing queue is full.")
+        if self.workers <= 0:
+            try:
+                return function(*args)
+            finally:
+                self._slots.release()
+
+        executor = self._get_executor()
+        try:
+            future = executor.submit(function, *args)
+        except BrokenProcessPool as error:
+            self._slots.release()
+            self._reset_executor(executor)
+            raise HashingOverloadedError("Password hashing workers are restarting.") from error
+        except BaseException:
+            self._slots.release()
+            raise
+        # The slot follows the job rather than the caller: a job that outlives its timeout still occupies a worker.
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError as error:
+            raise HashingOverloadedError("Password hashing timed out.") from error
+        except BrokenProcessPool as error:
+            self._reset_executor(executor)
+            raise HashingOverloadedError("Password hashing workers are restarting.") from error
+
+    def hash_password(self, password):
+        return self._run(_hash_password, password, self.method)
+
+    def verify(self, stored_hash, password):
+        verified, upgraded_hash = self._run(_verify_password, stored_hash, password, self.method)
+        if upgraded_hash:
+            self.upgraded += 1
+        return verified, upgraded_hash
+
+    def warm_up(self):
+        # Starts the worker processes now instead of on the first login.
+        if self.workers > 0:
+            self._get_executor().submit(int).result(timeout=self.timeout)
+
+    def shutdown(self):
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
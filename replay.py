@@ -0,0 +1,273 @@
+import argparse
+import bisect
+import json
+import mmap
+import os
+import struct
+import time
+import zlib
+
+import numpy as np
+
+from simulation import FORMATION_MODES, MATCH_COMMANDS, TICK_RATE, MatchSimulation
+
+# Layout: preamble + JSON settings, then append-only records, then (once the match ends) a keyframe index and footer.
+REPLAY_MAGIC = b"WGRP"
+REPLAY_INDEX_MAGIC = b"WGRI"
+REPLAY_VERSION = 1
+PREAMBLE = struct.Struct("<4sBI")
+RECORD = struct.Struct("<BII")
+COMMAND = struct.Struct("<IBB")
+MOVE = struct.Struct("<ddH")
+FOOTER = struct.Struct("<QI4s")
+KEYFRAME_META = struct.Struct("<I")
+INDEX_DTYPE = np.dtype([("tick", "<u4"), ("offset", "<u8")])
+MOVE_UNIT_DTYPE = np.dtype("<u4")
+RECORD_COMMAND = 1
+RECORD_KEYFRAME = 2
+RECORD_END = 3
+KEYFRAME_INTERVAL_TICKS = 30 * TICK_RATE
+
+UNIT_ARRAYS = ("unit_id", "x", "y", "target_x", "target_y", "strength", "team", "owner", "state")
+MATCH_ARRAYS = (
+    "player_gold",
+    "player_gold_cap",
+    "player_formation",
+    "player_created",
+    "player_lost",
+    "player_spawn_ms",
+    "objective_owner",
+    "objective_awarded",
+)
+MATCH_SCALARS = ("count", "next_unit_id", "remaining_ms", "income_ms", "formation_ms", "tick_count", "ended", "winner", "reason")
+
+
+def encode_command(simulation, player_name, action, value):
+    # Only commands that can change the match are kept, encoded exactly as the simulation will read them back.
+    player = simulation.player_index.get(player_name)
+    if player is None or action not in MATCH_COMMANDS:
+        return None
+    payload = b""
+    if action == "formation":
+        if value not in FORMATION_MODES:
+            return None
+        payload = bytes((FORMATION_MODES.index(value),))
+    elif action == "move":
+        if not isinstance(value, dict):
+            return None
+        try:
+            unit_ids = np.asarray(value.get("units") or [], dtype=np.int64).ravel()
+            target_x = float(value["x"])
+            target_y = float(value["y"])
+        except (KeyError, TypeError, ValueError):
+            return None
+        unit_ids = unit_ids[(unit_ids > 0) & (unit_ids <= np.iinfo(MOVE_UNIT_DTYPE).max)][:0xFFFF]
+        payload = MOVE.pack(target_x, target_y, len(unit_ids)) + unit_ids.astype(MOVE_UNIT_DTYPE).tobytes()
+    return player, MATCH_COMMANDS.index(action), payload
+
+
+def decode_command(payload):
+    elapsed_ms, player, action_code = COMMAND.unpack_from(payload, 0)
+    action = MATCH_COMMANDS[action_code]
+    value = None
+    if action == "formation":
+        value = FORMATION_MODES[payload[COMMAND.size]]
+    elif action == "move":
+        target_x, target_y, count = MOVE.unpack_from(payload, COMMAND.size)
+        units = np.frombuffer(payload, dtype=MOVE_UNIT_DTYPE, count=count, offset=COMMAND.size + MOVE.size)
+        value = {"units": units.tolist(), "x": target_x, "y": target_y}
+    return elapsed_ms, player, action, value
+
+
+def encode_keyframe(simulation):
+    n = simulation.count
+    arrays = [(name, getattr(simulation, name)[:n]) for name in UNIT_ARRAYS]
+    arrays += [(name, getattr(simulation, name)) for name in MATCH_ARRAYS]
+    meta = {
+        "scalars": {name: getattr(simulation, name) for name in MATCH_SCALARS},
+        "rng": simulation.rng.bit_generator.state,
+        "arrays": [[name, array.dtype.str, list(array.shape)] for name, array in arrays],
+    }
+    meta_bytes = json.dumps(meta, default=lambda value: value.item()).encode("utf-8")
+    body = [KEYFRAME_META.pack(len(meta_bytes)), meta_bytes]
+    body.extend(np.ascontiguousarray(array).tobytes() for _, array in arrays)
+    return zlib.compress(b"".join(body))
+
+
+def restore_keyframe(simulation, payload):
+    body = zlib.decompress(payload)
+    (meta_size,) = KEYFRAME_META.unpack_from(body, 0)
+    offset = KEYFRAME_META.size
+    meta = json.loads(body[offset : offset + meta_size])
+    offset += meta_size
+    for name, dtype, shape in meta["arrays"]:
+        array = np.frombuffer(body, dtype=dtype, count=int(np.prod(shape)), offset=offset).reshape(shape)
+        offset += array.nbytes
+        getattr(simulation, name)[: len(array)] = array
+    for name, value in meta["scalars"].items():
+        setattr(simulation, name, value)
+    simulation.rng.bit_generator.state = meta["rng"]
+    simulation.events = []
+    simulation.pending_commands = []
+
+
+class ReplayRecorder:
+    def __init__(self, path, simulation, tick_rate=TICK_RATE, keyframe_interval=KEYFRAME_INTERVAL_TICKS):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.keyframe_interval = keyframe_interval
+        self.keyframes = []
+        self.logged = len(simulation.command_log)
+        self.started_at = time.monotonic()
+        self.closed = False
+        header = json.dumps(
+            {"settings": simulation.settings, "tick_rate": tick_rate, "keyframe_interval": keyframe_interval, "recorded_at": time.time()},
+            separators=(",", ":"),
+        ).encode("utf-8")
+        self.file = open(path, "wb")
+        self.file.write(PREAMBLE.pack(REPLAY_MAGIC, REPLAY_VERSION, len(header)) + header)
+        self.file.flush()
+
+    def _write(self, kind, tick, payload):
+        offset = self.file.tell()
+        self.file.write(RECORD.pack(kind, tick, len(payload)) + payload)
+        return offset
+
+    def record(self, simulation):
+        # Called after every tick: new commands first, then a keyframe of the state they led to.
+        elapsed_ms = int((time.monotonic() - self.started_at) * 1000)
+        for tick, player_name, action, value in simulation.command_log[self.logged :]:
+            command = encode_command(simulation, player_name, action, value)
+            if command is not None:
+                player, action_code, payload = command
+                self._write(RECORD_COMMAND, tick, COMMAND.pack(elapsed_ms, player, action_code) + payload)
+        self.logged = len(simulation.command_log)
+
+        if simulation.ended:
+            self._write(RECORD_END, simulation.tick_count, json.dumps(simulation.result()).encode("utf-8"))
+        elif simulation.tick_count % self.keyframe_interval == 0:
+            offset = self._write(RECORD_KEYFRAME, simulation.tick_count, encode_keyframe(simulation))
+            self.keyframes.append((simulation.tick_count, offset))
+            self.file.flush()
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        index = np.array(self.keyframes, dtype=INDEX_DTYPE)
+        index_offset = self.file.tell()
+        self.file.write(index.tobytes() + FOOTER.pack(index_offset, len(index), REPLAY_INDEX_MAGIC))
+        self.file.close()
+
+
+class ReplayReader:
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, header_size = PREAMBLE.unpack_from(self._map, 0)
+        if magic != REPLAY_MAGIC or version != REPLAY_VERSION:
+            self.close()
+            raise ValueError(f"{path} is not a replay file")
+        header = json.loads(self._map[PREAMBLE.size : PREAMBLE.size + header_size])
+        self.settings = header["settings"]
+        self.tick_rate = header["tick_rate"]
+        self.recorded_at = header["recorded_at"]
+        self.records_start = PREAMBLE.size + header_size
+        self.records_end = len(self._map)
+        self.complete = False
+        self._load_index()
+
+    def _load_index(self):
+        if len(self._map) >= self.records_start + FOOTER.size:
+            index_offset, count, magic = FOOTER.unpack_from(self._map, len(self._map) - FOOTER.size)
+            if magic == REPLAY_INDEX_MAGIC and index_offset + count * INDEX_DTYPE.itemsize + FOOTER.size == len(self._map):
+                self.index = np.frombuffer(self._map, dtype=INDEX_DTYPE, count=count, offset=index_offset).copy()
+                self.records_end = index_offset
+                self.complete = True
+                return
+        # Still being recorded (or cut short): walk the record headers, skipping over every payload.
+        keyframes = [(tick, offset) for kind, tick, _, offset in self._records(self.records_start, payloads=False) if kind == RECORD_KEYFRAME]
+        self.index = np.array(keyframes, dtype=INDEX_DTYPE)
+
+    def _records(self, offset, payloads=True):
+        while offset + RECORD.size <= self.records_end:
+            kind, tick, size = RECORD.unpack_from(self._map, offset)
+            start = offset + RECORD.size
+            if start + size > self.records_end:
+                return
+            yield kind, tick, self._map[start : start + size] if payloads else None, offset
+            offset = start + size
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+    def commands(self):
+        names = [player["name"] for player in self.settings["players"]]
+        for kind, tick, payload, _ in self._records(self.records_start):
+            if kind == RECORD_COMMAND:
+                elapsed_ms, player, action, value = decode_command(payload)
+                yield {"tick": tick, "elapsed_ms": elapsed_ms, "player": names[player], "action": action, "value": value}
+
+    def result(self):
+        start = int(self.index["offset"][-1]) if len(self.index) else self.records_start
+        for kind, _, payload, _ in self._records(start):
+            if kind == RECORD_END:
+                return json.loads(payload)
+        return None
+
+    @property
+    def last_tick(self):
+        # An unfinished recording is only known to be complete up to its last flushed keyframe.
+        if self.complete:
+            result = self.result()
+            if result is not None:
+                return result["ticks"]
+        return int(self.index["tick"][-1]) if len(self.index) else 0
+
+    def seek(self, tick):
+        # Restore the closest keyframe at or before `tick`, then re-simulate the commands recorded after it.
+        tick = min(tick, self.last_tick)
+        simulation = MatchSimulation(**self.settings)
+        offset = self.records_start
+        position = bisect.bisect_right(self.index["tick"], tick) - 1
+        if position >= 0:
+            offset = int(self.index["offset"][position])
+            kind, _, size = RECORD.unpack_from(self._map, offset)
+            start = offset + RECORD.size
+            restore_keyframe(simulation, self._map[start : start + size])
+
+        delta = 1.0 / self.tick_rate
+        names = simulation.player_names
+        for kind, record_tick, payload, _ in self._records(offset):
+            if kind != RECORD_COMMAND or record_tick <= simulation.tick_count:
+                continue
+            if record_tick > tick:
+                break
+            while simulation.tick_count < record_tick - 1 and not simulation.ended:
+                simulation.tick(delta)
+            _, player, action, value = decode_command(payload)
+            simulation.queue_command(names[player], action, value)
+        while simulation.tick_count < tick and not simulation.ended:
+            simulation.tick(delta)
+        return simulation
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect a match replay or print the match state at a given tick.")
+    parser.add_argument("path")
+    parser.add_argument("--tick", type=int, help="Re-simulate up to this tick and print the snapshot.")
+    args = parser.parse_args()
+    with ReplayReader(args.path) as reader:
+        if args.tick is None:
+            commands = sum(1 for _ in reader.commands())
+            print(f"{reader.settings['match_id']}: {commands} commands, {len(reader.index)} keyframes, result {reader.result()}")
+        else:
+            print(json.dumps(reader.seek(args.tick).snapshot()))
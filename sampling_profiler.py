@@ -0,0 +1,102 @@
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_INTERVAL_SECONDS = 0.005
+SLOW_REQUEST_SECONDS = 0.5
+MAX_STACK_DEPTH = 64
+UNSAFE_FILENAME_PATTERN = re.compile(r"[^A-Za-z0-9_.-]+")
+
+
+def _folded_stack(frame):
+    names = []
+    while frame is not None and len(names) < MAX_STACK_DEPTH:
+        code = frame.f_code
+        names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class _Trace:
+    def __init__(self, label):
+        self.label = label
+        self.started_at = time.perf_counter()
+        self.stacks = Counter()
+
+
+class SlowRequestProfiler:
+    # Samples the stacks of threads that are serving requests; only slow requests keep their samples.
+    def __init__(self, output_dir, threshold_seconds=SLOW_REQUEST_SECONDS, interval_seconds=SAMPLE_INTERVAL_SECONDS, enabled=False):
+        self.output_dir = output_dir
+        self.threshold_seconds = threshold_seconds
+        self.interval_seconds = interval_seconds
+        self._lock = threading.Lock()
+        self._traces = {}
+        self._thread = None
+        self.enabled = False
+        self.dumped = 0
+        if enabled:
+            self.enable()
+
+    def enable(self, threshold_seconds=None):
+        with self._lock:
+            if threshold_seconds is not None:
+                self.threshold_seconds = threshold_seconds
+            self.enabled = True
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._sample, name="slow-request-profiler", daemon=True)
+                self._thread.start()
+
+    def disable(self):
+        with self._lock:
+            self.enabled = False
+            self._traces.clear()
+
+    def begin(self, label):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._traces[threading.get_ident()] = _Trace(label)
+
+    def end(self):
+        with self._lock:
+            trace = self._traces.pop(threading.get_ident(), None)
+        if trace is None:
+            return None
+        elapsed = time.perf_counter() - trace.started_at
+        if elapsed < self.threshold_seconds or not trace.stacks:
+            return None
+        return self._dump(trace, elapsed)
+
+    def _sample(self):
+        while True:
+            time.sleep(self.interval_seconds)
+            with self._lock:
+                if not self.enabled:
+                    self._thread = None
+                    return
+                if not self._traces:
+                    continue
+                frames = sys._current_frames()
+                for thread_id, trace in self._traces.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        trace.stacks[_folded_stack(frame)] += 1
+
+    def _dump(self, trace, elapsed):
+        # Folded-stack format ("frame;frame;frame count"), ready for flamegraph tools.
+        os.makedirs(self.output_dir, exist_ok=True)
+        name = UNSAFE_FILENAME_PATTERN.sub("_", trace.label).strip("_") or "request"
+        path = os.path.join(self.output_dir, f"{time.strftime('%Y%m%dT%H%M%S')}-{int(elapsed * 1000)}ms-{name}.folded")
+        with open(path, "w", encoding="utf-8") as profile_file:
+            for stack, count in trace.stacks.most_common():
+                profile_file.write(f"{stack} {count}\n")
+        self.dumped += 1
+        logger.warning("Slow request %s took %.0f ms; %d stack samples written to %s", trace.label, elapsed * 1000, sum(trace.stacks.values()), path)
+        return path
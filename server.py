@@ -0,0 +1,248 @@
+import argparse
+import logging
+import os
+import select
+import signal
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+
+logger = logging.getLogger("game_server")
+
+DEFAULT_HOST = os.environ.get("GAME_HOST", "0.0.0.0")
+DEFAULT_PORT = int(os.environ.get("GAME_PORT", "5000"))
+DEFAULT_WORKERS = int(os.environ.get("GAME_WORKERS", "1"))
+DEFAULT_THREADS = int(os.environ.get("GAME_THREADS", "32"))
+DEFAULT_BACKLOG = 2048
+GRACEFUL_TIMEOUT_SECONDS = 10
+READY_TIMEOUT_SECONDS = 120
+RESPAWN_DELAY_SECONDS = 1
+
+
+class PooledRequestHandler(WSGIRequestHandler):
+    # One request per connection, so an idle keep-alive socket never holds a pool thread.
+    protocol_version = "HTTP/1.0"
+
+    def log_request(self, code="-", size="-"):
+        if self.server.access_log:
+            super().log_request(code, size)
+
+
+class PooledWSGIServer(BaseWSGIServer):
+    # Werkzeug's WSGI server with a fixed pool of request threads instead of a new thread per connection.
+    multithread = True
+
+    def __init__(self, app, host, port, threads, fd=None, access_log=False):
+        super().__init__(host, port, app, handler=PooledRequestHandler, fd=fd)
+        self.access_log = access_log
+        self.pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="request")
+        self._idle = threading.Condition()
+        self.active = 0
+
+    def process_request(self, request, client_address):
+        with self._idle:
+            self.active += 1
+        self.pool.submit(self._handle, request, client_address)
+
+    def _handle(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            with self._idle:
+                self.active -= 1
+                self._idle.notify_all()
+
+    def drain(self, timeout):
+        # Waits for accepted requests to finish; long-lived streams are cut off at the deadline.
+        deadline = time.monotonic() + timeout
+        with self._idle:
+            while self.active and time.monotonic() < deadline:
+                self._idle.wait(deadline - time.monotonic())
+            return self.active
+
+
+def run_boot_checks():
+    # Schema creation, the developer account and legacy-file conversion run once, in a throwaway child,
+    # so the workers never repeat them and the master never holds database handles across fork().
+    pid = os.fork()
+    if pid == 0:
+        exit_code = 1
+        try:
+            import Web_game_back as backend
+
+            backend.shutdown()
+            exit_code = 0
+        except BaseException:
+            logger.exception("Boot checks failed")
+        finally:
+            os._exit(exit_code)
+    _, status = os.waitpid(pid, 0)
+    if os.waitstatus_to_exitcode(status) != 0:
+        raise SystemExit("boot checks failed; not starting workers")
+
+
+def serve(listener, args, ready_fd=None):
+    started_at = time.perf_counter()
+    import Web_game_back as backend
+
+    imported_at = time.perf_counter()
+    warmed = backend.warm_up()
+    warmed_at = time.perf_counter()
+    host, port = listener.getsockname()[:2]
+    server = PooledWSGIServer(backend.app, host, port, args.threads, fd=listener.fileno(), access_log=args.access_log)
+
+    def request_stop(signum, frame):
+        # shutdown() blocks until serve_forever returns, so it cannot run on the thread serve_forever is on.
+        threading.Thread(target=server.shutdown, name="server-shutdown", daemon=True).start()
+
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop if ready_fd is None else signal.SIG_IGN)
+    logger.info(
+        "worker %d ready in %.0f ms (import %.0f ms, warm-up %.0f ms: %s), %d threads",
+        os.getpid(), (warmed_at - started_at) * 1000, (imported_at - started_at) * 1000, (warmed_at - imported_at) * 1000, warmed, args.threads,
+    )
+    if ready_fd is not None:
+        os.write(ready_fd, b"1")
+        os.close(ready_fd)
+
+    server.serve_forever()
+    stopping_at = time.perf_counter()
+    cut_off = server.drain(args.graceful_timeout)
+    backend.shutdown()
+    logger.info("worker %d stopped in %.0f ms (%d requests cut off)", os.getpid(), (time.perf_counter() - stopping_at) * 1000, cut_off)
+    return cut_off
+
+
+def spawn_worker(listener, args, ready_fd):
+    pid = os.fork()
+    if pid != 0:
+        return pid
+    # Drop the master's handlers; serve() installs the worker's own once it is ready.
+    signal.alarm(0)
+    for signum in (signal.SIGTERM, signal.SIGALRM):
+        signal.signal(signum, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    exit_code = 1
+    try:
+        serve(listener, args, ready_fd)
+        exit_code = 0
+    except BaseException:
+        logger.exception("Worker %d crashed", os.getpid())
+    finally:
+        # Skip interpreter teardown: pool threads may still be parked on connections that were cut off.
+        logging.shutdown()
+        os._exit(exit_code)
+
+
+def wait_until_ready(ready_fd, count, timeout):
+    deadline = time.monotonic() + timeout
+    ready = 0
+    while ready < count:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0 or not select.select([ready_fd], [], [], remaining)[0]:
+            return ready
+        chunk = os.read(ready_fd, count - ready)
+        if not chunk:
+            return ready
+        ready += len(chunk)
+    return ready
+
+
+def run_master(listener, args):
+    boot_started_at = time.perf_counter()
+    run_boot_checks()
+    logger.info("boot checks finished in %.0f ms", (time.perf_counter() - boot_started_at) * 1000)
+    os.environ["GAME_BOOT_CHECKS"] = "0"
+
+    ready_read, ready_write = os.pipe()
+    workers = {spawn_worker(listener, args, ready_write) for _ in range(args.workers)}
+    ready = wait_until_ready(ready_read, args.workers, READY_TIMEOUT_SECONDS)
+    logger.info("%d/%d workers ready, accepting traffic on %s:%d", ready, args.workers, args.host, args.port)
+
+    stopping = threading.Event()
+
+    def forward(signum, frame):
+        if stopping.is_set():
+            for pid in workers:
+                os.kill(pid, signal.SIGKILL)
+            return
+        stopping.set()
+        logger.info("stopping %d workers", len(workers))
+        for pid in workers:
+            os.kill(pid, signal.SIGTERM)
+        signal.alarm(args.graceful_timeout + 5)
+
+    def kill_stragglers(signum, frame):
+        for pid in list(workers):
+            logger.warning("worker %d did not stop in time; killing it", pid)
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, forward)
+    signal.signal(signal.SIGINT, forward)
+    signal.signal(signal.SIGALRM, kill_stragglers)
+
+    while workers:
+        pid, status = os.wait()
+        if pid not in workers:
+            continue
+        workers.discard(pid)
+        if not stopping.is_set():
+            logger.warning("worker %d exited with status %d; starting a replacement", pid, os.waitstatus_to_exitcode(status))
+            time.sleep(RESPAWN_DELAY_SECONDS)
+            workers.add(spawn_worker(listener, args, ready_write))
+    logger.info("all workers stopped")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Production server: prefork workers, each with a fixed pool of request threads.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument(
+        "--workers", type=int, default=DEFAULT_WORKERS,
+        help="worker processes; with more than one, matches are simulated by the clients unless SERVER_SIMULATION=1, "
+        "so no replays are recorded and match telemetry is only what clients report",
+    )
+    parser.add_argument("--threads", type=int, default=DEFAULT_THREADS, help="request threads per worker")
+    parser.add_argument("--backlog", type=int, default=DEFAULT_BACKLOG)
+    parser.add_argument("--graceful-timeout", type=int, default=GRACEFUL_TIMEOUT_SECONDS, help="seconds to let in-flight requests finish on shutdown")
+    parser.add_argument("--access-log", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(process)d] %(levelname)s %(name)s: %(message)s")
+    started_at = time.perf_counter()
+    # Streams hold a pool thread each; past half the pool, lobby browsers are told to poll instead.
+    os.environ.setdefault("STREAM_MAX_PER_WORKER", str(max(1, args.threads // 2)))
+    prefork = args.workers > 1 and hasattr(os, "fork")
+    if prefork and "SERVER_SIMULATION" not in os.environ:
+        # A simulated match and its relay port belong to one process; without it clients simulate matches locally.
+        os.environ["SERVER_SIMULATION"] = "0"
+        logger.warning(
+            "server-side match simulation is off with %d workers, so matches are not recorded as replays; set SERVER_SIMULATION=1 to force it",
+            args.workers,
+        )
+
+    listener = socket.create_server((args.host, args.port), backlog=args.backlog)
+    cut_off = 0
+    if prefork:
+        run_master(listener, args)
+    else:
+        cut_off = serve(listener, args)
+    listener.close()
+    logger.info("server ran for %.0f s", time.perf_counter() - started_at)
+    if cut_off:
+        # Threads still parked on cut-off streams would block interpreter exit.
+        logging.shutdown()
+        os._exit(0)
+
+
+if __name__ == "__main__":
+    main()
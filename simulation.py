@@ -0,0 +1,679 @@
+import logging
+import math
+import threading
+import time
+import zlib
+
+import numpy as np
+
+from game_maps import TOWN_CELL_SIZE, TOWN_RADIUS, to_world_map, town_cells
+from spatial_grid import SpatialGrid, adaptive_cell_size
+
+logger = logging.getLogger(__name__)
+
+# Rules mirror the client managers in Web_game.js; keep the two in step when tuning gameplay.
+TEAMS = ("blue", "red")
+FORMATION_MODES = ("defense", "attack")
+MATCH_COMMANDS = ("spawn", "formation", "move")
+UNIT_STATES = ("idle", "moving", "defending", "attacking")
+FORMATION_DEFENSE = 0
+FORMATION_ATTACK = 1
+STATE_IDLE = 0
+STATE_MOVING = 1
+STATE_DEFENDING = 2
+STATE_ATTACKING = 3
+UNIT_COST = 10
+UNIT_SPEED = 120
+UNIT_COLLISION_DISTANCE = 24
+OBJECTIVE_RADIUS = TOWN_RADIUS
+DEFENSE_RING_RADIUS = 30
+SPAWN_JITTER = 50
+FORMATION_INTERVAL_MS = 500
+TICK_RATE = 20
+FINISHED_RETENTION_SECONDS = 30
+DEFAULT_SPAWN_POINT = {"x": 300, "y": 300}
+
+GAMEPLAY_CONFIG = {
+    "maxUnitsPerPlayer": 50,
+    "maxTotalUnits": 100,
+    "passiveGoldAmount": 2,
+    "passiveGoldIntervalMs": 3000,
+    "startingGold": 100,
+    "baseGoldCap": 100,
+    "captureGoldCapBonus": 50,
+}
+
+BOT_DIFFICULTY = {
+    "easy": {"spawnIntervalMs": 5000, "behavior": "passive"},
+    "medium": {"spawnIntervalMs": 3000, "behavior": "adaptive"},
+    "hard": {"spawnIntervalMs": 200, "behavior": "strategic"},
+}
+
+
+def resolve_difficulty(difficulty, default=None):
+    # Either a BOT_DIFFICULTY name or an explicit {"spawnIntervalMs", "behavior"} profile.
+    if isinstance(difficulty, dict):
+        return dict(BOT_DIFFICULTY["medium"], **difficulty)
+    if difficulty in BOT_DIFFICULTY:
+        return BOT_DIFFICULTY[difficulty]
+    return default or BOT_DIFFICULTY["medium"]
+
+
+def match_seed(match_id):
+    return zlib.crc32(match_id.encode("utf-8"))
+
+
+class MatchSimulation:
+    def __init__(self, match_id, game_map, players, game_time_minutes, seed=None, difficulty="medium", config=None, unit_cost=UNIT_COST):
+        self.match_id = match_id
+        self.seed = match_seed(match_id) if seed is None else seed
+        # Everything needed to rebuild this match from scratch; replays store it alongside the command stream.
+        self.settings = {
+            "match_id": match_id,
+            "game_map": game_map,
+            "players": players,
+            "game_time_minutes": game_time_minutes,
+            "seed": self.seed,
+            "difficulty": difficulty,
+            "config": config,
+            "unit_cost": unit_cost,
+        }
+        self.rng = np.random.default_rng(self.seed)
+        self.config = dict(GAMEPLAY_CONFIG, **(config or {}))
+        self.unit_cost = unit_cost
+        self.difficulty = resolve_difficulty(difficulty)
+
+        game_map = to_world_map(game_map)
+        self.width = game_map["width"]
+        self.height = game_map["height"]
+        spawn_points = game_map.get("spawnPoints", {})
+        self.spawn_points = np.array(
+            [[spawn_points.get(team, DEFAULT_SPAWN_POINT)["x"], spawn_points.get(team, DEFAULT_SPAWN_POINT)["y"]] for team in TEAMS],
+            dtype=np.float64,
+        )
+
+        self.player_names = [player["name"] for player in players]
+        self.player_index = {name: index for index, name in enumerate(self.player_names)}
+        self.player_team = np.array([TEAMS.index(player["team"]) for player in players], dtype=np.int8)
+        self.player_is_bot = np.array([bool(player.get("bot")) for player in players], dtype=bool)
+        self.player_gold = np.full(len(players), self.config["startingGold"], dtype=np.float64)
+        self.player_gold_cap = np.full(len(players), self.config["baseGoldCap"], dtype=np.float64)
+        self.player_formation = np.full(len(players), FORMATION_DEFENSE, dtype=np.int8)
+        self.player_created = np.zeros(len(players), dtype=np.int64)
+        self.player_lost = np.zeros(len(players), dtype=np.int64)
+        self.player_leader = np.full(len(players), -1, dtype=np.int64)
+        # Roster entries may carry their own difficulty so differently tuned bots can face each other.
+        self.player_difficulty = [resolve_difficulty(player.get("difficulty"), self.difficulty) for player in players]
+        self.player_spawn_ms = np.zeros(len(players), dtype=np.float64)
+        follow_humans = len(players) == 4
+        for index in np.flatnonzero(self.player_is_bot):
+            teammates = np.flatnonzero((self.player_team == self.player_team[index]) & ~self.player_is_bot)
+            if follow_humans and len(teammates):
+                self.player_leader[index] = teammates[0]
+        # Adaptive bots size themselves up against the (first) human's team, as in the client; -1 when bots play alone.
+        humans = np.flatnonzero(~self.player_is_bot)
+        self.human_team = int(self.player_team[humans[0]]) if len(humans) else -1
+
+        capacity = self.config["maxTotalUnits"]
+        self.count = 0
+        self.next_unit_id = 1
+        self.unit_id = np.zeros(capacity, dtype=np.int64)
+        self.x = np.zeros(capacity, dtype=np.float64)
+        self.y = np.zeros(capacity, dtype=np.float64)
+        self.target_x = np.zeros(capacity, dtype=np.float64)
+        self.target_y = np.zeros(capacity, dtype=np.float64)
+        self.strength = np.zeros(capacity, dtype=np.int64)
+        self.team = np.zeros(capacity, dtype=np.int8)
+        self.owner = np.zeros(capacity, dtype=np.int64)
+        self.state = np.zeros(capacity, dtype=np.int8)
+
+        towns = game_map.get("towns", [])
+        self.objective_names = [town.get("name") for town in towns]
+        self.objective_x = np.array([town["x"] for town in towns], dtype=np.float64)
+        self.objective_y = np.array([town["y"] for town in towns], dtype=np.float64)
+        self.objective_owner = np.full(len(towns), -1, dtype=np.int8)
+        self.objective_awarded = np.zeros((len(towns), len(TEAMS)), dtype=bool)
+        # Only units standing in a cell that some capture circle reaches need a distance check.
+        self.objective_cells = np.zeros((int(np.ceil(self.height / TOWN_CELL_SIZE)), int(np.ceil(self.width / TOWN_CELL_SIZE))), dtype=bool)
+        for col, row in town_cells(game_map, OBJECTIVE_RADIUS, TOWN_CELL_SIZE):
+            self.objective_cells[row, col] = True
+
+        self.remaining_ms = float(game_time_minutes or 10) * 60 * 1000
+        self.income_ms = 0.0
+        self.formation_ms = 0.0
+        self.tick_count = 0
+        self.ended = False
+        self.winner = None
+        self.reason = None
+        self.events = []
+        self.pending_commands = []
+        self.command_log = []
+
+    def queue_command(self, player_name, action, value=None):
+        if player_name not in self.player_index or action not in MATCH_COMMANDS:
+            return False
+        if action == "move":
+            value = parse_move_order(value)
+            if value is None:
+                return False
+        self.pending_commands.append((player_name, action, value))
+        return True
+
+    def _apply_commands(self):
+        commands, self.pending_commands = self.pending_commands, []
+        for player_name, action, value in commands:
+            player = self.player_index[player_name]
+            self.command_log.append((self.tick_count, player_name, action, value))
+            if action == "spawn":
+                self.spawn(player)
+            elif action == "formation" and value in FORMATION_MODES:
+                self.player_formation[player] = FORMATION_MODES.index(value)
+            elif action == "move" and isinstance(value, dict):
+                self._move_units(player, value)
+
+    def _move_units(self, player, order):
+        # Orders were checked by parse_move_order when they were queued.
+        unit_ids = np.asarray(order["units"], dtype=np.int64)
+        target_x = min(max(order["x"], 0.0), self.width)
+        target_y = min(max(order["y"], 0.0), self.height)
+        n = self.count
+        selected = np.isin(self.unit_id[:n], unit_ids) & (self.owner[:n] == player)
+        self.target_x[:n][selected] = target_x
+        self.target_y[:n][selected] = target_y
+        self.state[:n][selected] = STATE_MOVING
+
+    def tick(self, delta_seconds):
+        if self.ended:
+            return
+        self.tick_count += 1
+        self.events = []
+        self._apply_commands()
+        self._update_economy(delta_seconds)
+        self._update_ai(delta_seconds)
+        self._move(delta_seconds)
+        self._resolve_combat()
+        self._update_objectives()
+        self._update_match_flow(delta_seconds)
+
+    def team_strengths(self):
+        n = self.count
+        return np.bincount(self.team[:n], weights=self.strength[:n], minlength=len(TEAMS))
+
+    def spawn(self, player):
+        n = self.count
+        if n >= self.config["maxTotalUnits"]:
+            return None
+        if np.count_nonzero(self.owner[:n] == player) >= self.config["maxUnitsPerPlayer"]:
+            return None
+        if self.player_gold[player] < self.unit_cost:
+            return None
+        self.player_gold[player] -= self.unit_cost
+
+        team = self.player_team[player]
+        jitter = (self.rng.random(2) - 0.5) * SPAWN_JITTER
+        self.unit_id[n] = self.next_unit_id
+        self.x[n] = self.target_x[n] = self.spawn_points[team, 0] + jitter[0]
+        self.y[n] = self.target_y[n] = self.spawn_points[team, 1] + jitter[1]
+        self.strength[n] = self.rng.integers(1, 100)
+        self.team[n] = team
+        self.owner[n] = player
+        self.state[n] = STATE_IDLE
+        self.next_unit_id += 1
+        self.count += 1
+        self.player_created[player] += 1
+        return self.unit_id[n]
+
+    def _update_economy(self, delta_seconds):
+        interval = self.config["passiveGoldIntervalMs"]
+        self.income_ms += delta_seconds * 1000
+        while self.income_ms >= interval:
+            self.income_ms -= interval
+            np.minimum(self.player_gold + self.config["passiveGoldAmount"], self.player_gold_cap, out=self.player_gold)
+
+    def _update_ai(self, delta_seconds):
+        self.formation_ms += delta_seconds * 1000
+
+        for bot in np.flatnonzero(self.player_is_bot):
+            difficulty = self.player_difficulty[bot]
+            behavior = difficulty["behavior"]
+            self.player_spawn_ms[bot] += delta_seconds * 1000
+            if self.player_spawn_ms[bot] >= difficulty["spawnIntervalMs"]:
+                self.spawn(bot)
+                self.player_spawn_ms[bot] = 0.0
+
+            team = self.player_team[bot]
+            if behavior == "passive":
+                if self.rng.random() < 0.03:
+                    self.player_formation[bot] = FORMATION_ATTACK if self.rng.random() > 0.5 else FORMATION_DEFENSE
+            else:
+                strengths = self.team_strengths()
+                rival = self.human_team if behavior == "adaptive" and self.human_team >= 0 else 1 - team
+                self.player_formation[bot] = FORMATION_ATTACK if strengths[team] > strengths[rival] else FORMATION_DEFENSE
+
+            if self.player_leader[bot] >= 0:
+                self.player_formation[bot] = self.player_formation[self.player_leader[bot]]
+
+        if self.formation_ms >= FORMATION_INTERVAL_MS:
+            self._apply_formations()
+            self.formation_ms = 0.0
+
+    def _apply_formations(self):
+        n = self.count
+        if n == 0:
+            return
+        owner = self.owner[:n]
+        x = self.x[:n]
+        y = self.y[:n]
+        players = len(self.player_names)
+
+        counts = np.bincount(owner, minlength=players)
+        center_x = np.bincount(owner, weights=x, minlength=players) / np.maximum(counts, 1)
+        center_y = np.bincount(owner, weights=y, minlength=players) / np.maximum(counts, 1)
+        order = np.argsort(owner, kind="stable")
+        starts = np.cumsum(counts) - counts
+        rank = np.empty(n, dtype=np.int64)
+        rank[order] = np.arange(n) - starts[owner[order]]
+
+        # Units on an explicit move order keep it until they arrive.
+        free = self.state[:n] != STATE_MOVING
+        defending = free & (self.player_formation[owner] == FORMATION_DEFENSE)
+        angle = (2 * np.pi * rank[defending]) / np.maximum(counts[owner[defending]], 1)
+        self.target_x[:n][defending] = center_x[owner[defending]] + np.cos(angle) * DEFENSE_RING_RADIUS
+        self.target_y[:n][defending] = center_y[owner[defending]] + np.sin(angle) * DEFENSE_RING_RADIUS
+        self.state[:n][defending] = STATE_DEFENDING
+
+        team = self.team[:n]
+        for team_code in range(len(TEAMS)):
+            attackers = np.flatnonzero(free & ~defending & (team == team_code))
+            enemies = np.flatnonzero(team != team_code)
+            if not len(attackers) or not len(enemies):
+                continue
+            cell_size = adaptive_cell_size(x, y, len(enemies), UNIT_COLLISION_DISTANCE)
+            nearest = enemies[SpatialGrid(x[enemies], y[enemies], cell_size).nearest(x[attackers], y[attackers])]
+            self.target_x[attackers] = x[nearest]
+            self.target_y[attackers] = y[nearest]
+            self.state[attackers] = STATE_ATTACKING
+
+    def _move(self, delta_seconds):
+        n = self.count
+        if n == 0:
+            return
+        dx = self.target_x[:n] - self.x[:n]
+        dy = self.target_y[:n] - self.y[:n]
+        distance = np.hypot(dx, dy)
+        step = UNIT_SPEED * delta_seconds
+        moving = distance >= 0.01
+        arrived = moving & (distance <= step)
+        self.x[:n][arrived] = self.target_x[:n][arrived]
+        self.y[:n][arrived] = self.target_y[:n][arrived]
+        self.state[:n][(distance <= step) & (self.state[:n] == STATE_MOVING)] = STATE_IDLE
+        walking = moving & ~arrived
+        ratio = step / distance[walking]
+        self.x[:n][walking] += dx[walking] * ratio
+        self.y[:n][walking] += dy[walking] * ratio
+
+    def _resolve_combat(self):
+        n = self.count
+        if n < 2:
+            return
+        team = self.team[:n]
+        strength = self.strength[:n]
+        first, second = SpatialGrid(self.x[:n], self.y[:n], UNIT_COLLISION_DISTANCE).pairs_within(UNIT_COLLISION_DISTANCE)
+        hostile = team[first] != team[second]
+
+        # Contacts are found in bulk; resolving them in index order keeps the client's first-come outcome.
+        removed = np.zeros(n, dtype=bool)
+        fought = -1
+        for a, b in zip(first[hostile].tolist(), second[hostile].tolist()):
+            if a == fought or removed[a] or removed[b]:
+                continue
+            self._duel(a, b, strength, removed)
+            fought = a
+        self._remove(removed)
+
+    def _duel(self, a, b, strength, removed):
+        if strength[a] > strength[b]:
+            strength[a] -= strength[b]
+            removed[b] = True
+            self.state[a] = STATE_ATTACKING
+        elif strength[b] > strength[a]:
+            strength[b] -= strength[a]
+            removed[a] = True
+            self.state[b] = STATE_ATTACKING
+        else:
+            removed[a] = True
+            removed[b] = True
+
+    def _remove(self, removed):
+        if not removed.any():
+            return
+        n = self.count
+        self.player_lost += np.bincount(self.owner[:n][removed], minlength=len(self.player_names))
+        keep = ~removed
+        kept = int(np.count_nonzero(keep))
+        for column in (self.unit_id, self.x, self.y, self.target_x, self.target_y, self.strength, self.team, self.owner, self.state):
+            column[:kept] = column[:n][keep]
+        self.count = kept
+
+    def _update_objectives(self):
+        n = self.count
+        if n == 0 or not len(self.objective_x):
+            return
+        x = self.x[:n]
+        y = self.y[:n]
+        col = (x // TOWN_CELL_SIZE).astype(np.int64)
+        row = (y // TOWN_CELL_SIZE).astype(np.int64)
+        rows, cols = self.objective_cells.shape
+        inside = (col >= 0) & (col < cols) & (row >= 0) & (row < rows)
+        candidates = ~inside
+        candidates[inside] = self.objective_cells[row[inside], col[inside]]
+        members = np.flatnonzero(candidates)
+        dx = x[members][None, :] - self.objective_x[:, None]
+        dy = y[members][None, :] - self.objective_y[:, None]
+        towns, hits = np.nonzero(dx * dx + dy * dy <= OBJECTIVE_RADIUS * OBJECTIVE_RADIUS)
+        members = members[hits]
+        member_team = self.team[:n][members]
+        blue = np.bincount(towns[member_team == 0], minlength=len(self.objective_x))
+        red = np.bincount(towns[member_team == 1], minlength=len(self.objective_x))
+
+        for objective in np.flatnonzero(blue != red):
+            owner = 0 if blue[objective] > red[objective] else 1
+            if owner == self.objective_owner[objective]:
+                continue
+            self.objective_owner[objective] = owner
+            self.events.append({"type": "capture", "objective": self.objective_names[objective], "team": TEAMS[owner]})
+            if not self.objective_awarded[objective, owner]:
+                self.objective_awarded[objective, owner] = True
+                members = self.player_team == owner
+                self.player_gold_cap[members] += self.config["captureGoldCapBonus"]
+                np.minimum(self.player_gold, self.player_gold_cap, out=self.player_gold)
+
+    def _update_match_flow(self, delta_seconds):
+        self.remaining_ms = max(0.0, self.remaining_ms - delta_seconds * 1000)
+        if self.remaining_ms == 0:
+            strengths = self.team_strengths()
+            self.finish(0 if strengths[0] >= strengths[1] else 1, "Time expired.")
+
+        alive = np.bincount(self.team[: self.count], minlength=len(TEAMS))
+        for team_code, team in enumerate(TEAMS):
+            broke = np.all(self.player_gold[self.player_team == team_code] < self.unit_cost)
+            if alive[team_code] == 0 and broke:
+                self.finish(1 - team_code, f"{team.upper()} ran out of units and gold.")
+
+    def finish(self, winner, reason):
+        if self.ended:
+            return
+        self.ended = True
+        self.winner = TEAMS[winner]
+        self.reason = reason
+        self.events.append({"type": "finish", "winner": self.winner, "reason": reason})
+
+    def result(self):
+        return {
+            "winner": self.winner,
+            "reason": self.reason,
+            "ticks": self.tick_count,
+            "deployed_units": {
+                name: int(self.player_created[index]) for index, name in enumerate(self.player_names) if not self.player_is_bot[index]
+            },
+        }
+
+    def telemetry(self):
+        # Per-team totals sampled into the match's telemetry series.
+        n = self.count
+        strengths = self.team_strengths()
+        units = np.bincount(self.team[:n], minlength=len(TEAMS))
+        gold = np.bincount(self.player_team, weights=self.player_gold, minlength=len(TEAMS))
+        deployed = np.bincount(self.player_team, weights=self.player_created, minlength=len(TEAMS))
+        values = {}
+        for index, team in enumerate(TEAMS):
+            values[f"gold.{team}"] = float(gold[index])
+            values[f"strength.{team}"] = float(strengths[index])
+            values[f"units.{team}"] = int(units[index])
+            values[f"objectives.{team}"] = int(np.count_nonzero(self.objective_owner == index))
+            values[f"deployed.{team}"] = int(deployed[index])
+        return values
+
+    def snapshot(self):
+        n = self.count
+        return {
+            "match_id": self.match_id,
+            "tick": self.tick_count,
+            "remaining_ms": int(self.remaining_ms),
+            "ended": self.ended,
+            "winner": self.winner,
+            "reason": self.reason,
+            "units": {
+                "id": self.unit_id[:n].tolist(),
+                "x": np.round(self.x[:n], 1).tolist(),
+                "y": np.round(self.y[:n], 1).tolist(),
+                "team": [TEAMS[team] for team in self.team[:n]],
+                "strength": self.strength[:n].tolist(),
+                "owner": [self.player_names[owner] for owner in self.owner[:n]],
+                "state": [UNIT_STATES[state] for state in self.state[:n]],
+            },
+            "players": [
+                {
+                    "name": name,
+                    "team": TEAMS[self.player_team[index]],
+                    "bot": bool(self.player_is_bot[index]),
+                    "gold": int(self.player_gold[index]),
+                    "gold_cap": int(self.player_gold_cap[index]),
+                    "formation": FORMATION_MODES[self.player_formation[index]],
+                    "units": int(np.count_nonzero(self.owner[:n] == index)),
+                    "created": int(self.player_created[index]),
+                    "lost": int(self.player_lost[index]),
+                }
+                for index, name in enumerate(self.player_names)
+            ],
+            "objectives": [
+                {
+                    "name": name,
+                    "x": float(self.objective_x[index]),
+                    "y": float(self.objective_y[index]),
+                    "owner": TEAMS[self.objective_owner[index]] if self.objective_owner[index] >= 0 else None,
+                }
+                for index, name in enumerate(self.objective_names)
+            ],
+            "events": list(self.events),
+        }
+
+
+def build_roster(players, teams, max_players):
+    slots_per_team = 2 if max_players == 4 else 1
+    roster = {team: [] for team in TEAMS}
+    for player in players:
+        team = teams.get(player)
+        if team not in roster:
+            team = min(TEAMS, key=lambda name: len(roster[name]))
+        roster[team].append(player)
+
+    entries = []
+    for team in TEAMS:
+        entries.extend({"name": player, "team": team, "bot": False} for player in roster[team])
+        for index in range(len(roster[team]), slots_per_team):
+            entries.append({"name": f"BOT {team.upper()} {index + 1}", "team": team, "bot": True})
+    return entries
+
+
+def parse_move_order(order):
+    # NaN and infinite targets survive the clamp and would leave units moving forever, so they are refused here.
+    if not isinstance(order, dict):
+        return None
+    try:
+        units = [int(unit) for unit in order.get("units") or []]
+        target_x = float(order["x"])
+        target_y = float(order["y"])
+    except (KeyError, TypeError, ValueError, OverflowError):
+        return None
+    if not (math.isfinite(target_x) and math.isfinite(target_y)):
+        return None
+    if any(not -(2**63) <= unit < 2**63 for unit in units):
+        return None
+    return {"units": units, "x": target_x, "y": target_y}
+
+
+class SimulationHost:
+    def __init__(self, tick_rate=TICK_RATE, on_finish=None, on_abandon=None):
+        self.tick_seconds = 1.0 / tick_rate
+        self.on_finish = on_finish
+        self.on_abandon = on_abandon
+        self._cond = threading.Condition()
+        self._matches = {}
+        self._finished = {}
+        self._recorders = {}
+        self._tick_listeners = []
+        self._thread = None
+        self._stopped = False
+        self.ticks = 0
+        self.overruns = 0
+
+    def start_match(self, simulation, *recorders):
+        with self._cond:
+            self._matches[simulation.match_id] = simulation
+            recorders = [recorder for recorder in recorders if recorder is not None]
+            if recorders:
+                self._recorders[simulation.match_id] = recorders
+            if self._thread is None:
+                self._stopped = False
+                self._thread = threading.Thread(target=self._run, name="match-simulation", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def __contains__(self, match_id):
+        with self._cond:
+            return match_id in self._matches
+
+    def active(self):
+        with self._cond:
+            return len(self._matches)
+
+    def command(self, match_id, player_name, action, value=None):
+        with self._cond:
+            simulation = self._matches.get(match_id)
+            return simulation is not None and simulation.queue_command(player_name, action, value)
+
+    def inspect(self, match_id, view):
+        # Finished matches stay readable for a while so late readers still see the final state.
+        with self._cond:
+            simulation = self._matches.get(match_id)
+            if simulation is None:
+                simulation = self._finished.get(match_id, (None, None))[0]
+            return view(simulation) if simulation is not None else None
+
+    def snapshot(self, match_id):
+        return self.inspect(match_id, MatchSimulation.snapshot)
+
+    def add_tick_listener(self, listener):
+        with self._cond:
+            self._tick_listeners.append(listener)
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+            thread = self._thread
+            self._thread = None
+            recorders, self._recorders = self._recorders, {}
+        if thread is not None:
+            thread.join()
+        for match_recorders in recorders.values():
+            for recorder in match_recorders:
+                recorder.close()
+
+    def _tick_all(self):
+        finished = []
+        abandoned = []
+        with self._cond:
+            now = time.monotonic()
+            for match_id, simulation in list(self._matches.items()):
+                # One broken match is dropped; the host thread keeps ticking every other match.
+                try:
+                    simulation.tick(self.tick_seconds)
+                except Exception:
+                    logger.exception("Simulation failed for match %s; abandoning it", match_id)
+                    del self._matches[match_id]
+                    self._close_recorders(match_id)
+                    abandoned.append(match_id)
+                    continue
+                self._record(match_id, simulation)
+                if simulation.ended:
+                    finished.append(self._matches.pop(match_id))
+                    self._finished[match_id] = (simulation, now + FINISHED_RETENTION_SECONDS)
+            for match_id, (_, expires_at) in list(self._finished.items()):
+                if expires_at <= now:
+                    del self._finished[match_id]
+            self.ticks += 1
+            listeners = list(self._tick_listeners)
+
+        for listener in listeners:
+            try:
+                listener()
+            except Exception:
+                logger.exception("Tick listener failed")
+
+        for simulation in finished:
+            if self.on_finish is None:
+                continue
+            try:
+                self.on_finish(simulation.match_id, simulation.result())
+            except Exception:
+                logger.exception("Failed to record result for match %s", simulation.match_id)
+
+        for match_id in abandoned:
+            if self.on_abandon is None:
+                continue
+            try:
+                self.on_abandon(match_id)
+            except Exception:
+                logger.exception("Failed to abandon match %s", match_id)
+
+    def _close_recorders(self, match_id):
+        for recorder in self._recorders.pop(match_id, ()):
+            try:
+                recorder.close()
+            except Exception:
+                logger.exception("Failed to close recorder for match %s", match_id)
+
+    def _record(self, match_id, simulation):
+        recorders = self._recorders.get(match_id)
+        if recorders is None:
+            return
+        # A broken recorder is dropped; the match and its other recorders carry on.
+        for recorder in list(recorders):
+            try:
+                recorder.record(simulation)
+                if simulation.ended:
+                    recorders.remove(recorder)
+                    recorder.close()
+            except Exception:
+                logger.exception("Recording failed for match %s", match_id)
+                recorders.remove(recorder)
+                try:
+                    recorder.close()
+                except Exception:
+                    pass
+        if not recorders:
+            del self._recorders[match_id]
+
+    def _run(self):
+        # Every match advances by the same fixed step; a slow tick delays wall-clock time, never the rules.
+        deadline = time.monotonic()
+        while True:
+            with self._cond:
+                while not self._stopped and not self._matches:
+                    self._cond.wait()
+                    deadline = time.monotonic()
+                if self._stopped:
+                    return
+
+            self._tick_all()
+            deadline += self.tick_seconds
+            delay = deadline - time.monotonic()
+            if delay < 0:
+                self.overruns += 1
+                deadline = time.monotonic()
+                continue
+            with self._cond:
+                if not self._stopped:
+                    self._cond.wait(delay)
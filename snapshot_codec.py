@@ -0,0 +1,113 @@
+import struct
+import time
+
+import numpy as np
+
+from simulation import TEAMS
+
+SNAPSHOT_VERSION = 1
+SNAPSHOT_KIND = 1
+POSITION_SCALE = 4
+HEADER = struct.Struct("<BBIIIdbB")
+SECTION_COUNTS = struct.Struct("<BBHH")
+FLAG_ENDED = 1
+UNIT_DTYPE = np.dtype([("id", "<u4"), ("x", "<i2"), ("y", "<i2"), ("strength", "u1"), ("owner", "u1"), ("state", "u1")])
+PLAYER_DTYPE = np.dtype(
+    [("gold", "<u2"), ("gold_cap", "<u2"), ("formation", "u1"), ("units", "<u2"), ("created", "<u2"), ("lost", "<u2")]
+)
+REMOVED_DTYPE = np.dtype("<u4")
+OBJECTIVE_DTYPE = np.dtype("i1")
+
+
+class SnapshotFrame:
+    def __init__(self, tick, remaining_ms, ended, winner, units, players, objectives, server_time):
+        self.tick = tick
+        self.remaining_ms = remaining_ms
+        self.ended = ended
+        self.winner = winner
+        self.units = units
+        self.players = players
+        self.objectives = objectives
+        self.server_time = server_time
+
+
+def build_frame(simulation):
+    n = simulation.count
+    units = np.empty(n, dtype=UNIT_DTYPE)
+    units["id"] = simulation.unit_id[:n]
+    units["x"] = np.round(simulation.x[:n] * POSITION_SCALE)
+    units["y"] = np.round(simulation.y[:n] * POSITION_SCALE)
+    units["strength"] = simulation.strength[:n]
+    units["owner"] = simulation.owner[:n]
+    units["state"] = simulation.state[:n]
+
+    owned = np.bincount(simulation.owner[:n], minlength=len(simulation.player_names))
+    players = np.empty(len(simulation.player_names), dtype=PLAYER_DTYPE)
+    players["gold"] = simulation.player_gold
+    players["gold_cap"] = simulation.player_gold_cap
+    players["formation"] = simulation.player_formation
+    players["units"] = owned
+    players["created"] = simulation.player_created
+    players["lost"] = simulation.player_lost
+
+    winner = TEAMS.index(simulation.winner) if simulation.winner else -1
+    return SnapshotFrame(
+        simulation.tick_count,
+        int(simulation.remaining_ms),
+        simulation.ended,
+        winner,
+        units,
+        players,
+        simulation.objective_owner.astype(OBJECTIVE_DTYPE),
+        time.time(),
+    )
+
+
+def encode_frame(frame, base=None):
+    # Units are sent only when they changed since the acknowledged base frame; both are sorted by id.
+    changed = frame.units
+    removed = np.zeros(0, dtype=REMOVED_DTYPE)
+    if base is not None and len(base.units):
+        position = np.minimum(np.searchsorted(base.units["id"], frame.units["id"]), len(base.units) - 1)
+        unchanged = base.units[position] == frame.units
+        changed = frame.units[~unchanged]
+        removed = np.setdiff1d(base.units["id"], frame.units["id"], assume_unique=True).astype(REMOVED_DTYPE)
+
+    header = HEADER.pack(
+        SNAPSHOT_VERSION,
+        SNAPSHOT_KIND,
+        frame.tick,
+        base.tick if base is not None else 0,
+        frame.remaining_ms,
+        frame.server_time,
+        frame.winner,
+        FLAG_ENDED if frame.ended else 0,
+    )
+    counts = SECTION_COUNTS.pack(len(frame.players), len(frame.objectives), len(changed), len(removed))
+    return b"".join((header, counts, frame.players.tobytes(), frame.objectives.tobytes(), changed.tobytes(), removed.tobytes()))
+
+
+def decode_frame(payload, frames):
+    version, kind, tick, base_tick, remaining_ms, server_time, winner, flags = HEADER.unpack_from(payload, 0)
+    if version != SNAPSHOT_VERSION or kind != SNAPSHOT_KIND:
+        raise ValueError("Unsupported snapshot")
+    player_count, objective_count, changed_count, removed_count = SECTION_COUNTS.unpack_from(payload, HEADER.size)
+
+    offset = HEADER.size + SECTION_COUNTS.size
+    players = np.frombuffer(payload, dtype=PLAYER_DTYPE, count=player_count, offset=offset)
+    offset += players.nbytes
+    objectives = np.frombuffer(payload, dtype=OBJECTIVE_DTYPE, count=objective_count, offset=offset)
+    offset += objectives.nbytes
+    changed = np.frombuffer(payload, dtype=UNIT_DTYPE, count=changed_count, offset=offset)
+    offset += changed.nbytes
+    removed = np.frombuffer(payload, dtype=REMOVED_DTYPE, count=removed_count, offset=offset)
+
+    units = changed.copy()
+    if base_tick:
+        base = frames.get(base_tick)
+        if base is None:
+            raise KeyError(f"Missing base frame {base_tick}")
+        kept = base.units[~np.isin(base.units["id"], removed) & ~np.isin(base.units["id"], changed["id"])]
+        units = np.concatenate((kept, units))
+        units = units[np.argsort(units["id"], kind="stable")]
+    return SnapshotFrame(tick, remaining_ms, bool(flags & FLAG_ENDED), winner, units, players.copy(), objectives.copy(), server_time)
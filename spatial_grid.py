@@ -0,0 +1,165 @@
+import math
+from functools import lru_cache
+
+import numpy as np
+
+# Below this many query/point combinations a dense distance matrix beats the grid's bookkeeping.
+DENSE_QUERY_LIMIT = 4096
+
+
+def adaptive_cell_size(x, y, count, minimum):
+    # Sparse point sets get coarser cells so nearest-neighbour rings stay short.
+    if count == 0 or not len(x):
+        return minimum
+    area = max(float(np.ptp(x)) * float(np.ptp(y)), minimum * minimum)
+    return max(minimum, math.sqrt(area / count))
+
+
+@lru_cache(maxsize=None)
+def _ring_offsets(radius):
+    span = np.arange(-radius, radius + 1)
+    offset_x, offset_y = np.meshgrid(span, span)
+    ring = np.maximum(np.abs(offset_x), np.abs(offset_y)) == radius
+    return offset_x[ring], offset_y[ring]
+
+
+@lru_cache(maxsize=None)
+def _block_offsets(reach):
+    span = np.arange(-reach, reach + 1)
+    offset_x, offset_y = np.meshgrid(span, span)
+    return offset_x.ravel(), offset_y.ravel()
+
+
+class SpatialGrid:
+    def __init__(self, x, y, cell_size):
+        self.x = np.asarray(x, dtype=np.float64)
+        self.y = np.asarray(y, dtype=np.float64)
+        self.cell_size = float(cell_size)
+        self.size = len(self.x)
+        self._indexed = False
+
+    def _index(self):
+        # Built on first use: small queries take the dense path and never need the cells.
+        if self._indexed:
+            return
+        self._indexed = True
+        if self.size == 0:
+            self.origin_x = self.origin_y = 0.0
+            self.cols = self.rows = 0
+            self.order = np.zeros(0, dtype=np.int64)
+            self.cell_keys = np.zeros(0, dtype=np.int64)
+            self.cell_start = np.zeros(0, dtype=np.int64)
+            self.cell_end = np.zeros(0, dtype=np.int64)
+            return
+
+        self.origin_x = float(self.x.min())
+        self.origin_y = float(self.y.min())
+        cell_x = ((self.x - self.origin_x) // self.cell_size).astype(np.int64)
+        cell_y = ((self.y - self.origin_y) // self.cell_size).astype(np.int64)
+        self.cols = int(cell_x.max()) + 1
+        self.rows = int(cell_y.max()) + 1
+        keys = cell_y * self.cols + cell_x
+        # Points of one cell are contiguous in `order`, still in index order; only occupied cells are stored.
+        self.order = np.argsort(keys, kind="stable")
+        self.cell_keys, self.cell_start = np.unique(keys[self.order], return_index=True)
+        self.cell_end = np.append(self.cell_start[1:], self.size)
+
+    def cell_of(self, x, y):
+        self._index()
+        cell_x = np.floor((np.asarray(x, dtype=np.float64) - self.origin_x) / self.cell_size).astype(np.int64)
+        cell_y = np.floor((np.asarray(y, dtype=np.float64) - self.origin_y) / self.cell_size).astype(np.int64)
+        return cell_x, cell_y
+
+    def _gather(self, queries, cell_x, cell_y):
+        inside = (cell_x >= 0) & (cell_x < self.cols) & (cell_y >= 0) & (cell_y < self.rows)
+        keys = cell_y[inside] * self.cols + cell_x[inside]
+        slots = np.searchsorted(self.cell_keys, keys)
+        occupied = slots < len(self.cell_keys)
+        occupied[occupied] = self.cell_keys[slots[occupied]] == keys[occupied]
+        queries = queries[inside][occupied]
+        starts = self.cell_start[slots[occupied]]
+        counts = self.cell_end[slots[occupied]] - starts
+        total = int(counts.sum())
+        if total == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        within_cell = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+        return np.repeat(queries, counts), self.order[np.repeat(starts, counts) + within_cell]
+
+    def _gather_offsets(self, queries, base_x, base_y, offsets):
+        offset_x, offset_y = offsets
+        return self._gather(
+            np.repeat(queries, len(offset_x)),
+            (base_x[:, None] + offset_x[None, :]).ravel(),
+            (base_y[:, None] + offset_y[None, :]).ravel(),
+        )
+
+    def _candidates(self, query_x, query_y, offsets):
+        base_x, base_y = self.cell_of(query_x, query_y)
+        return self._gather_offsets(np.arange(len(base_x)), base_x, base_y, offsets)
+
+    def within(self, query_x, query_y, radius):
+        query_x = np.atleast_1d(np.asarray(query_x, dtype=np.float64))
+        query_y = np.atleast_1d(np.asarray(query_y, dtype=np.float64))
+        if self.size == 0 or not len(query_x):
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        if len(query_x) * self.size <= DENSE_QUERY_LIMIT:
+            dx = self.x[None, :] - query_x[:, None]
+            dy = self.y[None, :] - query_y[:, None]
+            return np.nonzero(dx * dx + dy * dy <= radius * radius)
+        reach = int(math.ceil(radius / self.cell_size))
+        queries, points = self._candidates(query_x, query_y, _block_offsets(reach))
+        dx = self.x[points] - query_x[queries]
+        dy = self.y[points] - query_y[queries]
+        close = dx * dx + dy * dy <= radius * radius
+        return queries[close], points[close]
+
+    def pairs_within(self, radius):
+        first, second = self.within(self.x, self.y, radius)
+        keep = first < second
+        first = first[keep]
+        second = second[keep]
+        order = np.lexsort((second, first))
+        return first[order], second[order]
+
+    def nearest(self, query_x, query_y):
+        query_x = np.atleast_1d(np.asarray(query_x, dtype=np.float64))
+        query_y = np.atleast_1d(np.asarray(query_y, dtype=np.float64))
+        best = np.full(len(query_x), -1, dtype=np.int64)
+        if self.size == 0 or not len(query_x):
+            return best
+        if len(query_x) * self.size <= DENSE_QUERY_LIMIT:
+            dx = self.x[None, :] - query_x[:, None]
+            dy = self.y[None, :] - query_y[:, None]
+            return np.argmin(dx * dx + dy * dy, axis=1)
+
+        best_distance = np.full(len(query_x), np.inf)
+        base_x, base_y = self.cell_of(query_x, query_y)
+        farthest = np.max(
+            np.maximum.reduce([np.abs(base_x), np.abs(base_x - self.cols + 1), np.abs(base_y), np.abs(base_y - self.rows + 1)])
+        )
+        pending = np.arange(len(query_x))
+        for ring in range(int(farthest) + 1):
+            queries, points = self._gather_offsets(pending, base_x[pending], base_y[pending], _ring_offsets(ring))
+            if len(queries):
+                dx = self.x[points] - query_x[queries]
+                dy = self.y[points] - query_y[queries]
+                distance = dx * dx + dy * dy
+                # Closest first, lowest index on ties, matching a linear scan with a strict comparison.
+                order = np.lexsort((points, distance, queries))
+                queries = queries[order]
+                first = np.ones(len(queries), dtype=bool)
+                first[1:] = queries[1:] != queries[:-1]
+                queries = queries[first]
+                points = points[order][first]
+                distance = distance[order][first]
+                current = best[queries]
+                better = (distance < best_distance[queries]) | ((distance == best_distance[queries]) & (points < current))
+                best[queries[better]] = points[better]
+                best_distance[queries[better]] = distance[better]
+
+            # Anything in a later ring is at least `ring` whole cells away.
+            reach = ring * self.cell_size
+            pending = pending[~(best_distance[pending] < reach * reach)]
+            if not len(pending):
+                break
+        return best
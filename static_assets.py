@@ -0,0 +1,137 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Only these files are ever served; everything else in the project directory (data files included) stays private.
+STATIC_ASSETS = ("Web_game.html", "Web_game.css", "Web_game.js", "maps.js")
+ENTRY_ASSET = "Web_game.html"
+FINGERPRINT_LENGTH = 12
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+MIN_COMPRESS_BYTES = 256
+ASSET_REFERENCE_PATTERN = re.compile(r'(\b(?:src|href)=")([^"?#]+)(")')
+
+
+def fingerprinted_name(name, digest):
+    stem, extension = os.path.splitext(name)
+    return f"{stem}.{digest}{extension}"
+
+
+def _accepted_encodings(header):
+    accepted = set()
+    for part in (header or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        quality = params.strip()
+        if quality.startswith("q="):
+            try:
+                if float(quality[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(coding.strip().lower())
+    return accepted
+
+
+def _etag_matches(header, digest):
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # Weak comparison: every encoding of an asset carries the same fingerprint.
+    for tag in header.split(","):
+        if tag.strip().removeprefix("W/").strip('"').partition("-")[0] == digest:
+            return True
+    return False
+
+
+class StaticAsset:
+    def __init__(self, name, body):
+        self.name = name
+        self.digest = hashlib.sha256(body).hexdigest()[:FINGERPRINT_LENGTH]
+        self.url_name = fingerprinted_name(name, self.digest)
+        content_type, _ = mimetypes.guess_type(name)
+        if content_type is None:
+            content_type = "application/octet-stream"
+        elif content_type.startswith("text/") or content_type.endswith("javascript"):
+            content_type += "; charset=utf-8"
+        self.content_type = content_type
+        self.bodies = {"identity": body}
+        if len(body) >= MIN_COMPRESS_BYTES:
+            self.bodies["gzip"] = gzip.compress(body, compresslevel=9, mtime=0)
+            if brotli is not None:
+                self.bodies["br"] = brotli.compress(body, quality=11)
+
+    def etag(self, encoding):
+        return f'"{self.digest}"' if encoding == "identity" else f'"{self.digest}-{encoding}"'
+
+    def choose_encoding(self, accept_encoding):
+        accepted = _accepted_encodings(accept_encoding)
+        for encoding in ("br", "gzip"):
+            if encoding in self.bodies and encoding in accepted:
+                return encoding
+        return "identity"
+
+
+class AssetBundle:
+    def __init__(self, base_dir, names=STATIC_ASSETS, entry=ENTRY_ASSET):
+        self.base_dir = base_dir
+        self.names = names
+        self.entry = entry
+        self.load()
+
+    def load(self):
+        # Referenced assets are fingerprinted first so the entry page can point at their hashed URLs.
+        assets = {}
+        for name in self.names:
+            if name == self.entry:
+                continue
+            with open(os.path.join(self.base_dir, name), "rb") as asset_file:
+                assets[name] = StaticAsset(name, asset_file.read())
+
+        with open(os.path.join(self.base_dir, self.entry), "r", encoding="utf-8") as entry_file:
+            page = entry_file.read()
+
+        def rewrite(found):
+            asset = assets.get(found.group(2))
+            return found.group(0) if asset is None else f"{found.group(1)}{asset.url_name}{found.group(3)}"
+
+        assets[self.entry] = StaticAsset(self.entry, ASSET_REFERENCE_PATTERN.sub(rewrite, page).encode("utf-8"))
+
+        routes = {}
+        for asset in assets.values():
+            routes[asset.name] = (asset, False)
+            routes[asset.url_name] = (asset, True)
+        self.assets = assets
+        self.routes = routes
+
+    def lookup(self, path):
+        return self.routes.get(path, (None, False))
+
+    def respond(self, path, headers):
+        # Returns (status, headers, body) or None for anything outside the allowlist.
+        asset, immutable = self.lookup(path)
+        if asset is None:
+            return None
+        encoding = asset.choose_encoding(headers.get("Accept-Encoding"))
+        etag = asset.etag(encoding)
+        response_headers = {
+            "ETag": etag,
+            "Cache-Control": IMMUTABLE_CACHE_CONTROL if immutable else REVALIDATE_CACHE_CONTROL,
+            "Vary": "Accept-Encoding",
+        }
+        if _etag_matches(headers.get("If-None-Match"), asset.digest):
+            return 304, response_headers, b""
+
+        body = asset.bodies[encoding]
+        response_headers["Content-Type"] = asset.content_type
+        response_headers["Content-Length"] = str(len(body))
+        if encoding != "identity":
+            response_headers["Content-Encoding"] = encoding
+        return 200, response_headers, body
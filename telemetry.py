@@ -0,0 +1,285 @@
+import math
+import os
+import re
+import struct
+import sys
+import threading
+from array import array
+from collections import OrderedDict
+
+from match_store import MATCH_ID_PATTERN
+from metrics import observe_io
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Rollup widths in seconds; every sample lands in one bucket of each.
+RESOLUTIONS = (1, 10, 60)
+DEFAULT_MAX_POINTS = 500
+METRIC_NAME_PATTERN = re.compile(r"^[a-z][a-z0-9_]{0,31}(\.[a-z0-9_]{1,32})?$")
+MAX_METRICS_PER_MATCH = 64
+MAX_SAMPLES_PER_BATCH = 10000
+MAX_MATCH_SECONDS = 6 * 60 * 60
+MAX_CACHED_MATCHES = 256
+SAMPLE_INTERVAL_SECONDS = 1
+FLUSH_INTERVAL_SECONDS = 10
+# On disk a match is a run of batches: header, metric name, then the sample times and values as packed columns.
+BATCH_HEADER = struct.Struct("<BI")
+TIME_TYPECODE = "f"
+VALUE_TYPECODE = "d"
+
+
+def _column(typecode, raw):
+    values = array(typecode)
+    values.frombytes(raw)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+
+def _column_bytes(values):
+    if sys.byteorder == "big":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def encode_batch(name, times, values):
+    encoded_name = name.encode("ascii")
+    return b"".join(
+        (BATCH_HEADER.pack(len(encoded_name), len(times)), encoded_name, _column_bytes(array(TIME_TYPECODE, times)), _column_bytes(array(VALUE_TYPECODE, values)))
+    )
+
+
+def parse_samples(raw):
+    # {metric: {"t": [seconds since match start], "v": [values]}} -> {metric: (times, values)}; raises ValueError.
+    if not isinstance(raw, dict) or not raw:
+        raise ValueError("samples must be a non-empty object.")
+    if len(raw) > MAX_METRICS_PER_MATCH:
+        raise ValueError(f"At most {MAX_METRICS_PER_MATCH} metrics per batch.")
+    batches = {}
+    total = 0
+    for name, series in raw.items():
+        if not isinstance(name, str) or not METRIC_NAME_PATTERN.match(name):
+            raise ValueError(f"Invalid metric name: {name!r}.")
+        if not isinstance(series, dict) or not isinstance(series.get("t"), list) or not isinstance(series.get("v"), list):
+            raise ValueError(f"{name} needs t and v lists.")
+        times, values = series["t"], series["v"]
+        if len(times) != len(values):
+            raise ValueError(f"{name} has {len(times)} times but {len(values)} values.")
+        total += len(times)
+        if total > MAX_SAMPLES_PER_BATCH:
+            raise ValueError(f"At most {MAX_SAMPLES_PER_BATCH} samples per batch.")
+        for value in times + values:
+            if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+                raise ValueError(f"{name} contains a non-numeric sample.")
+        if any(not 0 <= moment <= MAX_MATCH_SECONDS for moment in times):
+            raise ValueError(f"Sample times must be between 0 and {MAX_MATCH_SECONDS} seconds.")
+        if times:
+            batches[name] = (times, values)
+    return batches
+
+
+class Rollup:
+    # One resolution of one metric; bucket i covers [(first + i) * step, (first + i + 1) * step).
+    __slots__ = ("step", "first", "count", "total", "low", "high")
+
+    def __init__(self, step):
+        self.step = step
+        self.first = None
+        self.count = array("I")
+        self.total = array("d")
+        self.low = array("d")
+        self.high = array("d")
+
+    def _grow(self, at_front, size):
+        columns = ((self.count, 0), (self.total, 0.0), (self.low, math.inf), (self.high, -math.inf))
+        for column, empty in columns:
+            padding = array(column.typecode, [empty]) * size
+            if at_front:
+                column[0:0] = padding
+            else:
+                column.extend(padding)
+
+    def add(self, times, values):
+        if not times:
+            return
+        step = self.step
+        low_bucket = int(min(times) // step)
+        high_bucket = int(max(times) // step)
+        if self.first is None:
+            self.first = low_bucket
+        elif low_bucket < self.first:
+            self._grow(True, self.first - low_bucket)
+            self.first = low_bucket
+        if high_bucket - self.first >= len(self.count):
+            self._grow(False, high_bucket - self.first + 1 - len(self.count))
+        first, count, total, low, high = self.first, self.count, self.total, self.low, self.high
+        for moment, value in zip(times, values):
+            index = int(moment // step) - first
+            count[index] += 1
+            total[index] += value
+            if value < low[index]:
+                low[index] = value
+            if value > high[index]:
+                high[index] = value
+
+    @property
+    def last(self):
+        return None if self.first is None else self.first + len(self.count) - 1
+
+
+class MatchTelemetry:
+    def __init__(self, resolutions):
+        self.resolutions = resolutions
+        self.metrics = {}
+        self.offset = 0
+
+    def add(self, name, times, values):
+        rollups = self.metrics.get(name)
+        if rollups is None:
+            if len(self.metrics) >= MAX_METRICS_PER_MATCH:
+                return
+            rollups = self.metrics[name] = [Rollup(step) for step in self.resolutions]
+        for rollup in rollups:
+            rollup.add(times, values)
+
+
+class TelemetryStore:
+    # Append-only batch files are the source of truth, so every worker sees every batch; rollups are rebuilt from
+    # each file's unread tail on demand and kept for the most recently used matches.
+    def __init__(self, directory, resolutions=RESOLUTIONS, max_cached=MAX_CACHED_MATCHES):
+        self.directory = directory
+        self.resolutions = tuple(sorted(resolutions))
+        self.max_cached = max_cached
+        self._lock = threading.Lock()
+        self._matches = OrderedDict()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, match_id):
+        if not MATCH_ID_PATTERN.match(match_id or ""):
+            raise ValueError("Invalid match id.")
+        return os.path.join(self.directory, f"{match_id}.telemetry")
+
+    def append(self, match_id, batches):
+        path = self._path(match_id)
+        payload = b"".join(encode_batch(name, times, values) for name, (times, values) in batches.items())
+        if not payload:
+            return
+        with observe_io("telemetry", "append") as io:
+            # One write per request keeps batches from different workers whole.
+            with open(path, "ab") as telemetry_file:
+                if fcntl is not None:
+                    fcntl.flock(telemetry_file.fileno(), fcntl.LOCK_EX)
+                telemetry_file.write(payload)
+            io.bytes = len(payload)
+
+    def _sync(self, match_id):
+        path = self._path(match_id)
+        telemetry = self._matches.get(match_id)
+        if telemetry is None:
+            telemetry = self._matches[match_id] = MatchTelemetry(self.resolutions)
+            while len(self._matches) > self.max_cached:
+                self._matches.popitem(last=False)
+        else:
+            self._matches.move_to_end(match_id)
+        try:
+            size = os.path.getsize(path)
+        except FileNotFoundError:
+            return telemetry
+        if size <= telemetry.offset:
+            return telemetry
+
+        with observe_io("telemetry", "read") as io:
+            with open(path, "rb") as telemetry_file:
+                telemetry_file.seek(telemetry.offset)
+                chunk = telemetry_file.read(size - telemetry.offset)
+            io.bytes = len(chunk)
+        position = 0
+        while position + BATCH_HEADER.size <= len(chunk):
+            name_length, count = BATCH_HEADER.unpack_from(chunk, position)
+            times_at = position + BATCH_HEADER.size + name_length
+            values_at = times_at + count * array(TIME_TYPECODE).itemsize
+            end = values_at + count * array(VALUE_TYPECODE).itemsize
+            if end > len(chunk):
+                # A batch still being written; pick it up on the next read.
+                break
+            name = chunk[position + BATCH_HEADER.size : times_at].decode("ascii")
+            telemetry.add(name, _column(TIME_TYPECODE, chunk[times_at:values_at]), _column(VALUE_TYPECODE, chunk[values_at:end]))
+            position = end
+        telemetry.offset += position
+        return telemetry
+
+    def pick_resolution(self, span_seconds, max_points):
+        for step in self.resolutions:
+            if span_seconds / step <= max_points:
+                return step
+        return self.resolutions[-1]
+
+    def query(self, match_id, resolution=None, metrics=None, start=None, end=None, max_points=DEFAULT_MAX_POINTS):
+        # Every returned series shares start/step, with null where a bucket had no samples.
+        with self._lock:
+            telemetry = self._sync(match_id)
+            names = sorted(telemetry.metrics) if metrics is None else [name for name in metrics if name in telemetry.metrics]
+            level = {step: index for index, step in enumerate(self.resolutions)}
+            spans = [telemetry.metrics[name][0] for name in names if telemetry.metrics[name][0].first is not None]
+            if not spans:
+                return {"resolution": resolution or self.resolutions[0], "start": None, "step": resolution or self.resolutions[0], "metrics": {}}
+            first_second = max(min(rollup.first for rollup in spans), 0 if start is None else int(start))
+            last_second = min(max(rollup.last for rollup in spans) + 1, MAX_MATCH_SECONDS if end is None else int(end))
+            if resolution is None:
+                resolution = self.pick_resolution(max(0, last_second - first_second), max_points)
+
+            first_bucket = first_second // resolution
+            last_bucket = max(first_bucket, math.ceil(last_second / resolution) - 1)
+            series = {}
+            for name in names:
+                rollup = telemetry.metrics[name][level[resolution]]
+                average, low, high = [], [], []
+                for bucket in range(first_bucket, last_bucket + 1):
+                    index = bucket - rollup.first
+                    if 0 <= index < len(rollup.count) and rollup.count[index]:
+                        average.append(round(rollup.total[index] / rollup.count[index], 3))
+                        low.append(rollup.low[index])
+                        high.append(rollup.high[index])
+                    else:
+                        average.append(None)
+                        low.append(None)
+                        high.append(None)
+                series[name] = {"avg": average, "min": low, "max": high}
+            return {"resolution": resolution, "start": first_bucket * resolution, "step": resolution, "metrics": series}
+
+    def metric_names(self, match_id):
+        with self._lock:
+            return sorted(self._sync(match_id).metrics)
+
+
+class SimulationTelemetry:
+    # Samples a server-simulated match once per simulated second and writes the buffer out every few seconds.
+    def __init__(self, store, match_id, tick_rate, sample_interval=SAMPLE_INTERVAL_SECONDS, flush_interval=FLUSH_INTERVAL_SECONDS):
+        self.store = store
+        self.match_id = match_id
+        self.tick_seconds = 1.0 / tick_rate
+        self.sample_ticks = max(1, round(sample_interval * tick_rate))
+        self.flush_ticks = max(self.sample_ticks, round(flush_interval * tick_rate))
+        self.pending = {}
+
+    def record(self, simulation):
+        if simulation.tick_count % self.sample_ticks and not simulation.ended:
+            return
+        moment = simulation.tick_count * self.tick_seconds
+        for name, value in simulation.telemetry().items():
+            times, values = self.pending.setdefault(name, ([], []))
+            times.append(moment)
+            values.append(value)
+        if simulation.tick_count % self.flush_ticks == 0:
+            self.flush()
+
+    def flush(self):
+        pending, self.pending = self.pending, {}
+        self.store.append(self.match_id, pending)
+
+    def close(self):
+        self.flush()
@@ -0,0 +1,30 @@
+import importlib
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope="session")
+def backend(tmp_path_factory):
+    pytest.importorskip("flask")
+    os.environ["GAME_DATA_DIR"] = str(tmp_path_factory.mktemp("data"))
+    os.environ["SERVER_SIMULATION"] = "0"
+    os.environ["ADMISSION_CONTROL"] = "0"
+    module = importlib.import_module("Web_game_back")
+    yield module
+    module.shutdown()
+
+
+@pytest.fixture
+def client_for(backend):
+    def make(username=None):
+        client = backend.app.test_client()
+        if username is not None:
+            with client.session_transaction() as session:
+                session["username"] = username
+        return client
+
+    return make
@@ -0,0 +1,73 @@
+import multiprocessing
+import threading
+
+from account_store import CachedAccountStore, SqliteAccountStore
+
+
+def _add_gold(path, username, amount):
+    return SqliteAccountStore(path).add_gold(username, amount)
+
+
+def _set_role(path, username, role):
+    return SqliteAccountStore(path).update_account(username, {"role": role})["role"]
+
+
+def test_cached_profiles_see_writes_from_other_workers(tmp_path):
+    path = str(tmp_path / "accounts.sqlite3")
+    cache = CachedAccountStore(SqliteAccountStore(path), ttl_seconds=3600)
+    cache.create_account("alice", {"password": "x", "gold": 10})
+    cache.create_account("bobby", {"password": "x", "gold": 10})
+    assert cache.get_account("alice")["gold"] == 10
+    assert cache.get_account("bobby")["gold"] == 10
+
+    context = multiprocessing.get_context("fork")
+    with context.Pool(1) as pool:
+        assert pool.apply(_add_gold, (path, "alice", 5)) == 15
+        assert pool.apply(_set_role, (path, "alice", "developer")) == "developer"
+
+    account = cache.get_account("alice")
+    assert (account["gold"], account["role"]) == (15, "developer")
+    # Only the account another worker wrote was dropped.
+    hits = cache.hits
+    cache.get_account("bobby")
+    assert cache.hits == hits + 1
+
+
+def test_transactions_only_drop_the_accounts_they_touch(tmp_path):
+    cache = CachedAccountStore(SqliteAccountStore(str(tmp_path / "accounts.sqlite3")), ttl_seconds=3600)
+    for username in ("alice", "bobby"):
+        cache.create_account(username, {"password": "x"})
+        cache.get_account(username)
+
+    with cache.transaction() as accounts:
+        account = accounts.get("alice")
+        account["wins"] = 1
+        accounts["alice"] = account
+
+    assert cache.get_account("alice")["wins"] == 1
+    hits = cache.hits
+    cache.get_account("bobby")
+    assert cache.hits == hits + 1
+
+
+def test_request_threads_share_a_bounded_set_of_connections(tmp_path):
+    store = SqliteAccountStore(str(tmp_path / "accounts.sqlite3"), pool_size=2)
+    store.create_account("alice", {"password": "x", "gold": 10})
+    store.release_connection()
+    opened = []
+
+    def handle_request():
+        opened.append(store._connection())
+        assert store.get_account("alice")["gold"] == 10
+        store.release_connection()
+
+    # One short-lived thread per request, as under the development server.
+    for _ in range(20):
+        thread = threading.Thread(target=handle_request)
+        thread.start()
+        thread.join()
+
+    assert len({id(conn) for conn in opened}) == 1
+    assert len(store._idle) == 1
+    store.close()
+    assert store._idle == []
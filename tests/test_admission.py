@@ -0,0 +1,49 @@
+from admission import POLLING, SHED_RETRY_AFTER_SECONDS, AdmissionController
+
+
+def test_forwarded_requests_skip_the_token_bucket():
+    budget = {"priority": POLLING, "rate": 1.0, "burst": 1, "scope": "client"}
+    controller = AdmissionController(budgets={"/api/lobbies": budget})
+
+    assert controller.admit("/api/lobbies", "user:ann", "10.0.0.1", now=0.0) == (True, None)
+    controller.release()
+    # The entry node spent the token; the owner must not turn the same request away again.
+    assert controller.admit("/api/lobbies", "user:ann", "10.0.0.2", now=0.0, rate_limited=False) == (True, None)
+    controller.release()
+    assert controller.admit("/api/lobbies", "user:ann", "10.0.0.1", now=0.0)[1][1] == "rate_limited"
+
+
+def test_polling_is_shed_before_gameplay():
+    controller = AdmissionController(max_in_flight=10)
+    controller.in_flight = 5
+
+    assert controller.admit("/api/lobbies", "user:ann", "10.0.0.1", now=0.0) == (False, (503, "shed", SHED_RETRY_AFTER_SECONDS))
+    assert controller.admit("/api/leaderboard", "user:ann", "10.0.0.1", now=0.0) == (True, None)
+    assert controller.admit("/api/match-command", "user:ann", "10.0.0.1", now=0.0) == (True, None)
+
+    controller.in_flight = 9
+    assert controller.admit("/api/leaderboard", "user:ann", "10.0.0.1", now=0.0)[1][1] == "shed"
+    assert controller.admit("/api/match-command", "user:ann", "10.0.0.1", now=0.0) == (True, None)
+
+
+def test_shed_request_gets_503_with_retry_after(backend, client_for, monkeypatch):
+    monkeypatch.setattr(backend.admission_controller, "enabled", True)
+    monkeypatch.setattr(backend.admission_controller, "in_flight", backend.admission_controller.max_in_flight)
+
+    response = client_for("ann").get("/api/lobbies")
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == str(SHED_RETRY_AFTER_SECONDS)
+
+
+def test_rate_limited_request_gets_429_with_retry_after(backend, client_for, monkeypatch):
+    budget = {"priority": POLLING, "rate": 0.25, "burst": 1, "scope": "client"}
+    monkeypatch.setattr(backend.admission_controller, "enabled", True)
+    monkeypatch.setattr(backend.admission_controller, "budgets", {"/api/lobbies": budget})
+    client = client_for("bob")
+
+    assert client.get("/api/lobbies").status_code == 200
+    response = client.get("/api/lobbies")
+
+    assert response.status_code == 429
+    assert 1 <= int(response.headers["Retry-After"]) <= 4
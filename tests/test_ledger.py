@@ -0,0 +1,101 @@
+import json
+import multiprocessing
+import os
+
+import pytest
+
+from ledger import TransactionLedger, convert_json_ledger
+
+WRITERS = 3
+ENTRIES_PER_WRITER = 40
+
+
+def _entry(user, number):
+    return {
+        "type": "payout",
+        "from": "system",
+        "to": user,
+        "amount": number,
+        "timestamp": f"2026-01-01T00:00:{number % 60:02d}+00:00",
+    }
+
+
+def _write_entries(directory, user, start_event):
+    ledger = TransactionLedger(directory, segment_max_bytes=2048, index_interval=4, sync=False)
+    start_event.wait()
+    for number in range(ENTRIES_PER_WRITER):
+        ledger.append(_entry(user, number))
+    own, _ = ledger.query(user=user, limit=1000)
+    ledger.close()
+    return len(own)
+
+
+def test_concurrent_processes_share_one_ledger(tmp_path):
+    directory = str(tmp_path)
+    TransactionLedger(directory).close()
+
+    context = multiprocessing.get_context("fork")
+    start_event = context.Manager().Event()
+    with context.Pool(WRITERS) as pool:
+        pending = [pool.apply_async(_write_entries, (directory, f"u{writer}", start_event)) for writer in range(WRITERS)]
+        start_event.set()
+        own_counts = [result.get(timeout=60) for result in pending]
+
+    assert own_counts == [ENTRIES_PER_WRITER] * WRITERS
+
+    reader = TransactionLedger(directory)
+    everything, cursor = reader.query(limit=1000)
+    assert cursor is None
+    assert len(everything) == WRITERS * ENTRIES_PER_WRITER
+    for writer in range(WRITERS):
+        entries, _ = reader.query(user=f"u{writer}", limit=1000)
+        assert sorted(entry["amount"] for entry in entries) == list(range(ENTRIES_PER_WRITER))
+    reader.close()
+
+    for name in os.listdir(directory):
+        if name.endswith(".idx.json"):
+            segment_path = os.path.join(directory, name[: -len(".idx.json")] + ".jsonl")
+            with open(os.path.join(directory, name), "r", encoding="utf-8") as index_file:
+                assert json.load(index_file)["size"] == os.path.getsize(segment_path)
+
+
+def test_cursor_must_point_at_a_line_start(tmp_path):
+    ledger = TransactionLedger(str(tmp_path), sync=False)
+    ledger.append_many([_entry("alice", number) for number in range(3)])
+
+    first, cursor = ledger.query(limit=1)
+    rest, _ = ledger.query(limit=10, cursor=cursor)
+    assert [entry["amount"] for entry in first + rest] == [0, 1, 2]
+
+    for forged in [(1, 5), (1, 10**9), (7, 0)]:
+        with pytest.raises(ValueError):
+            ledger.query(cursor=forged)
+    ledger.close()
+
+
+def _convert(json_path, directory, start_event):
+    ledger = TransactionLedger(directory, sync=False)
+    start_event.wait()
+    converted = convert_json_ledger(json_path, ledger)
+    ledger.close()
+    return converted
+
+
+def test_concurrent_boots_convert_the_json_ledger_once(tmp_path):
+    json_path = str(tmp_path / "transaction.json")
+    directory = str(tmp_path / "transactions")
+    with open(json_path, "w", encoding="utf-8") as transaction_file:
+        json.dump({"transactions": [_entry("alice", number) for number in range(3000)]}, transaction_file)
+
+    context = multiprocessing.get_context("fork")
+    start_event = context.Manager().Event()
+    with context.Pool(4) as pool:
+        pending = [pool.apply_async(_convert, (json_path, directory, start_event)) for _ in range(4)]
+        start_event.set()
+        converted = sorted(result.get(timeout=60) for result in pending)
+
+    assert converted == [0, 0, 0, 3000]
+    reader = TransactionLedger(directory)
+    assert len(reader.query(limit=10000)[0]) == 3000
+    reader.close()
+    assert [name for name in os.listdir(directory) if name.endswith(".tmp")] == []
@@ -0,0 +1,40 @@
+import threading
+
+from lobby_shards import PlayerDirectory, SqliteCoordinator
+from match_store import MatchStore
+
+
+class _SlowCoordinator(SqliteCoordinator):
+    def __init__(self, path):
+        super().__init__(path)
+        self.release = threading.Event()
+
+    def update_players(self, match_id, shard, joined, left):
+        self.release.wait(5)
+        super().update_players(match_id, shard, joined, left)
+
+
+def test_directory_writes_happen_outside_the_store_lock(tmp_path):
+    coordinator = _SlowCoordinator(str(tmp_path / "coordinator.sqlite3"))
+    directory = PlayerDirectory(coordinator, 0)
+    store = MatchStore(str(tmp_path / "matches"), str(tmp_path / "archive.jsonl"))
+    store.add_listener(directory)
+    try:
+        store.add({"id": "lobby-1", "host": "alice", "status": "waiting", "players": ["alice"], "teams": {}})
+
+        def join(lobby):
+            lobby["players"].append("bobby")
+            return None
+
+        # The coordinator is stalled, yet mutations and reads on the store still go through.
+        store.update("lobby-1", join)
+        assert store.get("lobby-1")["players"] == ["alice", "bobby"]
+        assert coordinator.active_match("bobby") is None
+
+        coordinator.release.set()
+        assert directory.flush(timeout=5)
+        assert coordinator.active_match("alice") == ("lobby-1", 0)
+        assert coordinator.active_match("bobby") == ("lobby-1", 0)
+    finally:
+        coordinator.release.set()
+        directory.close()
@@ -0,0 +1,69 @@
+def _start_match(backend, match_id, players):
+    for player in players:
+        backend.account_store.create_account(player, {"password": "x"})
+    backend.match_store.add(
+        {
+            "id": match_id,
+            "host": players[0],
+            "status": "in_progress",
+            "game_time": 15,
+            "players": list(players),
+            "teams": {players[0]: "blue", players[1]: "red"},
+        }
+    )
+
+
+def _report(client_for, username, match_id, winner, deployed_units):
+    return client_for(username).post("/api/report-match-result", json={"id": match_id, "winner": winner, "deployed_units": deployed_units})
+
+
+def _account(backend, username):
+    return backend.account_store.get_account(username)
+
+
+def test_reporter_cannot_set_other_players_deployed_units(backend, client_for):
+    _start_match(backend, "stats-match", ["alice", "bobby"])
+
+    response = _report(client_for, "alice", "stats-match", "blue", {"alice": 12, "bobby": 999999})
+    assert response.status_code == 200
+    assert response.get_json()["status"] == "awaiting_confirmation"
+    assert _account(backend, "bobby")["total_deployed_units"] == 0
+
+    response = _report(client_for, "bobby", "stats-match", "blue", {"alice": 999999, "bobby": 7})
+    assert response.status_code == 200
+    assert response.get_json()["winner"] == "blue"
+    assert _account(backend, "alice")["total_deployed_units"] == 12
+    assert _account(backend, "bobby")["total_deployed_units"] == 7
+    assert _account(backend, "alice")["wins"] == 1
+    assert _account(backend, "bobby")["losses"] == 1
+
+
+def test_concession_settles_and_late_reports_are_clamped(backend, client_for):
+    _start_match(backend, "conceded-match", ["carol", "dave"])
+
+    response = _report(client_for, "dave", "conceded-match", "blue", {"dave": 3})
+    assert response.get_json()["status"] == "finished"
+    assert _account(backend, "carol")["wins"] == 1
+
+    response = _report(client_for, "carol", "conceded-match", "blue", {"carol": 10**9})
+    assert response.status_code == 200
+    assert _account(backend, "carol")["total_deployed_units"] == backend.max_deployed_units({"game_time": 15})
+
+    # A second late report for the same match is not counted again.
+    response = _report(client_for, "carol", "conceded-match", "blue", {"carol": 5})
+    assert response.status_code == 404
+
+
+def test_disagreeing_reports_dispute_the_match_without_stats(backend, client_for):
+    _start_match(backend, "disputed-match", ["erin", "frank"])
+
+    response = _report(client_for, "erin", "disputed-match", "blue", {"erin": 4})
+    assert response.get_json()["status"] == "awaiting_confirmation"
+    assert _account(backend, "erin")["wins"] == 0
+
+    response = _report(client_for, "frank", "disputed-match", "red", {"frank": 4})
+    assert response.status_code == 409
+    for player in ("erin", "frank"):
+        account = _account(backend, player)
+        assert (account["wins"], account["losses"], account["total_deployed_units"]) == (0, 0, 0)
+    assert backend.match_store.get("disputed-match") is None
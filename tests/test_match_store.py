@@ -0,0 +1,71 @@
+import multiprocessing
+import time
+
+import pytest
+
+import match_store
+from match_store import MatchStore
+
+LOBBY_ID = "contended-lobby"
+WORKERS = 4
+PLAYERS_PER_WORKER = 15
+
+
+def _churn(directory, archive_path, worker_id, attempts, start_event, results):
+    match_store.OPTIMISTIC_ATTEMPTS = attempts
+    store = MatchStore(directory, archive_path)
+    start_event.wait()
+    usernames = [f"w{worker_id}-p{number}" for number in range(PLAYERS_PER_WORKER)]
+
+    def join(username):
+        def apply(lobby):
+            time.sleep(0.001)  # widen the window between the read and the compare-and-swap
+            lobby["players"].append(username)
+            lobby["teams"][username] = "red"
+
+        return apply
+
+    def leave(username):
+        def apply(lobby):
+            time.sleep(0.001)
+            lobby["players"].remove(username)
+            del lobby["teams"][username]
+
+        return apply
+
+    for username in usernames:
+        store.update(LOBBY_ID, join(username))
+    # Every odd player leaves again; the survivors are what the parent checks for.
+    for username in usernames[1::2]:
+        store.update(LOBBY_ID, leave(username))
+    results.put(store.conflicts)
+
+
+@pytest.mark.parametrize("attempts", [match_store.OPTIMISTIC_ATTEMPTS, 1, 0])
+def test_concurrent_joins_and_leaves_across_processes_are_not_lost(tmp_path, attempts):
+    # attempts=1 sends conflicting writers to the locked fallback; attempts=0 uses only the fallback.
+    directory = str(tmp_path)
+    archive_path = str(tmp_path / "archive.jsonl")
+    MatchStore(directory, archive_path).add({"id": LOBBY_ID, "host": "host", "status": "waiting", "players": [], "teams": {}})
+
+    start_event = multiprocessing.Event()
+    results = multiprocessing.Queue()
+    workers = [
+        multiprocessing.Process(target=_churn, args=(directory, archive_path, worker_id, attempts, start_event, results))
+        for worker_id in range(WORKERS)
+    ]
+    for worker in workers:
+        worker.start()
+    start_event.set()
+    conflicts = sum(results.get(timeout=60) for _ in workers)
+    for worker in workers:
+        worker.join(timeout=10)
+        assert worker.exitcode == 0
+
+    lobby = MatchStore(directory, archive_path).get(LOBBY_ID)
+    expected = {f"w{worker_id}-p{number}" for worker_id in range(WORKERS) for number in range(0, PLAYERS_PER_WORKER, 2)}
+    assert sorted(lobby["players"]) == sorted(expected)
+    assert set(lobby["teams"]) == expected
+    assert lobby["version"] == 1 + WORKERS * (PLAYERS_PER_WORKER + PLAYERS_PER_WORKER // 2)
+    if attempts:
+        assert conflicts > 0
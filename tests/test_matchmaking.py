@@ -0,0 +1,56 @@
+import multiprocessing
+import sqlite3
+
+from matchmaking import SqliteMatchmakingQueue
+
+
+def _enqueue(path, username, rating, now):
+    return SqliteMatchmakingQueue(path).enqueue(username, "1v1", rating, now=now)
+
+
+def test_workers_sharing_the_queue_pair_players(tmp_path):
+    path = str(tmp_path / "matchmaking.sqlite3")
+    first = SqliteMatchmakingQueue(path)
+
+    context = multiprocessing.get_context("fork")
+    with context.Pool(1) as pool:
+        assert pool.apply(_enqueue, (path, "alice", 1000, 100.0)) is None
+
+    status = first.status("alice", now=101.0)
+    assert status["mode"] == "1v1" and status["queued_players"] == 1
+
+    group = first.enqueue("bobby", "1v1", 1100, now=101.0)
+    assert sorted(entry[2] for entry in group) == ["alice", "bobby"]
+    assert len(first) == 0
+
+
+def test_sweep_matches_once_tolerances_widen(tmp_path):
+    path = str(tmp_path / "matchmaking.sqlite3")
+    worker_a = SqliteMatchmakingQueue(path)
+    worker_b = SqliteMatchmakingQueue(path)
+
+    assert worker_a.enqueue("alice", "1v1", 0, now=0.0) is None
+    assert worker_b.enqueue("bobby", "1v1", 1000, now=0.0) is None
+    assert worker_a.sweep(now=1.0, force=True) == []
+
+    groups = worker_b.sweep(now=60.0, force=True)
+    assert [(mode, sorted(entry[2] for entry in group)) for mode, group in groups] == [("1v1", ["alice", "bobby"])]
+    assert worker_a.status("alice") is None
+    assert worker_a.remove("alice") is False
+
+
+def test_sweep_that_is_not_due_does_not_take_the_write_lock(tmp_path):
+    path = str(tmp_path / "matchmaking.sqlite3")
+    worker_a = SqliteMatchmakingQueue(path)
+    worker_b = SqliteMatchmakingQueue(path)
+    assert worker_a.sweep(now=100.0) == []
+
+    # Another worker holds the write lock; a poll before the next sweep is due must not wait for it.
+    blocker = sqlite3.connect(path, timeout=0, isolation_level=None)
+    blocker.execute("BEGIN IMMEDIATE")
+    try:
+        worker_b._connection().execute("PRAGMA busy_timeout = 0")
+        assert worker_b.sweep(now=100.5) == []
+    finally:
+        blocker.execute("ROLLBACK")
+        blocker.close()
@@ -0,0 +1,55 @@
+import os
+import time
+
+import pytest
+
+pytest.importorskip("werkzeug")
+
+from password_hashing import HashingOverloadedError, PasswordHasher  # noqa: E402
+
+
+@pytest.fixture
+def hasher():
+    hasher = PasswordHasher("pbkdf2:sha256:1000", workers=1, max_queue=0, timeout=0.2)
+    yield hasher
+    hasher.shutdown()
+
+
+def test_full_queue_is_rejected(hasher):
+    hasher.warm_up()
+    hasher._slots.acquire()
+    try:
+        with pytest.raises(HashingOverloadedError):
+            hasher.hash_password("secret1")
+    finally:
+        hasher._slots.release()
+    assert hasher.rejected == 1
+    assert hasher.verify(hasher.hash_password("secret1"), "secret1")[0]
+
+
+def test_timed_out_job_keeps_its_slot_until_it_finishes(hasher):
+    hasher.warm_up()
+    with pytest.raises(HashingOverloadedError):
+        hasher._run(time.sleep, 1.0)
+
+    # The sleeping job still occupies the only worker, so admission must keep refusing.
+    with pytest.raises(HashingOverloadedError):
+        hasher.hash_password("secret1")
+    assert hasher.rejected == 1
+
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline:
+        try:
+            hasher.hash_password("secret1")
+            break
+        except HashingOverloadedError:
+            time.sleep(0.05)
+    else:
+        pytest.fail("slot was never released")
+
+
+def test_dead_worker_is_replaced(hasher):
+    hasher.warm_up()
+    with pytest.raises(HashingOverloadedError):
+        hasher._run(os._exit, 1)
+    assert hasher.verify(hasher.hash_password("secret1"), "secret1")[0]
@@ -0,0 +1,72 @@
+import os
+import time
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from game_maps import load_maps  # noqa: E402
+from simulation import FORMATION_ATTACK, FORMATION_DEFENSE, STATE_MOVING, MatchSimulation, SimulationHost, build_roster  # noqa: E402
+
+MAPS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "maps.js")
+
+
+def _simulation(match_id, players=("alice",)):
+    game_maps = load_maps(MAPS_PATH)
+    return MatchSimulation(match_id, game_maps[sorted(game_maps)[0]], build_roster(list(players), {"alice": "blue"}, 2), 15)
+
+
+def test_non_finite_move_targets_are_rejected():
+    simulation = _simulation("moves")
+    simulation.tick(0.05)
+    units = [int(unit) for unit in simulation.unit_id[: simulation.count]]
+
+    for target in (float("nan"), float("inf"), "-inf"):
+        assert not simulation.queue_command("alice", "move", {"units": units, "x": target, "y": 10})
+    assert not simulation.queue_command("alice", "move", {"units": [10**30], "x": 1, "y": 1})
+    assert simulation.queue_command("alice", "move", {"units": units, "x": 1e12, "y": -5})
+
+    simulation.tick(0.05)
+    owned = simulation.owner[: simulation.count] == simulation.player_index["alice"]
+    moving = simulation.state[: simulation.count][owned] == STATE_MOVING
+    assert np.all(simulation.target_x[: simulation.count][owned][moving] <= simulation.width)
+
+
+def test_a_failing_match_is_abandoned_without_stopping_the_others():
+    abandoned = []
+    host = SimulationHost(tick_rate=100, on_abandon=abandoned.append)
+    healthy = _simulation("healthy")
+    broken = _simulation("broken")
+
+    def explode(delta_seconds):
+        raise RuntimeError("corrupt match state")
+
+    broken.tick = explode
+    host.start_match(healthy)
+    host.start_match(broken)
+    try:
+        deadline = time.monotonic() + 5
+        while (not abandoned or healthy.tick_count < 5) and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        host.stop()
+
+    assert abandoned == ["broken"]
+    assert "broken" not in host
+    assert healthy.tick_count >= 5
+
+
+def test_adaptive_bots_measure_themselves_against_the_human_team():
+    game_maps = load_maps(MAPS_PATH)
+    players = [
+        {"name": "alice", "team": "blue", "bot": False},
+        {"name": "BOT BLUE", "team": "blue", "bot": True, "difficulty": "medium"},
+        {"name": "BOT HARD", "team": "blue", "bot": True, "difficulty": "hard"},
+    ]
+    simulation = MatchSimulation("adaptive", game_maps[sorted(game_maps)[0]], players, 15)
+    simulation.spawn(simulation.player_index["alice"])
+    simulation._update_ai(0.0)
+
+    # Blue outguns an empty red side, but an adaptive bot on the human's team never out-muscles its own team.
+    assert simulation.player_formation[simulation.player_index["BOT BLUE"]] == FORMATION_DEFENSE
+    assert simulation.player_formation[simulation.player_index["BOT HARD"]] == FORMATION_ATTACK
@@ -0,0 +1,16 @@
+def test_streams_past_the_cap_are_refused_so_clients_poll(backend, client_for, monkeypatch):
+    monkeypatch.setattr(backend.stream_slots, "limit", 1)
+    client = client_for()
+
+    held = client.get("/api/lobbies/stream", buffered=False)
+    assert held.status_code == 200
+
+    refused = client.get("/api/lobbies/stream", buffered=False)
+    assert refused.status_code == 503
+    assert refused.headers["Retry-After"]
+
+    held.close()
+    assert backend.stream_slots.open == 0
+    reopened = client.get("/api/lobbies/stream", buffered=False)
+    assert reopened.status_code == 200
+    reopened.close()